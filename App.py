@@ -1,17 +1,20 @@
-from flask import Flask, render_template, request, jsonify, redirect, url_for, session, flash, make_response
+from flask import Flask, render_template, request, jsonify, redirect, url_for, session, flash, make_response, Response, stream_with_context
 import os
 from dotenv import load_dotenv
 import google.generativeai as genai
 import psycopg2
-from psycopg2 import pool, connect, sql
+from psycopg2 import connect, sql
 import psycopg2.extras
 from datetime import datetime, timedelta
 import logging
+import click
 import base64
 import re
+import html
 import json
 import jwt
 import secrets
+import uuid
 import smtplib
 import pytz
 from email.mime.text import MIMEText
@@ -21,13 +24,30 @@ from auth_utils import hash_password, verify_password, generate_token, verify_to
 from barangay_data import (
     BARANGAY_OFFICIALS_INFO, 
     AVAILABLE_DOCUMENTS, 
-    is_about_officials, 
-    is_about_population, 
     detect_document_type
 )
 from notable_places import handle_place_request, is_place_request, get_random_images, NOTABLE_PLACES
 
 from barangay_history import get_relevant_info
+from response_cache import ResponseCache, make_cache_key
+from singleflight import create_singleflight, fingerprint
+from gemini_client import GeminiClient, CircuitBreaker, LLMUnavailableError
+from fallback_answers import fallback_answer
+from local_answers import answer_locally
+from intent_router import IntentRouter
+from knowledge_index import KNOWLEDGE_INDEX, retrieve_passages, format_passages
+from population_stats import get_population_summary
+from db_context import RequestConnectionManager
+from db_pool import BlockingConnectionPool, pool_size_from_env
+from write_behind import WriteBehindBuffer
+from session_store import ServerSideSessionInterface, create_session_store
+from chat_context_cache import ChatContextCache, ChatWindow, default_cache_dir
+from conversation_context import build_history_context, BackgroundSummarizer
+from schema_migrations import migrate, schema_status
+from document_queries import build_document_page_query, page_from_rows, InvalidPageRequest
+from daily_limits import claim_daily_limits, daily_limit_usage
+from report_insights import insights_digest, get_cached_insights, store_insights, past_month_ranges, PeriodicJob
+from llm_limiter import ConcurrencyLimiter, TokenBucketPacer, LLMOverloadedError, estimate_tokens, default_state_dir
 
 # Configure logging
 logging.basicConfig(
@@ -47,7 +67,6 @@ load_dotenv()
 # Initialize Flask app
 app = Flask(__name__)
 app.secret_key = os.getenv("SECRET_KEY", os.urandom(24).hex())  # Use environment variable if available
-app.config['SESSION_TYPE'] = 'filesystem'
 app.config['PERMANENT_SESSION_LIFETIME'] = timedelta(hours=1)  # Session expires after 1 hour
 
 #github thing
@@ -90,6 +109,87 @@ model = genai.GenerativeModel(
     generation_config=generation_config,
 )
 
+# Deadline- and breaker-aware client used for every Gemini call
+llm_client = GeminiClient(
+    model,
+    timeout=float(os.getenv("LLM_TIMEOUT_SECONDS", 20)),
+    breaker=CircuitBreaker(
+        failure_threshold=int(os.getenv("LLM_BREAKER_THRESHOLD", 5)),
+        reset_timeout=float(os.getenv("LLM_BREAKER_RESET_SECONDS", 30))
+    )
+)
+
+# Admission control for Gemini calls: bounded concurrency with a short wait queue,
+# plus requests/tokens-per-minute pacing shared by every worker on the host
+llm_limiter_dir = default_state_dir()
+llm_limiter = ConcurrencyLimiter(
+    max_in_flight=int(os.getenv("LLM_MAX_IN_FLIGHT", 4)),
+    max_queue=int(os.getenv("LLM_MAX_QUEUE", 8)),
+    queue_timeout=float(os.getenv("LLM_QUEUE_TIMEOUT", 2)),
+    directory=llm_limiter_dir
+)
+llm_pacer = TokenBucketPacer(
+    requests_per_minute=int(os.getenv("GEMINI_RPM", 60)),
+    tokens_per_minute=int(os.getenv("GEMINI_TPM", 1000000)),
+    max_wait=float(os.getenv("LLM_PACING_MAX_WAIT", 3)),
+    state_path=os.path.join(llm_limiter_dir, "quota.json")
+)
+
+# Cache for LLM answers to repeated, history-independent questions
+response_cache = ResponseCache(
+    max_entries=int(os.getenv("RESPONSE_CACHE_SIZE", 512)),
+    ttl_seconds=int(os.getenv("RESPONSE_CACHE_TTL", 3600))
+)
+
+# Coalesces identical concurrent Gemini calls within and across workers. Followers wait as long as
+# a leader's call can take: a limiter slot, quota pacing and the Gemini deadline, plus a second of slack
+llm_singleflight = create_singleflight(
+    os.getenv("SINGLEFLIGHT_DIR"),
+    wait_timeout=llm_limiter.queue_timeout + llm_pacer.max_wait + llm_client.timeout + 1
+)
+
+# Token budget for the conversation history in LLM prompts. Saved chats load up to CHAT_CONTEXT_WINDOW
+# recent messages; turns that no longer fit are folded into a rolling summary by a background thread,
+# which always leaves the newest SUMMARY_KEEP_RECENT messages verbatim and runs once SUMMARY_MIN_MESSAGES
+# messages are neither in the prompt nor in the summary
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", 1500))
+CHAT_CONTEXT_WINDOW = int(os.getenv("CHAT_CONTEXT_WINDOW", 30))
+SUMMARY_KEEP_RECENT = int(os.getenv("SUMMARY_KEEP_RECENT", 4))
+SUMMARY_MIN_MESSAGES = int(os.getenv("SUMMARY_MIN_MESSAGES", 6))
+SUMMARY_MAX_BATCH = int(os.getenv("SUMMARY_MAX_BATCH", 40))
+SUMMARY_MAX_WORDS = int(os.getenv("SUMMARY_MAX_WORDS", 150))
+
+# Recent plain-text messages per logged-in chat, updated as turns are saved
+# (CHAT_CONTEXT_CACHE_SIZE=0 disables it, e.g. when several hosts serve the same chats)
+chat_context_cache = ChatContextCache(
+    max_chats=int(os.getenv("CHAT_CONTEXT_CACHE_SIZE", 1024)),
+    window=CHAT_CONTEXT_WINDOW,
+    directory=default_cache_dir()
+)
+
+# Background pre-generation of report AI insights for past months (interval 0 disables it)
+INSIGHTS_PREGENERATE_INTERVAL = float(os.getenv("INSIGHTS_PREGENERATE_INTERVAL", 6 * 3600))
+INSIGHTS_PREGENERATE_MONTHS = int(os.getenv("INSIGHTS_PREGENERATE_MONTHS", 12))
+INSIGHTS_JOB_LOCK_ID = 4_217_302
+
+# daily_query_stats keeps every distinct question for QUERY_STATS_KEEP_DAYS days, then only each day's
+# QUERY_STATS_TOP_N most asked (migrations/0011_query_stats_retention.sql); the compaction runs every
+# QUERY_STATS_COMPACT_INTERVAL seconds (0 disables it)
+QUERY_STATS_KEEP_DAYS = int(os.getenv("QUERY_STATS_KEEP_DAYS", 7))
+QUERY_STATS_TOP_N = int(os.getenv("QUERY_STATS_TOP_N", 50))
+QUERY_STATS_COMPACT_INTERVAL = float(os.getenv("QUERY_STATS_COMPACT_INTERVAL", 6 * 3600))
+
+# Number of knowledge passages retrieved into general LLM prompts
+KNOWLEDGE_TOP_K = int(os.getenv("KNOWLEDGE_TOP_K", 4))
+
+# Requests allowed per user, document type and day; DAILY_COPY_LIMITS (JSON) overrides individual types
+DAILY_COPY_LIMITS = {
+    "barangay clearance": 1,
+    "barangay indigency": 5,
+    "barangay residency": 2,
+    **json.loads(os.getenv("DAILY_COPY_LIMITS", "{}"))
+}
+
 # Admin credentials from environment variables
 ADMIN_KEY = os.getenv("ADMIN_KEY", "EASTER")
 ADMIN_PASS = os.getenv("ADMIN_PASS", "EGG")
@@ -102,30 +202,58 @@ signatory_info = {
     "title": "Title Not Set"
 }
 
-# PostgreSQL connection pool
+# PostgreSQL connection pool (one per gunicorn worker, sized to its thread count)
+# Callers wait up to DB_POOL_TIMEOUT seconds for a free connection instead of failing immediately
 try:
-    connection_pool = pool.ThreadedConnectionPool(
-        minconn=1,
-        maxconn=10,
-        dsn=DATABASE_URL
+    connection_pool = BlockingConnectionPool(
+        minconn=int(os.getenv("DB_POOL_MIN", 1)),
+        maxconn=pool_size_from_env(),
+        dsn=DATABASE_URL,
+        wait_timeout=float(os.getenv("DB_POOL_TIMEOUT", 5)),
+        max_age=float(os.getenv("DB_CONN_MAX_AGE", 1800)),
+        validate_after=float(os.getenv("DB_CONN_VALIDATE_AFTER", 30))
     )
     logger.info("PostgreSQL connection pool created successfully")
 except Exception as e:
     logger.error(f"Error creating PostgreSQL connection pool: {e}")
     raise
 
-# Get connection from pool
+# One pooled connection per request, shared by every helper the request calls
+db_connections = RequestConnectionManager(connection_pool)
+
+# Get connection from pool (reuses the current request's connection)
 def get_connection():
     try:
-        connection = connection_pool.getconn()
+        connection = db_connections.get_connection()
         return connection
     except Exception as e:
         logger.error(f"Error getting connection from pool: {e}")
         return None
 
-# Return connection to pool
+# Return connection to pool (the request's connection is returned on teardown)
 def return_connection(connection):
-    connection_pool.putconn(connection)
+    db_connections.return_connection(connection)
+
+# Conversation logs and visit counts are written behind the request by a background thread
+log_writer = WriteBehindBuffer(
+    db_connections,
+    batch_size=int(os.getenv("LOG_BATCH_SIZE", 100)),
+    flush_interval=float(os.getenv("LOG_FLUSH_INTERVAL", 2)),
+    max_pending=int(os.getenv("LOG_MAX_PENDING", 5000))
+)
+
+# Server-side sessions: the cookie only carries an opaque session id. SESSION_BACKEND is "postgres"
+# (shared by all workers and nodes) or "sqlite" for a single node without a database round trip per request.
+app.session_interface = ServerSideSessionInterface(create_session_store(
+    os.getenv("SESSION_BACKEND", "postgres"),
+    connections=db_connections,
+    path=os.getenv("SESSION_SQLITE_PATH", os.path.join(app.instance_path, "sessions.sqlite3"))
+))
+
+# Return the request's connection to the pool when the request ends
+@app.teardown_appcontext
+def release_db_connection(exception=None):
+    db_connections.teardown(exception)
 
 # Email verification functions
 def send_verification_email(email, username, verification_token):
@@ -318,47 +446,13 @@ def get_user_by_email(email):
         cursor.close()
         return_connection(connection)
 
-# Function to log conversations
+# Function to log conversations (buffered; written in batches by log_writer)
 def log_conversation(user_input, ai_response, user_id=None):
-    connection = get_connection()
-    if connection is None:
-        return
-
-    try:
-        cursor = connection.cursor()
-        query = "INSERT INTO conversation_logs (user_input, ai_response, timestamp, user_id) VALUES (%s, %s, %s, %s)"
-        values = (user_input, ai_response, datetime.now(), user_id)
-        cursor.execute(query, values)
-        connection.commit()
-    except Exception as e:
-        logger.error(f"Error logging conversation: {e}")
-        connection.rollback()
-    finally:
-        cursor.close()
-        return_connection(connection)
+    log_writer.log_conversation(user_input, ai_response, user_id)
 
+# Function to count a website visit (pre-aggregated in memory, applied as one +N upsert per flush)
 def log_website_visit():
-    connection = get_connection()
-    if connection is None:
-        return
-
-    try:
-        cursor = connection.cursor()
-        # PostgreSQL doesn't have ON DUPLICATE KEY UPDATE, use INSERT ... ON CONFLICT instead
-        query = """
-        INSERT INTO website_visits (visit_date, visit_count)
-        VALUES (CURRENT_DATE, 1)
-        ON CONFLICT (visit_date) 
-        DO UPDATE SET visit_count = website_visits.visit_count + 1
-        """
-        cursor.execute(query)
-        connection.commit()
-    except Exception as e:
-        logger.error(f"Error logging website visit: {e}")
-        connection.rollback()
-    finally:
-        cursor.close()
-        return_connection(connection)
+    log_writer.record_visit()
 
 def log_document_request(document_type):
     connection = get_connection()
@@ -483,22 +577,7 @@ def load_admin_credentials():
     try:
         cursor = connection.cursor()
         
-        # Check if env_variables table exists
-        cursor.execute("""
-        SELECT EXISTS (
-            SELECT FROM information_schema.tables 
-            WHERE table_schema = 'public' 
-            AND table_name = 'env_variables'
-        );
-        """)
-        
-        table_exists = cursor.fetchone()[0]
-        
-        if not table_exists:
-            logger.info("env_variables table does not exist, using default admin credentials")
-            return
-            
-        # Get ADMIN_KEY
+        # Get ADMIN_KEY (env_variables is created by the migrations)
         cursor.execute("SELECT value FROM env_variables WHERE key = 'ADMIN_KEY'")
         admin_key_row = cursor.fetchone()
         
@@ -516,7 +595,7 @@ def load_admin_credentials():
         cursor.close()
         return_connection(connection)
         
-# Function to generate AI insights for the report
+# Function to generate AI insights for the report (None when Gemini is unavailable)
 def generate_ai_insights(start_date, end_date, total_visits, total_requests, document_types_data, status_data):
     try:
         # Format the data for the AI
@@ -541,15 +620,26 @@ def generate_ai_insights(start_date, end_date, total_visits, total_requests, doc
         """
         
         # Generate AI response
-        response = model.generate_content(prompt)
+        response_text = call_llm(prompt)
         
         # Format the response with HTML
-        insights_html = response.text.replace("\n", "<br>")
+        insights_html = response_text.replace("\n", "<br>")
         
         return insights_html
     except Exception as e:
         logger.error(f"Error generating AI insights: {e}")
-        return "<p>Unable to generate AI insights for this report.</p>"
+        return None
+
+# Longest message kept in the session history; the model only needs the gist of earlier turns
+HISTORY_MESSAGE_MAX_CHARS = int(os.getenv("HISTORY_MESSAGE_MAX_CHARS", 1000))
+
+# Function to reduce a styled HTML response to compact plain text
+def html_to_text(markup):
+    text = html.unescape(re.sub(r'<.*?>', ' ', markup or ''))
+    text = re.sub(r'\s+', ' ', text).strip()
+    if len(text) > HISTORY_MESSAGE_MAX_CHARS:
+        text = text[:HISTORY_MESSAGE_MAX_CHARS].rstrip() + "…"
+    return text
 
 # Function to manage conversation history
 def manage_conversation_history(user_input, ai_response):
@@ -557,10 +647,10 @@ def manage_conversation_history(user_input, ai_response):
     if 'conversation_history' not in session:
         session['conversation_history'] = []
     
-    # Add the new exchange to the history
+    # Add the new exchange to the history as plain text, not the styled HTML sent to the browser
     session['conversation_history'].append({
-        'user': user_input,
-        'ai': ai_response
+        'user': html_to_text(user_input),
+        'ai': html_to_text(ai_response)
     })
     
     # Limit the history to the last 10 exchanges to avoid context window limits
@@ -575,73 +665,190 @@ def get_conversation_history_context():
     if 'conversation_history' not in session or not session['conversation_history']:
         return ""
     
-    context = "\nRecent conversation history:\n"
+    messages = []
     for exchange in session['conversation_history']:
-        # Strip HTML tags for cleaner context
-        ai_response = re.sub(r'<.*?>', '', exchange['ai'])
-        context += f"User: {exchange['user']}\nBAAC: {ai_response}\n\n"
+        messages.extend([(True, exchange['user']), (False, exchange['ai'])])
     
-    return context
+    # Newest exchanges first until the token budget is used up
+    return build_history_context(messages, HISTORY_TOKEN_BUDGET).text
 
 # Function to get chat history context for a specific chat
 def get_chat_history_context(chat_id, user_id):
+    window = chat_context_cache.get(chat_id, user_id)
+    if window is None:
+        window = load_chat_context_window(chat_id, user_id)
+    if window is None:
+        return ""
+    
+    # Messages already covered by the summary are not repeated verbatim
+    first_position = window.total - len(window.messages)
+    messages = window.messages[max(0, window.summarized - first_position):]
+    history = build_history_context(messages, HISTORY_TOKEN_BUDGET, window.summary)
+    
+    # Older turns that are in neither the prompt nor the summary get summarized off the request path
+    if window.total - history.kept - window.summarized >= SUMMARY_MIN_MESSAGES:
+        chat_summarizer.request(chat_id)
+    return history.text
+
+# Function to load a chat's context window from the database and cache it; None if the user doesn't own the chat
+def load_chat_context_window(chat_id, user_id):
+    # Read the version first so a turn saved while we query makes this window stale, not wrong
+    version = chat_context_cache.version(chat_id)
+    
     connection = get_connection()
     if connection is None:
-        return ""
+        return None
         
     try:
         cursor = connection.cursor(cursor_factory=psycopg2.extras.DictCursor)
         
-        # First verify the chat belongs to the user
-        verify_query = """
-        SELECT COUNT(*) FROM chat_histories
-        WHERE id = %s AND user_id = %s AND is_active = TRUE
-        """
-        cursor.execute(verify_query, (chat_id, user_id))
-        count = cursor.fetchone()[0]
-        
-        if count == 0:
-            logger.error(f"Chat {chat_id} not found or does not belong to user {user_id}")
-            return ""
-        
-        # Get the most recent messages (limit to last 10 for context window)
+        # Get the most recent messages, the message count and the rolling summary in the same statement
+        # as the ownership check: no rows means the chat is not the user's, one all-NULL row means it is empty
         query = """
-        SELECT is_user, message
-        FROM chat_messages
-        WHERE chat_id = %s
-        ORDER BY timestamp DESC
-        LIMIT 10
+        SELECT ch.context_summary, ch.summarized_count,
+               (SELECT COUNT(*) FROM chat_messages WHERE chat_id = ch.id) AS total,
+               recent.is_user, recent.message
+        FROM chat_histories ch
+        LEFT JOIN LATERAL (
+            SELECT is_user, message, timestamp, id
+            FROM chat_messages
+            WHERE chat_id = ch.id
+            ORDER BY timestamp DESC, id DESC
+            LIMIT %s
+        ) recent ON TRUE
+        WHERE ch.id = %s AND ch.user_id = %s AND ch.is_active = TRUE
+        ORDER BY recent.timestamp DESC, recent.id DESC
         """
-        cursor.execute(query, (chat_id,))
+        cursor.execute(query, (CHAT_CONTEXT_WINDOW, chat_id, user_id))
         
-        messages = cursor.fetchall()
-        
-        if not messages:
-            return ""
+        rows = cursor.fetchall()
         
-        # Format the messages for context
-        context = "\nRecent conversation history:\n"
-        
-        # Reverse the messages to get chronological order
-        for message in reversed(messages):
-            is_user = message['is_user']
-            msg_text = message['message']
-            
-            # Strip HTML tags for cleaner context
-            msg_text = re.sub(r'<.*?>', '', msg_text)
-            
-            if is_user:
-                context += f"User: {msg_text}\n"
-            else:
-                context += f"BAAC: {msg_text}\n\n"
+        if not rows:
+            logger.error(f"Chat {chat_id} not found or does not belong to user {user_id}")
+            return None
         
-        return context
+        # Reverse the messages to get chronological order, stripping HTML once per message
+        messages = [
+            (row['is_user'], html_to_text(row['message']))
+            for row in reversed(rows)
+            if row['message'] is not None
+        ]
+        window = ChatWindow(messages, rows[0]['total'], rows[0]['context_summary'], rows[0]['summarized_count'])
+        chat_context_cache.fill(chat_id, user_id, window, version)
+        return window
     except Exception as e:
         logger.error(f"Error getting chat history context: {e}")
-        return ""
+        return None
+    finally:
+        cursor.close()
+        return_connection(connection)
+
+# Function to fold a chat's older messages into its rolling summary; runs on the summarizer thread
+def summarize_chat_history(chat_id):
+    connection = get_connection()
+    if connection is None:
+        return
+    
+    try:
+        cursor = connection.cursor()
+        cursor.execute("""
+        SELECT ch.context_summary, ch.summarized_count,
+               (SELECT COUNT(*) FROM chat_messages WHERE chat_id = ch.id)
+        FROM chat_histories ch
+        WHERE ch.id = %s AND ch.is_active = TRUE
+        """, (chat_id,))
+        row = cursor.fetchone()
+        if not row:
+            return
+        summary, summarized, total = row
+        
+        # Everything but the newest few messages, in batches so a long backlog stays one prompt at a time
+        end = min(total - SUMMARY_KEEP_RECENT, summarized + SUMMARY_MAX_BATCH)
+        if end - summarized < 2:
+            return
+        cursor.execute("""
+        SELECT is_user, message FROM chat_messages
+        WHERE chat_id = %s
+        ORDER BY timestamp ASC, id ASC
+        OFFSET %s LIMIT %s
+        """, (chat_id, summarized, end - summarized))
+        messages = cursor.fetchall()
+    finally:
+        cursor.close()
+        return_connection(connection)
+    
+    transcript = "".join(
+        f"User: {html_to_text(message)}\n" if is_user else f"BAAC: {html_to_text(message)}\n"
+        for is_user, message in messages
+    )
+    prompt = f"""
+    You keep a running summary of a conversation between a resident and BAAC, the assistant of Barangay Amungan.
+    Update the summary with the new messages below. Keep names, dates, requested documents, reference numbers
+    and unanswered questions; leave out greetings and formatting.
+    Reply with the updated summary only, in at most {SUMMARY_MAX_WORDS} words.
+    
+    Current summary:
+    {summary or "(none yet)"}
+    
+    New messages:
+    {transcript}
+    """
+    
+    try:
+        new_summary = call_llm(prompt).strip()
+    except (LLMOverloadedError, LLMUnavailableError) as e:
+        # The chat's next turn asks again
+        logger.warning(f"Skipping summary for chat {chat_id}: {e}")
+        return
+    if not new_summary:
+        return
+    
+    connection = get_connection()
+    if connection is None:
+        return
+    
+    try:
+        cursor = connection.cursor()
+        # Only advance from the state we summarized; a concurrent run on another worker wins otherwise
+        cursor.execute("""
+        UPDATE chat_histories
+        SET context_summary = %s, summarized_count = %s
+        WHERE id = %s AND summarized_count = %s
+        """, (new_summary, end, chat_id, summarized))
+        updated = cursor.rowcount
+        connection.commit()
     finally:
         cursor.close()
         return_connection(connection)
+    
+    if updated:
+        chat_context_cache.invalidate(chat_id)
+        # Keep going through a long backlog without waiting for the next turn
+        if total - SUMMARY_KEEP_RECENT > end:
+            chat_summarizer.request(chat_id)
+
+# Background thread that keeps rolling summaries current without delaying chat responses
+chat_summarizer = BackgroundSummarizer(summarize_chat_history)
+
+# One statement per chat turn: bump updated_at only if the user owns the active chat,
+# then insert both messages for the chat row that update returned (none if it returned nothing)
+SAVE_CHAT_TURN_QUERY = """
+WITH owned_chat AS (
+    UPDATE chat_histories
+    SET updated_at = CURRENT_TIMESTAMP
+    WHERE id = %(chat_id)s AND user_id = %(user_id)s AND is_active = TRUE
+    RETURNING id
+),
+saved AS (
+    INSERT INTO chat_messages (chat_id, is_user, message)
+    SELECT owned_chat.id, turn.is_user, turn.message
+    FROM owned_chat,
+         (VALUES (1, TRUE, %(user_message)s), (2, FALSE, %(ai_message)s)) AS turn(position, is_user, message)
+    ORDER BY turn.position
+    RETURNING id
+)
+SELECT COUNT(*) FROM saved
+"""
 
 # Function to save a message to a chat
 def save_message_to_chat(chat_id, user_id, user_message, ai_message):
@@ -652,42 +859,21 @@ def save_message_to_chat(chat_id, user_id, user_message, ai_message):
     
     try:
         cursor = connection.cursor()
+        cursor.execute(SAVE_CHAT_TURN_QUERY, {
+            "chat_id": chat_id,
+            "user_id": user_id,
+            "user_message": user_message,
+            "ai_message": ai_message
+        })
+        saved = cursor.fetchone()[0]
+        connection.commit()
         
-        # First verify the chat belongs to the user
-        verify_query = """
-        SELECT COUNT(*) FROM chat_histories
-        WHERE id = %s AND user_id = %s AND is_active = TRUE
-        """
-        cursor.execute(verify_query, (chat_id, user_id))
-        count = cursor.fetchone()[0]
-        
-        if count == 0:
+        if saved == 0:
             logger.error(f"Chat {chat_id} not found or does not belong to user {user_id}")
             return False
         
-        # Save user message
-        user_query = """
-        INSERT INTO chat_messages (chat_id, is_user, message)
-        VALUES (%s, TRUE, %s)
-        """
-        cursor.execute(user_query, (chat_id, user_message))
-        
-        # Save AI message
-        ai_query = """
-        INSERT INTO chat_messages (chat_id, is_user, message)
-        VALUES (%s, FALSE, %s)
-        """
-        cursor.execute(ai_query, (chat_id, ai_message))
-        
-        # Update the chat's updated_at timestamp
-        update_query = """
-        UPDATE chat_histories
-        SET updated_at = CURRENT_TIMESTAMP
-        WHERE id = %s
-        """
-        cursor.execute(update_query, (chat_id,))
-        
-        connection.commit()
+        # Write-through: the next turn's prompt context comes from memory
+        chat_context_cache.append_turn(chat_id, user_id, html_to_text(user_message), html_to_text(ai_message))
         return True
     except Exception as e:
         logger.error(f"Error saving message to chat: {e}")
@@ -697,6 +883,36 @@ def save_message_to_chat(chat_id, user_id, user_message, ai_message):
         cursor.close()
         return_connection(connection)
 
+# Messages of a chat together with its title, only if the user owns the active chat
+OWNED_CHAT_MESSAGES_QUERY = """
+SELECT ch.title, cm.id, cm.is_user, cm.message, cm.timestamp
+FROM chat_histories ch
+LEFT JOIN chat_messages cm ON cm.chat_id = ch.id
+WHERE ch.id = %s AND ch.user_id = %s AND ch.is_active = TRUE
+ORDER BY cm.timestamp ASC, cm.id ASC
+"""
+
+# Function to fetch a chat's title and messages in one statement; (None, None) if the user doesn't own it
+def fetch_owned_chat_messages(cursor, chat_id, user_id):
+    cursor.execute(OWNED_CHAT_MESSAGES_QUERY, (chat_id, user_id))
+    rows = cursor.fetchall()
+    if not rows:
+        return None, None
+    
+    messages = []
+    for row in rows:
+        # A chat without messages comes back as one row with NULL message columns
+        if row[1] is None:
+            continue
+        messages.append({
+            "id": row[1],
+            "is_user": row[2],
+            "message": row[3],
+            # Format dates for JSON
+            "timestamp": row[4].strftime('%Y-%m-%d %H:%M:%S') if row[4] else None
+        })
+    return rows[0][0], messages
+
 # Function to get messages for a specific chat
 def get_chat_messages_by_id(chat_id, user_id):
     connection = get_connection()
@@ -705,37 +921,12 @@ def get_chat_messages_by_id(chat_id, user_id):
         
     try:
         cursor = connection.cursor(cursor_factory=psycopg2.extras.DictCursor)
+        _, messages = fetch_owned_chat_messages(cursor, chat_id, user_id)
         
-        # First verify the chat belongs to the user
-        verify_query = """
-        SELECT COUNT(*) FROM chat_histories
-        WHERE id = %s AND user_id = %s AND is_active = TRUE
-        """
-        cursor.execute(verify_query, (chat_id, user_id))
-        count = cursor.fetchone()[0]
-        
-        if count == 0:
+        if messages is None:
             logger.error(f"Chat {chat_id} not found or does not belong to user {user_id}")
             return []
         
-        # Get the chat messages
-        query = """
-        SELECT id, is_user, message, timestamp
-        FROM chat_messages
-        WHERE chat_id = %s
-        ORDER BY timestamp ASC
-        """
-        cursor.execute(query, (chat_id,))
-        
-        messages = []
-        for row in cursor.fetchall():
-            message = dict(row)
-            # Format dates for JSON
-            if message.get('timestamp'):
-                message['timestamp'] = message['timestamp'].strftime('%Y-%m-%d %H:%M:%S')
-            
-            messages.append(message)
-        
         return messages
     except Exception as e:
         logger.error(f"Error fetching chat messages: {e}")
@@ -744,135 +935,6 @@ def get_chat_messages_by_id(chat_id, user_id):
         cursor.close()
         return_connection(connection)
 
-# Function to create chat history tables
-def create_chat_history_tables():
-    connection = get_connection()
-    if connection is None:
-        logger.error("Failed to get database connection to create chat history tables")
-        return
-    
-    try:
-        cursor = connection.cursor()
-        
-        # Create chat_histories table if it doesn't exist
-        cursor.execute("""
-        CREATE TABLE IF NOT EXISTS chat_histories (
-            id SERIAL PRIMARY KEY,
-            user_id INTEGER NOT NULL,
-            title VARCHAR(255) NOT NULL DEFAULT 'New Chat',
-            created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
-            updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
-            is_active BOOLEAN NOT NULL DEFAULT TRUE
-        )
-        """)
-        
-        # Check if chat_messages table exists
-        cursor.execute("""
-        SELECT EXISTS (
-            SELECT FROM information_schema.tables 
-            WHERE table_schema = 'public' 
-            AND table_name = 'chat_messages'
-        );
-        """)
-        
-        table_exists = cursor.fetchone()[0]
-        
-        # Only create the chat_messages table if it doesn't exist
-        if not table_exists:
-            logger.info("Creating chat_messages table...")
-            cursor.execute("""
-            CREATE TABLE IF NOT EXISTS chat_messages (
-                id SERIAL PRIMARY KEY,
-                chat_id INTEGER NOT NULL,
-                is_user BOOLEAN NOT NULL,
-                message TEXT NOT NULL,
-                timestamp TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
-                CONSTRAINT chat_messages_chat_id_fkey
-                FOREIGN KEY (chat_id) REFERENCES chat_histories(id) ON DELETE CASCADE
-            );
-            """)
-            
-            # Create index on chat_id for better performance
-            cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_chat_messages_chat_id ON chat_messages(chat_id);
-            """)
-        else:
-            logger.info("chat_messages table already exists, skipping creation")
-        
-        # Add foreign key constraint for chat_histories if it doesn't exist
-        cursor.execute("""
-        SELECT COUNT(*)
-        FROM information_schema.table_constraints
-        WHERE constraint_name = 'chat_histories_user_id_fkey'
-        AND table_name = 'chat_histories'
-        """)
-        
-        if cursor.fetchone()[0] == 0:
-            logger.info("Adding foreign key constraint to chat_histories table...")
-            cursor.execute("""
-            ALTER TABLE chat_histories
-            ADD CONSTRAINT chat_histories_user_id_fkey
-            FOREIGN KEY (user_id) REFERENCES app_users(id) ON DELETE CASCADE
-            """)
-        
-        connection.commit()
-        logger.info("Chat history tables verified successfully")
-    except Exception as e:
-        logger.error(f"Error verifying chat history tables: {e}")
-        connection.rollback()
-    finally:
-        cursor.close()
-        return_connection(connection)
-
-# Function to update user table for email verification
-def update_user_table_for_verification():
-    connection = get_connection()
-    if connection is None:
-        logger.error("Failed to get database connection to update user table")
-        return
-    
-    try:
-        cursor = connection.cursor()
-        
-        # Check if verification columns exist
-        cursor.execute("""
-        SELECT column_name 
-        FROM information_schema.columns 
-        WHERE table_name = 'app_users' AND column_name IN ('is_verified', 'verification_token', 'verification_expires', 'reset_token', 'reset_expires')
-        """)
-        
-        existing_columns = [row[0] for row in cursor.fetchall()]
-        
-        # Add missing columns
-        if 'is_verified' not in existing_columns:
-            cursor.execute("ALTER TABLE app_users ADD COLUMN is_verified BOOLEAN DEFAULT FALSE")
-            logger.info("Added is_verified column to app_users table")
-        
-        if 'verification_token' not in existing_columns:
-            cursor.execute("ALTER TABLE app_users ADD COLUMN verification_token TEXT")
-            logger.info("Added verification_token column to app_users table")
-        
-        if 'verification_expires' not in existing_columns:
-            cursor.execute("ALTER TABLE app_users ADD COLUMN verification_expires TIMESTAMP")
-            logger.info("Added verification_expires column to app_users table")
-            
-        if 'reset_token' not in existing_columns:
-            cursor.execute("ALTER TABLE app_users ADD COLUMN reset_token TEXT")
-            logger.info("Added reset_token column to app_users table")
-        
-        if 'reset_expires' not in existing_columns:
-            cursor.execute("ALTER TABLE app_users ADD COLUMN reset_expires TIMESTAMP")
-            logger.info("Added reset_expires column to app_users table")
-        
-        connection.commit()
-        logger.info("User table updated for email verification and password reset")
-    except Exception as e:
-        logger.error(f"Error updating user table for verification: {e}")
-        connection.rollback()
-    finally:
-        cursor.close()
-        return_connection(connection)
-
 # Function to get user by Google ID
 def get_user_by_google_id(google_id):
     connection = get_connection()
@@ -931,29 +993,6 @@ def store_oauth_token(user_id, provider, token):
     try:
         cursor = connection.cursor()
         
-        # Check if oauth_tokens table exists
-        cursor.execute("""
-        SELECT EXISTS (
-            SELECT FROM information_schema.tables 
-            WHERE table_schema = 'public' 
-            AND table_name = 'oauth_tokens'
-        );
-        """)
-        
-        table_exists = cursor.fetchone()[0]
-        
-        if not table_exists:
-            # Create the oauth_tokens table if it doesn't exist
-            cursor.execute("""
-            CREATE TABLE oauth_tokens (
-                id SERIAL PRIMARY KEY,
-                user_id INTEGER NOT NULL,
-                provider VARCHAR(50) NOT NULL,
-                token TEXT NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-            """)
-            
         # Insert or update the token
         cursor.execute("""
         INSERT INTO oauth_tokens (user_id, provider, token)
@@ -1063,27 +1102,20 @@ def update_chat_title(chat_id, user_id, title):
     try:
         cursor = connection.cursor()
         
-        # First verify the chat belongs to the user
-        verify_query = """
-        SELECT COUNT(*) FROM chat_histories
-        WHERE id = %s AND user_id = %s AND is_active = TRUE
-        """
-        cursor.execute(verify_query, (chat_id, user_id))
-        count = cursor.fetchone()[0]
-        
-        if count == 0:
-            logger.error(f"Chat {chat_id} not found or does not belong to user {user_id}")
-            return False
-        
-        # Update the title
+        # Update the title only if the chat belongs to the user
         update_query = """
         UPDATE chat_histories
         SET title = %s, updated_at = CURRENT_TIMESTAMP
-        WHERE id = %s
+        WHERE id = %s AND user_id = %s AND is_active = TRUE
         """
-        cursor.execute(update_query, (title, chat_id))
-        
+        cursor.execute(update_query, (title, chat_id, user_id))
+        updated = cursor.rowcount
         connection.commit()
+        
+        if updated == 0:
+            logger.error(f"Chat {chat_id} not found or does not belong to user {user_id}")
+            return False
+        chat_context_cache.invalidate(chat_id)
         return True
     except Exception as e:
         logger.error(f"Error updating chat title: {e}")
@@ -1102,27 +1134,20 @@ def delete_chat(chat_id, user_id):
     try:
         cursor = connection.cursor()
         
-        # First verify the chat belongs to the user
-        verify_query = """
-        SELECT COUNT(*) FROM chat_histories
+        # Soft delete the chat only if it belongs to the user
+        delete_query = """
+        UPDATE chat_histories
+        SET is_active = FALSE, updated_at = CURRENT_TIMESTAMP
         WHERE id = %s AND user_id = %s AND is_active = TRUE
         """
-        cursor.execute(verify_query, (chat_id, user_id))
-        count = cursor.fetchone()[0]
+        cursor.execute(delete_query, (chat_id, user_id))
+        deleted = cursor.rowcount
+        connection.commit()
         
-        if count == 0:
+        if deleted == 0:
             logger.error(f"Chat {chat_id} not found or does not belong to user {user_id}")
             return False
-        
-        # Soft delete the chat
-        delete_query = """
-        UPDATE chat_histories
-        SET is_active = FALSE, updated_at = CURRENT_TIMESTAMP
-        WHERE id = %s
-        """
-        cursor.execute(delete_query, (chat_id,))
-        
-        connection.commit()
+        chat_context_cache.invalidate(chat_id)
         return True
     except Exception as e:
         logger.error(f"Error deleting chat: {e}")
@@ -1144,7 +1169,8 @@ def auth_required(f):
         if token:
             payload = verify_token(token)
             if payload:
-                # Set session variables
+                # Set session variables under a fresh session id
+                session.regenerate()
                 session['user_id'] = payload['user_id']
                 session['email'] = payload['email']
                 session['name'] = payload['name']
@@ -1168,7 +1194,8 @@ def is_user_logged_in():
     if token:
         payload = verify_token(token)
         if payload:
-            # Set session variables
+            # Set session variables under a fresh session id
+            session.regenerate()
             session['user_id'] = payload['user_id']
             session['email'] = payload['email']
             session['name'] = payload['name']
@@ -1214,7 +1241,8 @@ def login():
             flash('Please verify your email address before logging in. Check your inbox for the verification link.', 'warning')
             return render_template('login.html')
         
-        # Set session variables
+        # Set session variables under a fresh session id
+        session.regenerate()
         session['user_id'] = user['id']
         session['email'] = user['email']
         session['name'] = user['name']
@@ -1448,7 +1476,8 @@ def google_auth():
     # Store token
     store_oauth_token(user_id, 'google', credential)
     
-    # Set session variables
+    # Set session variables under a fresh session id
+    session.regenerate()
     session['user_id'] = user_id
     session['email'] = email
     session['name'] = name
@@ -1617,10 +1646,8 @@ def reset_password(token):
 # Route for logout
 @app.route('/user_logout')
 def user_logout():
-    # Clear session
-    session.pop('user_id', None)
-    session.pop('email', None)
-    session.pop('name', None)
+    # Clear the session; the stored row and the session cookie are deleted with it
+    session.clear()
     
     # Create response with redirect
     response = make_response(redirect(url_for('index')))
@@ -1638,271 +1665,160 @@ def clear_conversation():
         session.modified = True
     return jsonify({"success": True, "message": "Conversation history cleared"})
 
-# Route to handle API calls and process user queries
-@app.route('/get_response', methods=['POST'])
-def get_response():
-    data = request.json
-    user_prompt = data.get('prompt', '')
-    chat_id = data.get('chat_id')  # New parameter for chat history
-    is_direct_document_request = data.get('isDirectDocumentRequest', False)
-    contains_document_type = data.get('containsDocumentType', False)
-    contains_document_word = data.get('containsDocumentWord', False)
-    contains_interrogative = data.get('containsInterrogative', False)
-    starts_with_interrogative = data.get('startsWithInterrogative', False)
-    requested_doc_type = data.get('requestedDocType')
+# An LLM-backed reply whose prompt is ready but whose text has not been generated yet.
+# `finalize` formats the generated text, persists the turn and returns the JSON payload.
+# `cache_key` is set only when the answer does not depend on conversation history.
+class PendingLLMTurn:
+    def __init__(self, prompt, context, finalize, cache_key=None):
+        self.prompt = prompt
+        self.context = context
+        self.finalize = finalize
+        self.cache_key = cache_key
+
+# Function to call Gemini through the concurrency limiter and quota pacer.
+# Raises LLMOverloadedError when the call should be shed with a 503.
+def call_llm(prompt):
+    with llm_limiter.slot():
+        llm_pacer.acquire(estimate_tokens(prompt))
+        return llm_client.generate_text(prompt)
+
+# Function to generate the text for a pending LLM turn, answering repeated questions from the cache
+def generate_llm_text(turn):
+    if turn.cache_key:
+        cached_text = response_cache.get(turn.cache_key)
+        if cached_text is not None:
+            return cached_text
+
+    # Don't pin a pooled database connection while waiting on Gemini
+    db_connections.release_request_connection()
+
+    # Identical prompts arriving together share one in-flight Gemini call
+    try:
+        text = llm_singleflight.do(fingerprint(turn.context), lambda: call_llm(turn.context))
+    except LLMUnavailableError as e:
+        # Gemini is slow or down: answer from local knowledge instead of pinning the worker
+        logger.warning(f"Serving fallback answer: {e}")
+        return fallback_answer(turn.prompt)
+
+    if turn.cache_key:
+        response_cache.set(turn.cache_key, text)
+    return text
 
-    if not user_prompt:
-        return jsonify({"error": "Prompt is required"}), 400
+# Router that classifies each prompt once and hands it to the first matching handler below
+prompt_router = IntentRouter()
+
+# Keyword intents answered from barangay_history.py
+KNOWLEDGE_INTENTS = ["fiesta", "history", "geography", "demographics_2020", "facilities", "economy", "politics", "schools"]
+
+# The caller's chat and login state, passed to every prompt handler
+class ChatRequest:
+    def __init__(self, chat_id, user_id, is_logged_in):
+        self.chat_id = chat_id
+        self.user_id = user_id
+        self.is_logged_in = is_logged_in
+
+# Handler for historical/geographic/demographic questions answered from barangay_history.py
+@prompt_router.handler('knowledge', precedence=10, when=lambda intent: intent.has(*KNOWLEDGE_INTENTS))
+def handle_knowledge_prompt(intent, chat):
+    user_prompt = intent.prompt
+    chat_id = chat.chat_id
+    user_id = chat.user_id
+    
+    relevant_info = get_relevant_info(user_prompt)
+    if relevant_info:
+        combined_text = "<br><br>".join([f"<h4>{title}</h4><p>{info.strip()}</p>" for title, info in relevant_info])
 
-    try:
-        # Get user ID if logged in
-        user_id = session.get('user_id')
-        is_logged_in = is_user_logged_in()
+        # Optionally log or save
+        if chat_id and user_id:
+            save_message_to_chat(chat_id, user_id, user_prompt, combined_text)
+        else:
+            manage_conversation_history(user_prompt, combined_text)
 
-        # Try to get historical/geographic/demographic data from barangay_history.py
-        from barangay_history import get_relevant_info
-        relevant_info = get_relevant_info(user_prompt)
-        if relevant_info:
-            combined_text = "<br><br>".join([f"<h4>{title}</h4><p>{info.strip()}</p>" for title, info in relevant_info])
+        log_conversation(user_prompt, combined_text, user_id)
+        return {"response": combined_text}
 
-            # Optionally log or save
-            if chat_id and user_id:
-                save_message_to_chat(chat_id, user_id, user_prompt, combined_text)
-            else:
-                manage_conversation_history(user_prompt, combined_text)
-
-            log_conversation(user_prompt, combined_text, user_id)
-            return jsonify({"response": combined_text})
-        
-        # Check for admin authentication but have AI respond naturally
-        parts = user_prompt.split()
-        if len(parts) == 2 and parts[0] == ADMIN_KEY and parts[1] == ADMIN_PASS:
-            # Log admin access attempt
-            log_conversation(user_prompt, "I understand you're asking about administrative access. Let me check that for you.", user_id)
-            session['admin_authenticated'] = True
-            return jsonify({"response": "ADMIN_AUTHENTICATED"})
-        
-        # Check if this is a request for notable places
-        if is_place_request(user_prompt):
-            # Check if user is asking for all places or a specific place
-            user_prompt_lower = user_prompt.lower()
-            
-            # Keywords that indicate they want to see all places
-            all_places_keywords = [
-                "all places", "lahat ng lugar", "mga lugar", "notable places", 
-                "tourist spots", "landmarks", "mga landmark", "show me places",
-                "pictures of places", "images of places", "mga larawan ng lugar"
-            ]
-            
-            # Check if they want to see all places
-            wants_all_places = any(keyword in user_prompt_lower for keyword in all_places_keywords)
-            
-            if wants_all_places:
-                # Show one image from each of the 7 places
-                all_place_images = []
-                place_descriptions = []
-                
-                for place_name in NOTABLE_PLACES.keys():
-                    # Get one random image for each place
-                    images = get_random_images(place_name, 1)
-                    if images:
-                        all_place_images.extend(images)
-                        place_descriptions.append(f"<strong>{place_name.title()}</strong>")
-                
-                if all_place_images:
-                    # Create image HTML
-                    image_html = ""
-                    for i, img_path in enumerate(all_place_images):
-                        image_html += f'<img src="/{img_path}" alt="Notable place in Amungan" style="width: 300px; height: 200px; object-fit: cover; margin: 10px; border-radius: 8px; box-shadow: 0 2px 4px rgba(0,0,0,0.1); cursor: pointer; transition: all 0.3s;" onclick="if(this.style.position === \'fixed\'){{ this.style = \'\'; this.style.width = \'300px\'; this.style.height = \'200px\'; this.style.objectFit = \'cover\'; this.style.margin = \'10px\'; this.style.borderRadius = \'8px\'; this.style.boxShadow = \'0 2px 4px rgba(0,0,0,0.1)\'; this.style.cursor = \'pointer\'; this.style.transition = \'all 0.3s\'; }} else {{ this.style.position = \'fixed\'; this.style.top = \'50%\'; this.style.left = \'50%\'; this.style.transform = \'translate(-50%, -50%)\'; this.style.width = \'90%\'; this.style.height = \'auto\'; this.style.zIndex = \'1000\'; this.style.borderRadius = \'8px\'; this.style.boxShadow = \'0 4px 10px rgba(0,0,0,0.5)\'; this.style.cursor = \'pointer\'; this.style.transition = \'all 0.3s\'; }}">'
-                    
-                    response_text = f"""
-                    <div class="ai-response" style="text-align: justify; line-height: 1.6;">
-                        <p>Here are the notable places in Barangay Amungan! These are some of the important landmarks and locations that serve our community:</p>
-                        <div style="text-align: center; margin: 20px 0;">
-                            {image_html}
-                        </div>
-                        <p>The places shown include: {', '.join(place_descriptions)}. Each of these locations plays an important role in the daily life and development of our barangay.</p>
-                        <p>If you'd like to see more pictures of a specific place, just ask me about it!</p>
-                    </div>
-                    """
-                    
-                    # Save to chat history if chat_id is provided and user is logged in
-                    if chat_id and user_id:
-                        save_message_to_chat(chat_id, user_id, user_prompt, response_text)
-                    else:
-                        # Add to session-based conversation history
-                        manage_conversation_history(user_prompt, response_text)
-                    
-                    log_conversation(user_prompt, response_text, user_id)
-                    return jsonify({"response": response_text})
-            else:
-                # Handle specific place request
-                place_result = handle_place_request(user_prompt)
-                
-                if place_result:
-                    # Create image HTML
-                    image_html = ""
-                    for img_path in place_result['image_paths']:
-                        image_html += f'<img src="/{img_path}" alt="Notable place in Amungan" style="width: 300px; height: 200px; object-fit: cover; margin: 10px; border-radius: 8px; box-shadow: 0 2px 4px rgba(0,0,0,0.1); cursor: pointer; transition: all 0.3s;" onclick="if(this.style.position === \'fixed\'){{ this.style = \'\'; this.style.width = \'300px\'; this.style.height = \'200px\'; this.style.objectFit = \'cover\'; this.style.margin = \'10px\'; this.style.borderRadius = \'8px\'; this.style.boxShadow = \'0 2px 4px rgba(0,0,0,0.1)\'; this.style.cursor = \'pointer\'; this.style.transition = \'all 0.3s\'; }} else {{ this.style.position = \'fixed\'; this.style.top = \'50%\'; this.style.left = \'50%\'; this.style.transform = \'translate(-50%, -50%)\'; this.style.width = \'90%\'; this.style.height = \'auto\'; this.style.zIndex = \'1000\'; this.style.borderRadius = \'8px\'; this.style.boxShadow = \'0 4px 10px rgba(0,0,0,0.5)\'; this.style.cursor = \'pointer\'; this.style.transition = \'all 0.3s\'; }}">'
-                    
-                    response_text = f"""
-                    <div class="ai-response" style="text-align: justify; line-height: 1.6;">
-                        <p>{place_result['text']}</p>
-                        <div style="text-align: center; margin: 20px 0;">
-                            {image_html}
-                        </div>
-                        <p>If you'd like to see other notable places in Barangay Amungan, just ask me to show you all the places!</p>
-                    </div>
-                    """
-                    
-                    # Save to chat history if chat_id is provided and user is logged in
-                    if chat_id and user_id:
-                        save_message_to_chat(chat_id, user_id, user_prompt, response_text)
-                    else:
-                        # Add to session-based conversation history
-                        manage_conversation_history(user_prompt, response_text)
-                    
-                    log_conversation(user_prompt, response_text, user_id)
-                    return jsonify({"response": response_text})
-        
-        # Check if this is a reference number query
-        user_prompt_lower = user_prompt.lower()
-        if "ref-" in user_prompt_lower or "reference" in user_prompt_lower:
-            # Extract reference number using a simple approach
-            words = user_prompt_lower.split()
-            reference_id = None
-            
-            for word in words:
-                if word.startswith("ref-"):
-                    reference_id = word
-                    break
-            
-            if not reference_id:
-                # Try to find any word that contains numbers and might be a reference
-                for word in words:
-                    if "ref" in word or any(char.isdigit() for char in word):
-                        reference_id = word
-                        break
-            
-            if reference_id:
-                # Clean up the reference ID
-                reference_id = ''.join(char for char in reference_id if char.isalnum() or char == '-')
-                logger.info(f"Extracted reference ID from user prompt: {reference_id}")
-                
-                # Get document status
-                doc_status = get_document_status(reference_id)
-                
-                if doc_status:
-                    status = doc_status['status']
-                    document_type = doc_status['document_type'].title()
-                    
-                    if status == 'Approved':
-                        response_text = f"""
-                        <div class="ai-response" style="text-align: justify; line-height: 1.6;">
-                            <p>Good news! Your request for a {document_type} with reference number <strong>{reference_id}</strong> has been <span style="color: green; font-weight: bold;">APPROVED</span>.</p>
-                            <p>You can now visit the Barangay Amungan Hall to claim your document. Please bring a valid ID for verification.</p>
-                            <p>Office hours: Monday to Friday, 8:00 AM to 5:00 PM</p>
-                        </div>
-                        """
-                    elif status == 'Rejected':
-                        response_text = f"""
-                        <div class="ai-response" style="text-align: justify; line-height: 1.6;">
-                            <p>I'm sorry to inform you that your request for a {document_type} with reference number <strong>{reference_id}</strong> has been <span style="color: red; font-weight: bold;">REJECTED</span>.</p>
-                            <p>For more information about why your request was rejected, please visit the Barangay Amungan Hall or contact the barangay office.</p>
-                            <p>Office hours: Monday to Friday, 8:00 AM to 5:00 PM</p>
-                            <p>Contact number: (123) 456-7890</p>
-                        </div>
-                        """
-                    elif status == 'Claimed':
-                        pickup_date = doc_status['pickup_date'].strftime('%B %d, %Y') if doc_status['pickup_date'] else 'Not recorded'
-                        response_text = f"""
-                        <div class="ai-response" style="text-align: justify; line-height: 1.6;">
-                            <p>Our records show that your {document_type} with reference number <strong>{reference_id}</strong> has already been <span style="color: blue; font-weight: bold;">CLAIMED</span> on {pickup_date}.</p>
-                            <p>If you have any questions or concerns, please visit the Barangay Amungan Hall or contact the barangay office.</p>
-                        </div>
-                        """
-                    else:  # Pending or any other status
-                        submission_date = doc_status['submission_date'].strftime('%B %d, %Y')
-                        response_text = f"""
-                        <div class="ai-response" style="text-align: justify; line-height: 1.6;">
-                            <p>Your request for a {document_type} with reference number <strong>{reference_id}</strong> is currently <span style="color: orange; font-weight: bold;">PENDING</span>.</p>
-                            <p>Request date: {submission_date}</p>
-                            <p>Please check back later or visit the Barangay Amungan Hall for updates on your request.</p>
-                            <p>Office hours: Monday to Friday, 8:00 AM to 5:00 PM</p>
-                        </div>
-                        """
-                    
-                    # Save to chat history if chat_id is provided and user is logged in
-                    if chat_id and user_id:
-                        save_message_to_chat(chat_id, user_id, user_prompt, response_text)
-                    else:
-                        # Add to session-based conversation history
-                        manage_conversation_history(user_prompt, response_text)
-                    
-                    log_conversation(user_prompt, response_text, user_id)
-                    return jsonify({"response": response_text})
-                else:
-                    response_text = f"""
-                    <div class="ai-response" style="text-align: justify; line-height: 1.6;">
-                        <p>I couldn't find any document request with the reference number <strong>{reference_id}</strong>.</p>
-                        <p>Please check if you've entered the correct reference number. The format should be REF-[number], for example, REF-123.</p>
-                        <p>If you're sure the reference number is correct, please visit the Barangay Amungan Hall for assistance.</p>
-                    </div>
-                    """
-                    
-                    # Save to chat history if chat_id is provided and user is logged in
-                    if chat_id and user_id:
-                        save_message_to_chat(chat_id, user_id, user_prompt, response_text)
-                    else:
-                        # Add to session-based conversation history
-                        manage_conversation_history(user_prompt, response_text)
-                    
-                    log_conversation(user_prompt, response_text, user_id)
-                    return jsonify({"response": response_text})
-        
-        # Check if this is a general document inquiry without specifying a type
-        if contains_document_word and not contains_document_type:
-            # For general document inquiries, suggest all document types
-            context = """You are BAAC (Barangay Amungan Assistant Chatbot), an assistant chatbot for Barangay Amungan, Iba, Zambales.
-            Always provide helpful and informative responses. Format your response in a clear and professional manner.
-            
-            IMPORTANT: Use HTML formatting for lists and structured content. For lists, use <ul> and <li> tags instead of asterisks or bullet points.
-            For example, instead of:
-            * Item 1
-            * Item 2
+# Handler for admin authentication (the AI responds naturally)
+@prompt_router.handler('admin_login', precedence=20, when=lambda intent: len(intent.words) == 2)
+def handle_admin_login_prompt(intent, chat):
+    user_prompt = intent.prompt
+    user_id = chat.user_id
+    
+    parts = user_prompt.split()
+    if len(parts) == 2 and parts[0] == ADMIN_KEY and parts[1] == ADMIN_PASS:
+        # Log admin access attempt
+        log_conversation(user_prompt, "I understand you're asking about administrative access. Let me check that for you.", user_id)
+        session.regenerate()
+        session['admin_authenticated'] = True
+        return {"response": "ADMIN_AUTHENTICATED"}
+
+# Handler for requests to see notable places
+@prompt_router.handler('places', precedence=30, when=lambda intent: is_place_request(intent.prompt))
+def handle_places_prompt(intent, chat):
+    user_prompt = intent.prompt
+    chat_id = chat.chat_id
+    user_id = chat.user_id
+    
+    # Check if user is asking for all places or a specific place
+    wants_all_places = intent.has("all_places")
+    
+    if wants_all_places:
+        # Show one image from each of the 7 places
+        all_place_images = []
+        place_descriptions = []
+        
+        for place_name in NOTABLE_PLACES.keys():
+            # Get one random image for each place
+            images = get_random_images(place_name, 1)
+            if images:
+                all_place_images.extend(images)
+                place_descriptions.append(f"<strong>{place_name.title()}</strong>")
+        
+        if all_place_images:
+            # Create image HTML
+            image_html = ""
+            for i, img_path in enumerate(all_place_images):
+                image_html += f'<img src="/{img_path}" alt="Notable place in Amungan" style="width: 300px; height: 200px; object-fit: cover; margin: 10px; border-radius: 8px; box-shadow: 0 2px 4px rgba(0,0,0,0.1); cursor: pointer; transition: all 0.3s;" onclick="if(this.style.position === \'fixed\'){{ this.style = \'\'; this.style.width = \'300px\'; this.style.height = \'200px\'; this.style.objectFit = \'cover\'; this.style.margin = \'10px\'; this.style.borderRadius = \'8px\'; this.style.boxShadow = \'0 2px 4px rgba(0,0,0,0.1)\'; this.style.cursor = \'pointer\'; this.style.transition = \'all 0.3s\'; }} else {{ this.style.position = \'fixed\'; this.style.top = \'50%\'; this.style.left = \'50%\'; this.style.transform = \'translate(-50%, -50%)\'; this.style.width = \'90%\'; this.style.height = \'auto\'; this.style.zIndex = \'1000\'; this.style.borderRadius = \'8px\'; this.style.boxShadow = \'0 4px 10px rgba(0,0,0,0.5)\'; this.style.cursor = \'pointer\'; this.style.transition = \'all 0.3s\'; }}">'
             
-            Use:
-            <ul>
-            <li>Item 1</li>
-            <li>Item 2</li>
-            </ul>
-        
-            Answer The user in the language they used.
-            If users ask in ilocano or zambal respond accordingly but still with respect.
-            If users ask about requesting documents, inform them that you can only process requests for Barangay Clearance, Barangay Indigency, and Barangay Residency.
-            If users ask about checking document status, ask them to provide their reference number (e.g., REF-123)."""
+            response_text = f"""
+            <div class="ai-response" style="text-align: justify; line-height: 1.6;">
+                <p>Here are the notable places in Barangay Amungan! These are some of the important landmarks and locations that serve our community:</p>
+                <div style="text-align: center; margin: 20px 0;">
+                    {image_html}
+                </div>
+                <p>The places shown include: {', '.join(place_descriptions)}. Each of these locations plays an important role in the daily life and development of our barangay.</p>
+                <p>If you'd like to see more pictures of a specific place, just ask me about it!</p>
+            </div>
+            """
             
-            # Add conversation history from the specific chat if available
+            # Save to chat history if chat_id is provided and user is logged in
             if chat_id and user_id:
-                context += get_chat_history_context(chat_id, user_id)
+                save_message_to_chat(chat_id, user_id, user_prompt, response_text)
             else:
-                # Otherwise use session-based conversation history
-                context += get_conversation_history_context()
-            
-            context += f"\nUser: {user_prompt}\nBAAC: "
-
-            # Using the older API style but without response_mime_type
-            response = model.generate_content(context)
+                # Add to session-based conversation history
+                manage_conversation_history(user_prompt, response_text)
             
-            # Format the response with HTML
-            formatted_response = format_response_html(response.text)
+            log_conversation(user_prompt, response_text, user_id)
+            return {"response": response_text}
+    else:
+        # Handle specific place request
+        place_result = handle_place_request(user_prompt)
+        
+        if place_result:
+            # Create image HTML
+            image_html = ""
+            for img_path in place_result['image_paths']:
+                image_html += f'<img src="/{img_path}" alt="Notable place in Amungan" style="width: 300px; height: 200px; object-fit: cover; margin: 10px; border-radius: 8px; box-shadow: 0 2px 4px rgba(0,0,0,0.1); cursor: pointer; transition: all 0.3s;" onclick="if(this.style.position === \'fixed\'){{ this.style = \'\'; this.style.width = \'300px\'; this.style.height = \'200px\'; this.style.objectFit = \'cover\'; this.style.margin = \'10px\'; this.style.borderRadius = \'8px\'; this.style.boxShadow = \'0 2px 4px rgba(0,0,0,0.1)\'; this.style.cursor = \'pointer\'; this.style.transition = \'all 0.3s\'; }} else {{ this.style.position = \'fixed\'; this.style.top = \'50%\'; this.style.left = \'50%\'; this.style.transform = \'translate(-50%, -50%)\'; this.style.width = \'90%\'; this.style.height = \'auto\'; this.style.zIndex = \'1000\'; this.style.borderRadius = \'8px\'; this.style.boxShadow = \'0 4px 10px rgba(0,0,0,0.5)\'; this.style.cursor = \'pointer\'; this.style.transition = \'all 0.3s\'; }}">'
             
             response_text = f"""
             <div class="ai-response" style="text-align: justify; line-height: 1.6;">
-                {formatted_response}
+                <p>{place_result['text']}</p>
+                <div style="text-align: center; margin: 20px 0;">
+                    {image_html}
+                </div>
+                <p>If you'd like to see other notable places in Barangay Amungan, just ask me to show you all the places!</p>
             </div>
             """
-
+            
             # Save to chat history if chat_id is provided and user is logged in
             if chat_id and user_id:
                 save_message_to_chat(chat_id, user_id, user_prompt, response_text)
@@ -1910,127 +1826,95 @@ def get_response():
                 # Add to session-based conversation history
                 manage_conversation_history(user_prompt, response_text)
             
-            # Log the conversation
             log_conversation(user_prompt, response_text, user_id)
+            return {"response": response_text}
+
+# Handler for document status lookups by reference number
+@prompt_router.handler('reference', precedence=40, when=lambda intent: intent.has("reference"))
+def handle_reference_prompt(intent, chat):
+    user_prompt = intent.prompt
+    chat_id = chat.chat_id
+    user_id = chat.user_id
+    
+    # Extract reference number using a simple approach
+    words = intent.words
+    reference_id = None
+    
+    for word in words:
+        if word.startswith("ref-"):
+            reference_id = word
+            break
+    
+    if not reference_id:
+        # Try to find any word that contains numbers and might be a reference
+        for word in words:
+            if "ref" in word or any(char.isdigit() for char in word):
+                reference_id = word
+                break
+    
+    if reference_id:
+        # Clean up the reference ID
+        reference_id = ''.join(char for char in reference_id if char.isalnum() or char == '-')
+        logger.info(f"Extracted reference ID from user prompt: {reference_id}")
+        
+        # Get document status
+        doc_status = get_document_status(reference_id)
+        
+        if doc_status:
+            status = doc_status['status']
+            document_type = doc_status['document_type'].title()
             
-            # Return the AI response along with a suggestion for all document types
-            return jsonify({
-                "response": response_text,
-                "suggestAllDocuments": True
-            })
-        
-        # Check if this is a direct document request or if a specific document type was mentioned
-        # But make sure it's not an interrogative question
-        if is_direct_document_request and not starts_with_interrogative:
-            # Use the requested document type from the frontend if available
-            requested_document = requested_doc_type
-            
-            # If not available, try to detect it from the prompt
-            if not requested_document:
-                requested_document = detect_document_type(user_prompt)
-            
-            if requested_document:
-                # Check if user is logged in
-                if not is_logged_in:
-                    # User is not logged in, return a response with login/signup buttons
-                    response_text = f"""
-                    <div class="ai-response" style="text-align: justify; line-height: 1.6;">
-                        <p>I'd be happy to help you request a {requested_document.title()}. However, you need to be logged in to submit document requests.</p>
-                        <div class="auth-buttons-container" style="margin-top: 15px; display: flex; gap: 10px;">
-                            <button onclick="window.location.href='/login'" class="auth-button login-button" style="background-color: #4CAF50; color: white; border: none; padding: 10px 15px; border-radius: 5px; cursor: pointer; font-weight: bold;">Login</button>
-                            <button onclick="window.location.href='/register'" class="auth-button register-button" style="background-color: #2196F3; color: white; border: none; padding: 10px 15px; border-radius: 5px; cursor: pointer; font-weight: bold;">Sign Up</button>
-                        </div>
-                        <p style="margin-top: 10px; font-size: 0.9em; color: #666;">Creating an account allows you to track the status of your document requests and access your request history.</p>
-                    </div>
-                    """
-                    
-                    # Add to session-based conversation history
-                    manage_conversation_history(user_prompt, response_text)
-                    
-                    # Log the conversation
-                    log_conversation(user_prompt, response_text, None)
-                    
-                    return jsonify({
-                        "response": response_text,
-                        "requiresAuth": True,
-                        "documentType": requested_document
-                    })
-                
-                # User is logged in, provide response with form button
-                document_title = requested_document.title()
-                log_document_request(document_title)
-                
-                # Create a response with form button
+            if status == 'Approved':
                 response_text = f"""
                 <div class="ai-response" style="text-align: justify; line-height: 1.6;">
-                    <p>I can help you request a <strong>{document_title}</strong>. This document is commonly used for various purposes such as employment, business permits, and other official transactions.</p>
-                    <p>To proceed with your request, please click the button below to fill out the required information:</p>
-                    <div style="margin: 20px 0; text-align: center;">
-                        <button onclick="showDocumentForm('{requested_document}')" class="document-request-btn" style="background-color: #e53935; color: white; border: none; padding: 12px 24px; border-radius: 8px; font-size: 16px; font-weight: 600; cursor: pointer; box-shadow: 0 2px 4px rgba(0,0,0,0.2); transition: all 0.3s ease;">
-                            📄 Request {document_title}
-                        </button>
-                    </div>
-                    <p style="font-size: 14px; color: #666;">Processing time is typically 3-5 business days. You will receive a reference number to track your request.</p>
+                    <p>Good news! Your request for a {document_type} with reference number <strong>{reference_id}</strong> has been <span style="color: green; font-weight: bold;">APPROVED</span>.</p>
+                    <p>You can now visit the Barangay Amungan Hall to claim your document. Please bring a valid ID for verification.</p>
+                    <p>Office hours: Monday to Friday, 8:00 AM to 5:00 PM</p>
+                </div>
+                """
+            elif status == 'Rejected':
+                response_text = f"""
+                <div class="ai-response" style="text-align: justify; line-height: 1.6;">
+                    <p>I'm sorry to inform you that your request for a {document_type} with reference number <strong>{reference_id}</strong> has been <span style="color: red; font-weight: bold;">REJECTED</span>.</p>
+                    <p>For more information about why your request was rejected, please visit the Barangay Amungan Hall or contact the barangay office.</p>
+                    <p>Office hours: Monday to Friday, 8:00 AM to 5:00 PM</p>
+                    <p>Contact number: (123) 456-7890</p>
+                </div>
+                """
+            elif status == 'Claimed':
+                pickup_date = doc_status['pickup_date'].strftime('%B %d, %Y') if doc_status['pickup_date'] else 'Not recorded'
+                response_text = f"""
+                <div class="ai-response" style="text-align: justify; line-height: 1.6;">
+                    <p>Our records show that your {document_type} with reference number <strong>{reference_id}</strong> has already been <span style="color: blue; font-weight: bold;">CLAIMED</span> on {pickup_date}.</p>
+                    <p>If you have any questions or concerns, please visit the Barangay Amungan Hall or contact the barangay office.</p>
+                </div>
+                """
+            else:  # Pending or any other status
+                submission_date = doc_status['submission_date'].strftime('%B %d, %Y')
+                response_text = f"""
+                <div class="ai-response" style="text-align: justify; line-height: 1.6;">
+                    <p>Your request for a {document_type} with reference number <strong>{reference_id}</strong> is currently <span style="color: orange; font-weight: bold;">PENDING</span>.</p>
+                    <p>Request date: {submission_date}</p>
+                    <p>Please check back later or visit the Barangay Amungan Hall for updates on your request.</p>
+                    <p>Office hours: Monday to Friday, 8:00 AM to 5:00 PM</p>
                 </div>
                 """
-                
-                # Save to chat history if chat_id is provided and user is logged in
-                if chat_id and user_id:
-                    save_message_to_chat(chat_id, user_id, user_prompt, response_text)
-                else:
-                    # Add to session-based conversation history
-                    manage_conversation_history(user_prompt, response_text)
-                
-                return jsonify({
-                    "response": response_text,
-                    "showFormButton": True,
-                    "formType": requested_document
-                })
-        
-        # Check if query is about barangay officials or population
-        if is_about_officials(user_prompt) or is_about_population(user_prompt):
-            # Create a context with the correct officials and population information
-            context = f"""You are BAAC (Barangay Amungan Assistant Chatbot), an assistant chatbot for Barangay Amungan, Iba, Zambales.
-            Always provide helpful and informative responses. Format your response in a clear and professional manner.
-            
-            IMPORTANT: Use HTML formatting for lists and structured content. For lists, use <ul> and <li> tags instead of asterisks or bullet points.
-            For example, instead of:
-            * Item 1
-            * Item 2
-            
-            Use:
-            <ul>
-            <li>Item 1</li>
-            <li>Item 2</li>
-            </ul>
-            
-            Here is the accurate information about Barangay Amungan that you should use in your response:
-            {BARANGAY_OFFICIALS_INFO}
-            
-            If the user is asking about the Punong Barangay, remember they might refer to this position as Captain, Kapitan, Cap, or Kap.
-            If the user is asking about the Sangguniang Kabataan (SK), provide information about the SK officials listed above.
-            If the user is asking about Purok Presidents or Purok Leaders, provide information about the specific purok they're asking about or list all 14 purok presidents.
-            If the user is asking about population or demographics, provide the relevant information from the population data.
-            """
             
-            # Add conversation history from the specific chat if available
+            # Save to chat history if chat_id is provided and user is logged in
             if chat_id and user_id:
-                context += get_chat_history_context(chat_id, user_id)
+                save_message_to_chat(chat_id, user_id, user_prompt, response_text)
             else:
-                # Otherwise use session-based conversation history
-                context += get_conversation_history_context()
-            
-            context += f"\nUser: {user_prompt}\nBAAC:"
-            
-            # Generate response using the AI model with the officials information
-            response = model.generate_content(context)
-            
-            # Format the response with HTML
-            formatted_response = format_response_html(response.text)
+                # Add to session-based conversation history
+                manage_conversation_history(user_prompt, response_text)
             
+            log_conversation(user_prompt, response_text, user_id)
+            return {"response": response_text}
+        else:
             response_text = f"""
             <div class="ai-response" style="text-align: justify; line-height: 1.6;">
-                {formatted_response}
+                <p>I couldn't find any document request with the reference number <strong>{reference_id}</strong>.</p>
+                <p>Please check if you've entered the correct reference number. The format should be REF-[number], for example, REF-123.</p>
+                <p>If you're sure the reference number is correct, please visit the Barangay Amungan Hall for assistance.</p>
             </div>
             """
             
@@ -2041,69 +1925,306 @@ def get_response():
                 # Add to session-based conversation history
                 manage_conversation_history(user_prompt, response_text)
             
-            # Log the conversation
             log_conversation(user_prompt, response_text, user_id)
-            
-            return jsonify({"response": response_text})
-        
-        # For interrogative queries or general document inquiries, use the AI model
-        context = """You are BAAC (Barangay Amungan Assistant Chatbot), an assistant chatbot for Barangay Amungan, Iba, Zambales.
-        Always provide helpful and informative responses. Format your response in a clear and professional manner.
-        You are a large language model trained by Students from President Ramon Magsaysay State University (PRMSU)
-        You are a pre existing model that was trained by students as BAAC (Barangay Amungan Assistant Chatbot) to be able to assist residents and staff of the barangay
-        IMPORTANT: Use HTML formatting for lists and structured content. For lists, use <ul> and <li> tags instead of asterisks or bullet points.
-        For example, instead of:
-        * Item 1
-        * Item 2
-        
-        Use:
-        <ul>
-        <li>Item 1</li>
-        <li>Item 2</li>
-        </ul>
-        
-        IMPORTANT: You will primarily use English or Tagalog Based on the user's question or prompt.
-        Avoid sending the word "html" since it is somehow counts as error?
-        Avoid sending ``html as response
-        If users ask about requesting documents, inform them that you can only process requests for Barangay Clearance, Barangay Indigency, and Barangay Residency.
-        If users ask about checking document status, ask them to provide their reference number (e.g., REF-123)."""
-        
-        # Add barangay officials and population information to the context
-        context += f"""
+            return {"response": response_text}
+
+# Handler for general document inquiries without a specific type
+@prompt_router.handler('document_inquiry', precedence=50, when=lambda intent: intent.flags.get('contains_document_word') and not intent.flags.get('contains_document_type'))
+def handle_document_inquiry_prompt(intent, chat):
+    user_prompt = intent.prompt
+    chat_id = chat.chat_id
+    user_id = chat.user_id
+    
+    # For general document inquiries, suggest all document types
+    context = """You are BAAC (Barangay Amungan Assistant Chatbot), an assistant chatbot for Barangay Amungan, Iba, Zambales.
+    Always provide helpful and informative responses. Format your response in a clear and professional manner.
+    
+    IMPORTANT: Use HTML formatting for lists and structured content. For lists, use <ul> and <li> tags instead of asterisks or bullet points.
+    For example, instead of:
+    * Item 1
+    * Item 2
+    
+    Use:
+    <ul>
+    <li>Item 1</li>
+    <li>Item 2</li>
+    </ul>
+
+    Answer The user in the language they used.
+    If users ask in ilocano or zambal respond accordingly but still with respect.
+    If users ask about requesting documents, inform them that you can only process requests for Barangay Clearance, Barangay Indigency, and Barangay Residency.
+    If users ask about checking document status, ask them to provide their reference number (e.g., REF-123)."""
+    
+    # Add conversation history from the specific chat if available
+    knowledge = context
+    if chat_id and user_id:
+        history_context = get_chat_history_context(chat_id, user_id)
+    else:
+        # Otherwise use session-based conversation history
+        history_context = get_conversation_history_context()
+    context += history_context
+    
+    context += f"\nUser: {user_prompt}\nBAAC: "
+
+    def finalize_document_inquiry(ai_text):
+        # Format the response with HTML
+        formatted_response = format_response_html(ai_text)
         
-        Here is the accurate information about Barangay Amungan that you should use if the user asks about officials, puroks, or population:
-        {BARANGAY_OFFICIALS_INFO}
+        response_text = f"""
+        <div class="ai-response" style="text-align: justify; line-height: 1.6;">
+            {formatted_response}
+        </div>
         """
+
+        # Save to chat history if chat_id is provided and user is logged in
+        if chat_id and user_id:
+            save_message_to_chat(chat_id, user_id, user_prompt, response_text)
+        else:
+            # Add to session-based conversation history
+            manage_conversation_history(user_prompt, response_text)
         
-        # Add notable places information to the context
-        context += f"""
+        # Log the conversation
+        log_conversation(user_prompt, response_text, user_id)
         
-        If users ask about places, locations, or want to see pictures of notable places in Barangay Amungan, you can show them images of these locations:
-        - Amungan Elementary School
-        - Amungan Market  
-        - Amungan National High School
-        - Barangay Hall
-        - Barangay Health Center
-        - Plaza Mercado
+        # Return the AI response along with a suggestion for all document types
+        return {
+            "response": response_text,
+            "suggestAllDocuments": True
+        }
 
-        Important: The user might ask images in a different way refer to the view_keywords.
+    # Only turns without conversation history are safe to answer from the cache
+    cache_key = None if history_context else make_cache_key(user_prompt, "general-document", knowledge)
+    return PendingLLMTurn(user_prompt, context, finalize_document_inquiry, cache_key)
+
+# Handler for direct document requests (but not interrogative questions)
+@prompt_router.handler('document_request', precedence=60, when=lambda intent: intent.flags.get('is_direct_document_request') and not intent.flags.get('starts_with_interrogative'))
+def handle_document_request_prompt(intent, chat):
+    user_prompt = intent.prompt
+    chat_id = chat.chat_id
+    user_id = chat.user_id
+    is_logged_in = chat.is_logged_in
+    requested_doc_type = intent.flags.get('requested_doc_type')
+    
+    # Use the requested document type from the frontend if available
+    requested_document = requested_doc_type
+    
+    # If not available, try to detect it from the prompt
+    if not requested_document:
+        requested_document = detect_document_type(user_prompt)
+    
+    if requested_document:
+        # Check if user is logged in
+        if not is_logged_in:
+            # User is not logged in, return a response with login/signup buttons
+            response_text = f"""
+            <div class="ai-response" style="text-align: justify; line-height: 1.6;">
+                <p>I'd be happy to help you request a {requested_document.title()}. However, you need to be logged in to submit document requests.</p>
+                <div class="auth-buttons-container" style="margin-top: 15px; display: flex; gap: 10px;">
+                    <button onclick="window.location.href='/login'" class="auth-button login-button" style="background-color: #4CAF50; color: white; border: none; padding: 10px 15px; border-radius: 5px; cursor: pointer; font-weight: bold;">Login</button>
+                    <button onclick="window.location.href='/register'" class="auth-button register-button" style="background-color: #2196F3; color: white; border: none; padding: 10px 15px; border-radius: 5px; cursor: pointer; font-weight: bold;">Sign Up</button>
+                </div>
+                <p style="margin-top: 10px; font-size: 0.9em; color: #666;">Creating an account allows you to track the status of your document requests and access your request history.</p>
+            </div>
+            """
+            
+            # Add to session-based conversation history
+            manage_conversation_history(user_prompt, response_text)
+            
+            # Log the conversation
+            log_conversation(user_prompt, response_text, None)
+            
+            return {
+                "response": response_text,
+                "requiresAuth": True,
+                "documentType": requested_document
+            }
+        
+        # User is logged in, provide response with form button
+        document_title = requested_document.title()
+        log_document_request(document_title)
+        
+        # Create a response with form button
+        response_text = f"""
+        <div class="ai-response" style="text-align: justify; line-height: 1.6;">
+            <p>I can help you request a <strong>{document_title}</strong>. This document is commonly used for various purposes such as employment, business permits, and other official transactions.</p>
+            <p>To proceed with your request, please click the button below to fill out the required information:</p>
+            <div style="margin: 20px 0; text-align: center;">
+                <button onclick="showDocumentForm('{requested_document}')" class="document-request-btn" style="background-color: #e53935; color: white; border: none; padding: 12px 24px; border-radius: 8px; font-size: 16px; font-weight: 600; cursor: pointer; box-shadow: 0 2px 4px rgba(0,0,0,0.2); transition: all 0.3s ease;">
+                    📄 Request {document_title}
+                </button>
+            </div>
+            <p style="font-size: 14px; color: #666;">Processing time is typically 3-5 business days. You will receive a reference number to track your request.</p>
+        </div>
         """
         
-        # Add conversation history from the specific chat if available
+        # Save to chat history if chat_id is provided and user is logged in
         if chat_id and user_id:
-            context += get_chat_history_context(chat_id, user_id)
+            save_message_to_chat(chat_id, user_id, user_prompt, response_text)
         else:
-            # Otherwise use session-based conversation history
-            context += get_conversation_history_context()
+            # Add to session-based conversation history
+            manage_conversation_history(user_prompt, response_text)
         
-        context += f"\nUser: {user_prompt}\nBAAC: "
+        return {
+            "response": response_text,
+            "showFormButton": True,
+            "formType": requested_document
+        }
 
-        # Using the older API style but without response_mime_type
-        response = model.generate_content(context)
+# Handler for questions about barangay officials or population
+@prompt_router.handler('officials', precedence=70, when=lambda intent: intent.has("officials", "population"))
+def handle_officials_prompt(intent, chat):
+    user_prompt = intent.prompt
+    chat_id = chat.chat_id
+    user_id = chat.user_id
+    
+    # Answer simple lookups (names, purok presidents, population counts) from the parsed records
+    local_answer = answer_locally(user_prompt)
+    if local_answer:
+        # Save to chat history if chat_id is provided and user is logged in
+        if chat_id and user_id:
+            save_message_to_chat(chat_id, user_id, user_prompt, local_answer)
+        else:
+            # Add to session-based conversation history
+            manage_conversation_history(user_prompt, local_answer)
+        
+        # Log the conversation
+        log_conversation(user_prompt, local_answer, user_id)
         
+        return {"response": local_answer}
+    
+    # Create a context with the correct officials and population information
+    context = f"""You are BAAC (Barangay Amungan Assistant Chatbot), an assistant chatbot for Barangay Amungan, Iba, Zambales.
+    Always provide helpful and informative responses. Format your response in a clear and professional manner.
+    
+    IMPORTANT: Use HTML formatting for lists and structured content. For lists, use <ul> and <li> tags instead of asterisks or bullet points.
+    For example, instead of:
+    * Item 1
+    * Item 2
+    
+    Use:
+    <ul>
+    <li>Item 1</li>
+    <li>Item 2</li>
+    </ul>
+    
+    Here is the accurate information about Barangay Amungan that you should use in your response:
+    {BARANGAY_OFFICIALS_INFO}
+    
+    If the user is asking about the Punong Barangay, remember they might refer to this position as Captain, Kapitan, Cap, or Kap.
+    If the user is asking about the Sangguniang Kabataan (SK), provide information about the SK officials listed above.
+    If the user is asking about Purok Presidents or Purok Leaders, provide information about the specific purok they're asking about or list all 14 purok presidents.
+    If the user is asking about population or demographics, provide the relevant information from the population data.
+    """
+    
+    # Add conversation history from the specific chat if available
+    knowledge = context
+    if chat_id and user_id:
+        history_context = get_chat_history_context(chat_id, user_id)
+    else:
+        # Otherwise use session-based conversation history
+        history_context = get_conversation_history_context()
+    context += history_context
+    
+    context += f"\nUser: {user_prompt}\nBAAC:"
+    
+    def finalize_officials_answer(ai_text):
         # Format the response with HTML
-        formatted_response = format_response_html(response.text)
+        formatted_response = format_response_html(ai_text)
         
+        response_text = f"""
+        <div class="ai-response" style="text-align: justify; line-height: 1.6;">
+            {formatted_response}
+        </div>
+        """
+        
+        # Save to chat history if chat_id is provided and user is logged in
+        if chat_id and user_id:
+            save_message_to_chat(chat_id, user_id, user_prompt, response_text)
+        else:
+            # Add to session-based conversation history
+            manage_conversation_history(user_prompt, response_text)
+        
+        # Log the conversation
+        log_conversation(user_prompt, response_text, user_id)
+        
+        return {"response": response_text}
+
+    # Generate response using the AI model with the officials information.
+    # Only turns without conversation history are safe to answer from the cache
+    cache_key = None if history_context else make_cache_key(user_prompt, "officials-population", knowledge)
+    return PendingLLMTurn(user_prompt, context, finalize_officials_answer, cache_key)
+
+# Handler for interrogative queries and everything else, answered by the AI model
+@prompt_router.handler('general', precedence=100)
+def handle_general_prompt(intent, chat):
+    user_prompt = intent.prompt
+    chat_id = chat.chat_id
+    user_id = chat.user_id
+    is_logged_in = chat.is_logged_in
+    is_direct_document_request = intent.flags.get('is_direct_document_request')
+    contains_document_type = intent.flags.get('contains_document_type')
+    requested_doc_type = intent.flags.get('requested_doc_type')
+    
+    context = """You are BAAC (Barangay Amungan Assistant Chatbot), an assistant chatbot for Barangay Amungan, Iba, Zambales.
+    Always provide helpful and informative responses. Format your response in a clear and professional manner.
+    You are a large language model trained by Students from President Ramon Magsaysay State University (PRMSU)
+    You are a pre existing model that was trained by students as BAAC (Barangay Amungan Assistant Chatbot) to be able to assist residents and staff of the barangay
+    IMPORTANT: Use HTML formatting for lists and structured content. For lists, use <ul> and <li> tags instead of asterisks or bullet points.
+    For example, instead of:
+    * Item 1
+    * Item 2
+    
+    Use:
+    <ul>
+    <li>Item 1</li>
+    <li>Item 2</li>
+    </ul>
+    
+    IMPORTANT: You will primarily use English or Tagalog Based on the user's question or prompt.
+    Avoid sending the word "html" since it is somehow counts as error?
+    Avoid sending ``html as response
+    If users ask about requesting documents, inform them that you can only process requests for Barangay Clearance, Barangay Indigency, and Barangay Residency.
+    If users ask about checking document status, ask them to provide their reference number (e.g., REF-123)."""
+    
+    # Add only the barangay knowledge passages that are relevant to this question
+    passages = retrieve_passages(user_prompt, k=KNOWLEDGE_TOP_K)
+    if passages:
+        context += f"""
+    
+    Here is accurate information about Barangay Amungan that you should use if it is relevant to the user's question:
+    {format_passages(passages)}
+    """
+    
+    # Add notable places information to the context when the user mentions places or pictures
+    if any(name.startswith("place") for name in intent.matches.positions):
+        context += f"""
+    
+    If users ask about places, locations, or want to see pictures of notable places in Barangay Amungan, you can show them images of these locations:
+    - Amungan Elementary School
+    - Amungan Market  
+    - Amungan National High School
+    - Barangay Hall
+    - Barangay Health Center
+    - Plaza Mercado
+
+    Important: The user might ask images in a different way refer to the view_keywords.
+    """
+    
+    # Add conversation history from the specific chat if available
+    knowledge = context
+    if chat_id and user_id:
+        history_context = get_chat_history_context(chat_id, user_id)
+    else:
+        # Otherwise use session-based conversation history
+        history_context = get_conversation_history_context()
+    context += history_context
+    
+    context += f"\nUser: {user_prompt}\nBAAC: "
+
+    def finalize_general_answer(ai_text):
+        # Format the response with HTML
+        formatted_response = format_response_html(ai_text)
+    
         response_text = f"""
         <div class="ai-response" style="text-align: justify; line-height: 1.6;">
             {formatted_response}
@@ -2121,22 +2242,22 @@ def get_response():
         result = {
             "response": response_text
         }
-        
+    
         # If the query contains a document type but wasn't handled as a direct request,
         # and the AI response mentions documents, suggest a form
         if contains_document_type and not is_direct_document_request:
             # Try to detect which document was mentioned
             doc_type = requested_doc_type or detect_document_type(user_prompt)
-            
+        
             if doc_type:
                 # Check if the AI response mentions documents or the specific document type
-                response_lower = response.text.lower()
+                response_lower = ai_text.lower()
                 if (doc_type in response_lower or 
                     "document" in response_lower or 
                     "clearance" in response_lower or 
                     "indigency" in response_lower or 
                     "residency" in response_lower):
-                    
+                
                     # Check if user is logged in before suggesting the form
                     if is_logged_in:
                         result["suggestForm"] = True
@@ -2149,12 +2270,218 @@ def get_response():
         # Log the conversation
         log_conversation(user_prompt, response_text, user_id)
 
-        return jsonify(result)
+        return result
+
+    # Only turns without conversation history are safe to answer from the cache
+    cache_key = None if history_context else make_cache_key(user_prompt, "generic", knowledge)
+    return PendingLLMTurn(user_prompt, context, finalize_general_answer, cache_key)
+
+# Function to route a user prompt to the right answer source.
+# Returns either a finished JSON payload (dict) or a PendingLLMTurn for the LLM branches.
+def resolve_prompt(data):
+    flags = {
+        'is_direct_document_request': data.get('isDirectDocumentRequest', False),
+        'contains_document_type': data.get('containsDocumentType', False),
+        'contains_document_word': data.get('containsDocumentWord', False),
+        'contains_interrogative': data.get('containsInterrogative', False),
+        'starts_with_interrogative': data.get('startsWithInterrogative', False),
+        'requested_doc_type': data.get('requestedDocType')
+    }
+    
+    # Chat and login state of the caller
+    chat = ChatRequest(data.get('chat_id'), session.get('user_id'), is_user_logged_in())
+    
+    return prompt_router.route(data.get('prompt', ''), flags, chat)
+
+# Function to build the quick 503 used when LLM calls are being shed
+def overloaded_response(error):
+    logger.warning(f"Shedding LLM request: {error}")
+    response = jsonify({
+        "error": f"BAAC is handling a lot of questions right now. Please try again in {error.retry_after} seconds.",
+        "retryAfter": error.retry_after
+    })
+    response.status_code = 503
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response
 
+# Function to format a Server-Sent Events frame
+def format_sse_event(event, payload):
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+# Route to handle API calls and process user queries
+@app.route('/get_response', methods=['POST'])
+def get_response():
+    data = request.json
+    user_prompt = data.get('prompt', '')
+
+    if not user_prompt:
+        return jsonify({"error": "Prompt is required"}), 400
+
+    try:
+        turn = resolve_prompt(data)
+        if isinstance(turn, PendingLLMTurn):
+            turn = turn.finalize(generate_llm_text(turn))
+
+        return jsonify(turn)
+
+    except LLMOverloadedError as e:
+        return overloaded_response(e)
     except Exception as e:
         logger.error(f"Error in get_response: {str(e)}")
         return jsonify({"error": f"An error occurred while processing the request: {str(e)}"}), 500
 
+# Route to stream LLM answers to the chat UI as Server-Sent Events.
+# Emits "chunk" events with raw model text while Gemini is generating, then a single
+# "done" event carrying the same payload /get_response would have returned.
+@app.route('/get_response/stream', methods=['POST'])
+def get_response_stream():
+    data = request.json
+    user_prompt = data.get('prompt', '')
+
+    if not user_prompt:
+        return jsonify({"error": "Prompt is required"}), 400
+
+    try:
+        turn = resolve_prompt(data)
+    except Exception as e:
+        logger.error(f"Error in get_response_stream: {str(e)}")
+        return jsonify({"error": f"An error occurred while processing the request: {str(e)}"}), 500
+
+    is_llm_turn = isinstance(turn, PendingLLMTurn)
+    cached_text = response_cache.get(turn.cache_key) if is_llm_turn and turn.cache_key else None
+
+    # Admission control happens before the 200 is sent so shed requests still get a quick 503.
+    # The slot is held until the stream is closed.
+    slot_token = None
+    if is_llm_turn and cached_text is None:
+        try:
+            slot_token = llm_limiter.acquire()
+            llm_pacer.acquire(estimate_tokens(turn.context))
+        except LLMOverloadedError as e:
+            if slot_token is not None:
+                llm_limiter.release(slot_token)
+            return overloaded_response(e)
+
+    # Guest history is written to the session store after the stream ends, when the headers are long gone,
+    # so make sure the session id cookie goes out with them (setdefault would mark the session modified
+    # even when the key is already there)
+    if is_llm_turn and not (data.get('chat_id') and session.get('user_id')) and 'conversation_history' not in session:
+        session['conversation_history'] = []
+
+    # Don't pin a pooled database connection while Gemini streams: store the session now rather than
+    # after the view returns, which would check the request's connection out again for the whole stream
+    if is_llm_turn and cached_text is None:
+        if session:
+            app.session_interface.persist(app, session)
+        db_connections.release_request_connection()
+
+    # Function to finalize the turn and store any session history it added
+    def finish(text):
+        payload = turn.finalize(text)
+        if session.modified:
+            app.session_interface.persist(app, session)
+        return payload
+
+    def generate():
+        # Non-LLM branches (places, document status, forms) are already complete
+        if not is_llm_turn:
+            yield format_sse_event("done", turn)
+            return
+
+        # Repeated questions are answered from the cache in a single chunk
+        if cached_text is not None:
+            yield format_sse_event("chunk", {"text": cached_text})
+            yield format_sse_event("done", finish(cached_text))
+            return
+
+        # Identical prompts arriving together share one Gemini stream; the others get its text in one chunk
+        chunks = []
+        try:
+            for text in llm_singleflight.stream(fingerprint(turn.context), lambda: llm_client.stream_text(turn.context)):
+                chunks.append(text)
+                yield format_sse_event("chunk", {"text": text})
+
+            # Persist the final text once the stream completes
+            text = "".join(chunks)
+            if turn.cache_key and text:
+                response_cache.set(turn.cache_key, text)
+            yield format_sse_event("done", finish(text))
+        except LLMUnavailableError as e:
+            if chunks:
+                logger.error(f"Error while streaming response: {str(e)}")
+                yield format_sse_event("error", {"error": f"An error occurred while processing the request: {str(e)}"})
+                return
+
+            # Nothing was shown yet: answer from local knowledge instead
+            logger.warning(f"Serving fallback answer: {e}")
+            text = fallback_answer(turn.prompt)
+            yield format_sse_event("chunk", {"text": text})
+            yield format_sse_event("done", finish(text))
+        except Exception as e:
+            logger.error(f"Error while streaming response: {str(e)}")
+            yield format_sse_event("error", {"error": f"An error occurred while processing the request: {str(e)}"})
+
+    response = Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'
+        }
+    )
+    if slot_token is not None:
+        response.call_on_close(lambda: llm_limiter.release(slot_token))
+    return response
+
+# Function to build the chat message shown after a document request is submitted
+def document_submission_response(document_types, reference_number):
+    # Create success response message
+    if len(document_types) == 1:
+        doc_name = document_types[0].title()
+        response_text = f"""
+        <div class="ai-response" style="text-align: justify; line-height: 1.6;">
+            <p><strong>🎉 Document Request Submitted Successfully!</strong></p>
+            <p>Your request for a <strong>{doc_name}</strong> has been submitted and is now being processed.</p>
+            <p><strong>Reference Number:</strong> {reference_number}</p>
+            <p>Please save this reference number for tracking your request status.</p>
+            <p><strong>Processing time:</strong> Typically 3–5 business days. You will be notified when your document is ready for pickup.</p>
+        </div>
+        """
+    else:
+        doc_list = ", ".join([doc.title() for doc in document_types])
+        response_text = f"""
+        <div class="ai-response" style="text-align: justify; line-height: 1.6;">
+            <p><strong>🎉 Multiple Document Requests Submitted Successfully!</strong></p>
+            <p>Your requests for the following documents have been submitted and are now being processed:</p>
+            <ul style="margin: 10px 0; padding-left: 20px;">
+                {"".join([f"<li><strong>{doc.title()}</strong></li>" for doc in document_types])}
+            </ul>
+            <p><strong>Reference Number:</strong> {reference_number}</p>
+            <p>Please save this reference number for tracking your request status.</p>
+            <p><strong>Processing time:</strong> Typically 3–5 business days. You will be notified when your documents are ready for pickup.</p>
+        </div>
+        """
+    return response_text
+
+# Submission already made with this idempotency key, as (id, document_types)
+SUBMISSION_BY_KEY_QUERY = """
+SELECT id, document_types FROM document_submissions
+WHERE user_id = %s AND idempotency_key = %s
+"""
+
+# Function to answer a retried submission with the original reference number and the current quota,
+# so the client's copy limits are as fresh as after the original response
+def replay_document_submission(cursor, user_id, document_id, document_types):
+    reference_number = f"REF-{document_id}"
+    logger.info(f"Replaying document submission {reference_number} for a retried request")
+    return jsonify({
+        "success": True,
+        "response": document_submission_response(document_types, reference_number),
+        "reference_number": reference_number,
+        "limits": daily_limit_usage(cursor, DAILY_COPY_LIMITS, user_id, datetime.now().date()),
+        "replayed": True
+    })
+
 # Route to submit document requests
 @app.route('/submit_document', methods=['POST'])
 @auth_required
@@ -2177,6 +2504,20 @@ def submit_document():
     if not all([document_types, date, purpose]):
         return jsonify({"error": "All fields are required"}), 400
 
+    # Each type is counted once per submission, so duplicates in the list don't matter
+    document_types = list(dict.fromkeys(document_types))
+    unknown_types = [doc_type for doc_type in document_types if doc_type not in DAILY_COPY_LIMITS]
+    if unknown_types:
+        return jsonify({"error": f"Unknown document type: {', '.join(unknown_types)}"}), 400
+
+    # Retries of the same submission carry the same client-generated key
+    idempotency_key = request.headers.get('Idempotency-Key')
+    if idempotency_key:
+        try:
+            idempotency_key = str(uuid.UUID(idempotency_key))
+        except ValueError:
+            return jsonify({"error": "Idempotency-Key must be a UUID"}), 400
+
     connection = get_connection()
     if connection is None:
         return jsonify({"error": "Database connection failed"}), 500
@@ -2184,153 +2525,78 @@ def submit_document():
     try:
         cursor = connection.cursor()
 
-        cursor.execute("""
-        CREATE TABLE IF NOT EXISTS daily_copy_requests (
-            id SERIAL PRIMARY KEY,
-            user_id INTEGER NOT NULL,
-            document_type VARCHAR(100) NOT NULL,
-            request_date DATE NOT NULL,
-            copy_count INTEGER DEFAULT 1,
-            CONSTRAINT daily_copy_requests_user_id_fkey
-                FOREIGN KEY (user_id) REFERENCES app_users(id) ON DELETE CASCADE,
-            UNIQUE(user_id, document_type, request_date)
-        )
-        """)
-
-        daily_limits = {
-            "barangay clearance": 1,
-            "barangay indigency": 5,
-            "barangay residency": 2
-        }
+        if idempotency_key:
+            cursor.execute(SUBMISSION_BY_KEY_QUERY, (user_id, idempotency_key))
+            existing = cursor.fetchone()
+            if existing:
+                return replay_document_submission(cursor, user_id, *existing)
 
         today = datetime.now().date()
-        limit_check_response = check_daily_limits(cursor, user_id, document_types, daily_limits, today)
+        limit_status = claim_daily_limits(cursor, DAILY_COPY_LIMITS, user_id, document_types, today)
+        exhausted = [status for status in limit_status.values() if not status['allowed']]
         
-        if not limit_check_response['allowed']:
-            cursor.close()
-            return_connection(connection)
+        if exhausted:
+            # Give back the quota claimed for the other types in this request
+            connection.rollback()
+            # A concurrent retry waits for the original to commit and then finds the quota used up by it
+            if idempotency_key:
+                cursor.execute(SUBMISSION_BY_KEY_QUERY, (user_id, idempotency_key))
+                existing = cursor.fetchone()
+                if existing:
+                    return replay_document_submission(cursor, user_id, *existing)
+            limit_info = exhausted[0]
             return jsonify({
                 "success": False,
-                "error": limit_check_response['message'],
-                "limit_info": limit_check_response
+                "error": limit_info['message'],
+                "limit_info": limit_info
             }), 429
 
-        # Fetch user's name and purok automatically from app_users
-        cursor.execute("SELECT name, purok FROM app_users WHERE id = %s", (user_id,))
-        user_info = cursor.fetchone()
-        if not user_info:
-            cursor.close()
-            connection.close()
-            return jsonify({"error": "User not found"}), 404
-
-        name, purok = user_info
-
-        # Create the table if it doesn't exist (safety)
-        cursor.execute("""
-        CREATE TABLE IF NOT EXISTS document_submissions (
-            id SERIAL PRIMARY KEY,
-            user_id INTEGER NOT NULL,
-            document_types TEXT[] NOT NULL,
-            request_date DATE NOT NULL,
-            name VARCHAR(255) NOT NULL,
-            purok VARCHAR(100) NOT NULL,
-            purpose TEXT NOT NULL,
-            copies INTEGER DEFAULT 1,
-            status VARCHAR(50) DEFAULT 'Pending',
-            submission_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            pickup_date DATE,
-            notes TEXT
-        )
-        """)
-
-        # Add foreign key constraint if it doesn't exist
-        cursor.execute("""
-        SELECT COUNT(*)
-        FROM information_schema.table_constraints
-        WHERE constraint_name = 'document_submissions_user_id_fkey'
-        AND table_name = 'document_submissions'
-        """)
-        if cursor.fetchone()[0] == 0:
-            try:
-                cursor.execute("""
-                ALTER TABLE document_submissions
-                ADD CONSTRAINT document_submissions_user_id_fkey
-                FOREIGN KEY (user_id) REFERENCES app_users(id) ON DELETE CASCADE
-                """)
-            except Exception as e:
-                logger.warning(f"Could not add foreign key constraint: {e}")
-
-        for doc_type in document_types:
-            copy_count = data.get(f"copy{doc_type[0].upper()}{doc_type.split()[-1][0].upper()}", 1)
-            
-            cursor.execute("""
-            INSERT INTO daily_copy_requests (user_id, document_type, request_date, copy_count)
-            VALUES (%s, %s, %s, %s)
-            ON CONFLICT (user_id, document_type, request_date)
-            DO UPDATE SET copy_count = daily_copy_requests.copy_count + EXCLUDED.copy_count
-            """, (user_id, doc_type, today, copy_count))
-
-        # ✅ Correctly placed insert (not inside the except)
+        # Name and purok come from app_users in the same statement. A concurrent retry with the
+        # same key waits on the unique index here and then inserts nothing.
         query = """
         INSERT INTO document_submissions (
             user_id, document_types, request_date, name, purok, purpose,
-            copyC, copyI, copyR, status, submission_date
-        ) VALUES (
-            %s, %s, %s, %s, %s, %s,
-            %s, %s, %s, 'Pending', CURRENT_TIMESTAMP
+            copyC, copyI, copyR, status, submission_date, idempotency_key
         )
+        SELECT id, %s, %s, name, purok, %s,
+               %s, %s, %s, 'Pending', CURRENT_TIMESTAMP, %s
+        FROM app_users
+        WHERE id = %s
+        ON CONFLICT (user_id, idempotency_key) WHERE idempotency_key IS NOT NULL DO NOTHING
         RETURNING id
         """
         values = (
-            user_id,
             document_types,
             date,
-            name,
-            purok,
             purpose,
             data.get("copyC", 0),
             data.get("copyI", 0),
-            data.get("copyR", 0)
+            data.get("copyR", 0),
+            idempotency_key,
+            user_id
         )
 
         cursor.execute(query, values)
-        document_id = cursor.fetchone()[0]
+        inserted = cursor.fetchone()
+        if not inserted:
+            # Give back the quota; either the user is gone or the retry lost the race
+            connection.rollback()
+            if idempotency_key:
+                cursor.execute(SUBMISSION_BY_KEY_QUERY, (user_id, idempotency_key))
+                existing = cursor.fetchone()
+                if existing:
+                    return replay_document_submission(cursor, user_id, *existing)
+            return jsonify({"error": "User not found"}), 404
+
+        document_id = inserted[0]
         connection.commit()
 
-        # Generate reference number
         reference_number = f"REF-{document_id}"
-
-        # Create success response message
-        if len(document_types) == 1:
-            doc_name = document_types[0].title()
-            response_text = f"""
-            <div class="ai-response" style="text-align: justify; line-height: 1.6;">
-                <p><strong>🎉 Document Request Submitted Successfully!</strong></p>
-                <p>Your request for a <strong>{doc_name}</strong> has been submitted and is now being processed.</p>
-                <p><strong>Reference Number:</strong> {reference_number}</p>
-                <p>Please save this reference number for tracking your request status.</p>
-                <p><strong>Processing time:</strong> Typically 3–5 business days. You will be notified when your document is ready for pickup.</p>
-            </div>
-            """
-        else:
-            doc_list = ", ".join([doc.title() for doc in document_types])
-            response_text = f"""
-            <div class="ai-response" style="text-align: justify; line-height: 1.6;">
-                <p><strong>🎉 Multiple Document Requests Submitted Successfully!</strong></p>
-                <p>Your requests for the following documents have been submitted and are now being processed:</p>
-                <ul style="margin: 10px 0; padding-left: 20px;">
-                    {"".join([f"<li><strong>{doc.title()}</strong></li>" for doc in document_types])}
-                </ul>
-                <p><strong>Reference Number:</strong> {reference_number}</p>
-                <p>Please save this reference number for tracking your request status.</p>
-                <p><strong>Processing time:</strong> Typically 3–5 business days. You will be notified when your documents are ready for pickup.</p>
-            </div>
-            """
-
         return jsonify({
             "success": True,
-            "response": response_text,
-            "reference_number": reference_number
+            "response": document_submission_response(document_types, reference_number),
+            "reference_number": reference_number,
+            "limits": limit_status
         })
 
     except Exception as e:
@@ -2361,12 +2627,6 @@ def get_today_date():
 def get_copy_limits():
     user_id = session.get('user_id')
     
-    daily_limits = {
-        "barangay clearance": 1,
-        "barangay indigency": 5,
-        "barangay residency": 2
-    }
-    
     connection = get_connection()
     if connection is None:
         return jsonify({"error": "Database connection failed"}), 500
@@ -2374,26 +2634,8 @@ def get_copy_limits():
     try:
         cursor = connection.cursor()
         today = datetime.now().date()
-        tomorrow = today + timedelta(days=1)
         
-        limit_status = {}
-        
-        for doc_type, limit in daily_limits.items():
-            cursor.execute("""
-            SELECT COALESCE(SUM(copy_count), 0) FROM daily_copy_requests
-            WHERE user_id = %s AND document_type = %s AND request_date = %s
-            """, (user_id, doc_type, today))
-            
-            used_copies = cursor.fetchone()[0] or 0
-            remaining = max(0, limit - used_copies)
-            
-            limit_status[doc_type] = {
-                "limit": limit,
-                "used": used_copies,
-                "remaining": remaining,
-                "reset_time": tomorrow.isoformat(),
-                "reset_timestamp": int((datetime.combine(tomorrow, datetime.min.time()) - datetime(1970, 1, 1)).total_seconds() * 1000)
-            }
+        limit_status = daily_limit_usage(cursor, DAILY_COPY_LIMITS, user_id, today)
         
         return jsonify({
             "success": True,
@@ -2409,31 +2651,6 @@ def get_copy_limits():
         return_connection(connection)
 
 
-def check_daily_limits(cursor, user_id, document_types, daily_limits, today):
-    for doc_type in document_types:
-        if doc_type in daily_limits:
-            cursor.execute("""
-            SELECT COALESCE(SUM(copy_count), 0) FROM daily_copy_requests
-            WHERE user_id = %s AND document_type = %s AND request_date = %s
-            """, (user_id, doc_type, today))
-            
-            used_copies = cursor.fetchone()[0] or 0
-            limit = daily_limits[doc_type]
-            
-            if used_copies >= limit:
-                tomorrow = today + timedelta(days=1)
-                return {
-                    "allowed": False,
-                    "message": f"Daily limit reached for {doc_type}. You can request again tomorrow at midnight.",
-                    "document_type": doc_type,
-                    "limit": limit,
-                    "used": used_copies,
-                    "reset_time": tomorrow.isoformat()
-                }
-    
-    return {"allowed": True}
-
-
 # Route for admin replies (save into notes column)
 @app.route('/admin/reply', methods=['POST'])
 @auth_required   # keep if only admins should use this
@@ -2481,98 +2698,37 @@ def admin():
     now = datetime.now()
     return render_template('admin.html', now=now, timedelta=timedelta)
 
-# FIXED: Route to get document requests for admin dashboard
+# Route to get one page of document requests for the admin dashboard
+# Filters and search run in SQL; pages are keyset-paginated on (submission_date, id) via ?cursor=
 @app.route('/admin/document_requests')
 def admin_document_requests():
     if not session.get('admin_authenticated'):
         return jsonify({"error": "Unauthorized"}), 401
-        
+
+    try:
+        query, params, limit = build_document_page_query(request.args)
+    except InvalidPageRequest as e:
+        return jsonify({"error": str(e)}), 400
+
     connection = get_connection()
     if connection is None:
         return jsonify({"error": "Database connection failed"}), 500
         
     try:
         cursor = connection.cursor()
-        query = """
-        SELECT 
-            ds.id, 
-            CASE 
-                WHEN ds.document_types IS NOT NULL THEN array_to_string(ds.document_types, ', ')
-                ELSE 'Unknown'
-            END as document_type,
-            ds.request_date, 
-            ds.name, 
-            ds.purok, 
-            ds.purpose, 
-            ds.copyc,
-            ds.copyi, 
-            ds.copyr,
-            ds.submission_date, 
-            ds.status, 
-            ds.pickup_date, 
-            ds.notes,
-            au.name as user_name,
-            au.email as user_email
-        FROM document_submissions ds
-        LEFT JOIN app_users au ON ds.user_id = au.id
-        ORDER BY ds.submission_date DESC
-        """
-        cursor.execute(query)
+        cursor.execute(query, params)
         
         # Convert to dictionary format
         columns = [desc[0] for desc in cursor.description]
         document_requests = [dict(zip(columns, row)) for row in cursor.fetchall()]
-        
-        # Format dates for JSON
-        for doc in document_requests:
-            if doc.get('request_date'):
-                doc['request_date'] = doc['request_date'].strftime('%Y-%m-%d')
-            if doc.get('submission_date'):
-                doc['submission_date'] = doc['submission_date'].strftime('%Y-%m-%d %H:%M:%S')
-            if doc.get('pickup_date'):
-                doc['pickup_date'] = doc['pickup_date'].strftime('%Y-%m-%d')
-        
-        cursor.execute("""
-        WITH unnested_types AS (
-            SELECT 
-                ds.id,
-                UNNEST(ds.document_types) as document_type,
-                ds.copyc,
-                ds.copyi,
-                ds.copyr,
-                ds.submission_date
-            FROM document_submissions ds
-            WHERE ds.submission_date >= CURRENT_DATE - INTERVAL '30 days'
-        )
-        SELECT 
-            document_type,
-            COUNT(DISTINCT id) as total_requests,
-            COALESCE(SUM(CASE WHEN document_type = 'barangay clearance' THEN copyc ELSE 0 END), 0) as total_copyc,
-            COALESCE(SUM(CASE WHEN document_type = 'barangay indigency' THEN copyi ELSE 0 END), 0) as total_copyi,
-            COALESCE(SUM(CASE WHEN document_type = 'barangay residency' THEN copyr ELSE 0 END), 0) as total_copyr
-        FROM unnested_types
-        GROUP BY document_type
-        ORDER BY total_requests DESC
-        """)
-        document_types_rows = cursor.fetchall()
-        document_types_data = [
-            {
-                "document_type": row[0], 
-                "total_requests": row[1],
-                "total_copyc": row[2],
-                "total_copyi": row[3],
-                "total_copyr": row[4]
-            } 
-            for row in document_types_rows
-        ]
 
-        return jsonify({"document_requests": document_requests, "document_types_data": document_types_data})
+        return jsonify(page_from_rows(document_requests, limit))
     except Exception as e:
         logger.error(f"Error fetching document requests: {e}")
         return jsonify({"error": "Failed to fetch document requests"}), 500
     finally:
         cursor.close()
-        connection.close()
+        return_connection(connection)
 
 @app.route('/admin/update_barangay_officials', methods=['POST'])
 def update_barangay_officials():
@@ -2758,79 +2914,55 @@ Total: 140
 # Available document types
 AVAILABLE_DOCUMENTS = ["barangay clearance", "barangay indigency", "barangay residency"]
 
+# Keywords for each query type, compiled into one matcher by intent_matcher.py
+OFFICIAL_TERMS = [
+    "official", "officials", "barangay official", "barangay officials",
+    "kagawad", "councilor", "council", "secretary", "treasurer",
+    "captain", "kapitan", "chairman", "punong", "kap ", "cap ",
+    "sk", "sangguniang kabataan", "youth council", "youth",
+    "purok", "purok president", "purok leader", "president"
+]
+
+OFFICIAL_NAMES = [
+    "redondo", "flauta", "olipane", "arquero", "lonzanida", 
+    "sibug", "susa", "aramay", "castrence", "gutierrez",
+    "rico", "mercado", "barried", "dagsaan", "ednalaga",
+    "santos", "macalinao", "rebultan", "famisan",
+    "alarma", "abadam", "dagun", "arcino", "abad",
+    "baluyot", "cristobal", "adona", "mora"
+]
+
+POPULATION_TERMS = [
+    "population", "demographics", "residents", "people", "citizens",
+    "age", "gender", "male", "female", "men", "women", "boys", "girls",
+    "statistics", "census", "how many people", "total population"
+]
+
+# Document types in detection order, with common misspellings
+DOCUMENT_TYPE_TERMS = {
+    "barangay clearance": ["clearance"],
+    "barangay indigency": ["indigency", "indengency", "indengecy", "indegency"],
+    "barangay residency": ["residency"]
+}
+
 # Helper functions for checking query types
 def is_about_officials(query):
     """Check if a query is about barangay officials"""
-    query_lower = query.lower()
-
-    # Check for general terms about officials
-    official_terms = [
-        "official", "officials", "barangay official", "barangay officials",
-        "kagawad", "councilor", "council", "secretary", "treasurer",
-        "captain", "kapitan", "chairman", "punong", "kap ", "cap ",
-        "sk", "sangguniang kabataan", "youth council", "youth",
-        "purok", "purok president", "purok leader", "president"
-    ]
-
-    # Check for specific names of officials
-    official_names = [
-        "redondo", "flauta", "olipane", "arquero", "lonzanida", 
-        "sibug", "susa", "aramay", "castrence", "gutierrez",
-        "rico", "mercado", "barried", "dagsaan", "ednalaga",
-        "santos", "macalinao", "rebultan", "famisan",
-        "alarma", "abadam", "dagun", "arcino", "abad",
-        "baluyot", "cristobal", "adona", "mora"
-    ]
-
-    # Check if any term is in the query
-    for term in official_terms:
-        if term in query_lower:
-            return True
-
-    # Check if any name is in the query
-    for name in official_names:
-        if name in query_lower:
-            return True
-
-    return False
+    from intent_matcher import match_intents
+    return match_intents(query).has("officials")
 
 def is_about_population(query):
     """Check if a query is about population information"""
-    query_lower = query.lower()
-
-    # Check for population-related terms
-    population_terms = [
-        "population", "demographics", "residents", "people", "citizens",
-        "age", "gender", "male", "female", "men", "women", "boys", "girls",
-        "statistics", "census", "how many people", "total population"
-    ]
-
-    # Check if any term is in the query
-    for term in population_terms:
-        if term in query_lower:
-            return True
-
-    return False
+    from intent_matcher import match_intents
+    return match_intents(query).has("population")
 
 def detect_document_type(query):
     """Helper function to detect document type in a query"""
-    query_lower = query.lower()
-
-    # Check for barangay clearance
-    if "clearance" in query_lower:
-        return "barangay clearance"
+    from intent_matcher import match_intents
+    matches = match_intents(query)
 
-    # Check for barangay indigency (including common misspellings)
-    if any(word in query_lower for word in ["indigency", "indengency", "indengecy", "indegency"]):
-        return "barangay indigency"
-
-    # Check for barangay residency
-    if "residency" in query_lower:
-        return "barangay residency"
-
-    # If no specific document type is found, check for general document mentions
-    for doc_type in AVAILABLE_DOCUMENTS:
-        if doc_type in query_lower:
+    for doc_type in DOCUMENT_TYPE_TERMS:
+        if matches.has(f"document:{doc_type}"):
             return doc_type
 
     return None
@@ -3002,15 +3134,16 @@ def ai_report():
 
     try:
         cursor = connection.cursor()
+        # Read from the daily conversation rollup instead of scanning conversation_logs
         query = """
         SELECT 
-            COUNT(*) as total_conversations,
-            DATE(timestamp) as date,
-            AVG(LENGTH(user_input)) as avg_user_input_length,
-            AVG(LENGTH(ai_response)) as avg_ai_response_length
-        FROM conversation_logs
-        GROUP BY DATE(timestamp)
-        ORDER BY date DESC
+            conversations as total_conversations,
+            day as date,
+            user_input_chars::numeric / NULLIF(conversations, 0) as avg_user_input_length,
+            ai_response_chars::numeric / NULLIF(ai_responses, 0) as avg_ai_response_length
+        FROM daily_conversation_stats
+        WHERE conversations > 0
+        ORDER BY day DESC
         LIMIT 7
         """
         cursor.execute(query)
@@ -3066,46 +3199,39 @@ def admin_stats():
         requests_rows = cursor.fetchall()
         requests_data = [{"request_date": row[0].strftime('%Y-%m-%d'), "total_requests": row[1]} for row in requests_rows]
 
-        # FIXED: Get document requests by type - handle array format
+        # Get document requests by type for the last 30 days (from the daily rollup)
         cursor.execute("""
-        SELECT 
-            UNNEST(document_types) as document_type, 
-            COUNT(*) as total_requests 
-        FROM document_submissions 
-        WHERE submission_date >= CURRENT_DATE - INTERVAL '30 days'
-        GROUP BY UNNEST(document_types)
+        SELECT document_type, SUM(submissions) as total_requests
+        FROM daily_document_types
+        WHERE day >= CURRENT_DATE - 30
+        GROUP BY document_type
+        HAVING SUM(submissions) > 0
         ORDER BY total_requests DESC
         """)
         document_types_rows = cursor.fetchall()
         document_types_data = [{"document_type": row[0], "total_requests": row[1]} for row in document_types_rows]
 
-        # Get document requests by status
+        # Get document requests by status (from the daily rollup)
         cursor.execute("""
-        SELECT status, COUNT(*) as count
-        FROM document_submissions
+        SELECT status, SUM(submissions) as count
+        FROM daily_document_status
         GROUP BY status
+        HAVING SUM(submissions) > 0
         ORDER BY count DESC
         """)
         status_rows = cursor.fetchall()
         status_data = [{"status": row[0], "count": row[1]} for row in status_rows]
 
-        # Get registered users count
-        cursor.execute("SELECT COUNT(*) FROM app_users")
-        users_count = cursor.fetchone()[0]
-
-        # Get users by authentication method
+        # Get users by authentication method and the registered users count (from the daily rollup)
         cursor.execute("""
-        SELECT 
-            CASE 
-                WHEN oauth_provider IS NOT NULL THEN oauth_provider
-                ELSE 'email'
-            END as auth_method,
-            COUNT(*) as count
-        FROM app_users
+        SELECT auth_method, SUM(registrations) as count
+        FROM daily_registrations
         GROUP BY auth_method
+        HAVING SUM(registrations) > 0
         """)
         auth_method_rows = cursor.fetchall()
-        auth_method_data = [{"auth_method": row[0], "count": row[1]} for row in auth_method_rows]
+        auth_method_data = [{"auth_method": row[0], "count": int(row[1])} for row in auth_method_rows]
+        users_count = sum(row["count"] for row in auth_method_data)
 
         return jsonify({
             "today_visits": today_visits,
@@ -3127,9 +3253,18 @@ def admin_stats():
 # Route for logging out
 @app.route('/logout')
 def logout():
-    session.pop('admin_authenticated', None)
+    # Clear the session; the stored row and the session cookie are deleted with it
+    session.clear()
     return redirect(url_for('index'))
 
+# Route to get precomputed population statistics for the admin dashboard
+@app.route('/admin/population_stats')
+def admin_population_stats():
+    if not session.get('admin_authenticated'):
+        return jsonify({"error": "Unauthorized"}), 401
+
+    return jsonify(get_population_summary())
+
 # Route to update admin credentials
 @app.route('/admin/update_credentials', methods=['POST'])
 def update_admin_credentials():
@@ -3157,14 +3292,6 @@ def update_admin_credentials():
     try:
         cursor = connection.cursor()
         
-        # Check if env_variables table exists, create if not
-        cursor.execute("""
-        CREATE TABLE IF NOT EXISTS env_variables (
-            key VARCHAR(255) PRIMARY KEY,
-            value TEXT NOT NULL
-        )
-        """)
-        
         # Update ADMIN_KEY
         cursor.execute("""
         INSERT INTO env_variables (key, value)
@@ -3196,15 +3323,90 @@ def update_admin_credentials():
         cursor.close()
         return_connection(connection)
 
+# All report sections in one round trip; each CTE reads a daily table, so cost depends only on the range length
+CUSTOM_REPORT_QUERY = """
+WITH visits AS (
+    SELECT visit_date, visit_count
+    FROM website_visits
+    WHERE visit_date BETWEEN %(start)s AND %(end)s
+),
+document_types AS (
+    SELECT document_type, SUM(request_count) as total_requests
+    FROM document_requests
+    WHERE request_date BETWEEN %(start)s AND %(end)s
+    GROUP BY document_type
+),
+statuses AS (
+    SELECT status, SUM(submissions) as count
+    FROM daily_document_status
+    WHERE day BETWEEN %(start)s AND %(end)s
+    GROUP BY status
+    HAVING SUM(submissions) > 0
+),
+top_queries AS (
+    SELECT MIN(user_input) as query, SUM(queries) as count
+    FROM daily_query_stats
+    WHERE day BETWEEN %(start)s AND %(end)s
+    GROUP BY input_hash
+    ORDER BY count DESC
+    LIMIT 10
+),
+registrations AS (
+    SELECT day, SUM(registrations) as count
+    FROM daily_registrations
+    WHERE day BETWEEN %(start)s AND %(end)s
+    GROUP BY day
+    HAVING SUM(registrations) > 0
+)
+SELECT
+    (SELECT COALESCE(json_agg(json_build_object('visit_date', to_char(visit_date, 'YYYY-MM-DD'), 'visit_count', visit_count)
+                              ORDER BY visit_date), '[]') FROM visits),
+    (SELECT COALESCE(json_agg(json_build_object('document_type', document_type, 'total_requests', total_requests)
+                              ORDER BY total_requests DESC), '[]') FROM document_types),
+    (SELECT COALESCE(json_agg(json_build_object('status', status, 'count', count)
+                              ORDER BY count DESC), '[]') FROM statuses),
+    (SELECT COALESCE(json_agg(json_build_object('query', query, 'count', count)
+                              ORDER BY count DESC), '[]') FROM top_queries),
+    (SELECT COALESCE(json_agg(json_build_object('reg_date', to_char(day, 'YYYY-MM-DD'), 'count', count)
+                              ORDER BY day), '[]') FROM registrations)
+"""
+
+# Function to build the custom report numbers for a date range
+def build_custom_report(cursor, start_date, end_date):
+    cursor.execute(CUSTOM_REPORT_QUERY, {"start": start_date, "end": end_date})
+    visits_data, document_types_data, status_data, query_rows, user_reg_data = cursor.fetchone()
+
+    # Skip admin login attempts and very short queries
+    top_queries = [
+        row for row in query_rows
+        if len(row["query"]) > 5 and ADMIN_KEY not in row["query"] and ADMIN_PASS not in row["query"]
+    ]
+
+    return {
+        "totalVisits": sum(row["visit_count"] for row in visits_data),
+        "totalRequests": sum(row["total_requests"] for row in document_types_data),
+        "totalDocuments": sum(row["count"] for row in status_data),
+        "totalNewUsers": sum(row["count"] for row in user_reg_data),
+        "visitsData": visits_data,
+        "documentTypesData": document_types_data,
+        "statusData": status_data,
+        "topQueries": top_queries,
+        "userRegData": user_reg_data
+    }
+
+# Function to read the report date range from a request body
+def get_report_dates(data):
+    data = data or {}
+    return data.get('startDate'), data.get('endDate')
+
 # Route to generate custom date range report
+# Returns the numbers only; the page fetches the AI insights from /admin/custom_report/insights afterwards
 @app.route('/admin/custom_report', methods=['POST'])
 def custom_report():
     if not session.get('admin_authenticated'):
         return jsonify({"error": "Unauthorized"}), 401
         
-    data = request.json
-    start_date = data.get('startDate')
-    end_date = data.get('endDate')
+    start_date, end_date = get_report_dates(request.json)
 
     if not start_date or not end_date:
         return jsonify({"error": "Start date and end date are required"}), 400
@@ -3215,114 +3417,11 @@ def custom_report():
         
     try:
         cursor = connection.cursor()
-        
-        # Get website visits for the date range
-        cursor.execute("""
-        SELECT visit_date, visit_count 
-        FROM website_visits 
-        WHERE visit_date BETWEEN %s AND %s
-        ORDER BY visit_date
-        """, (start_date, end_date))
-        
-        visits_data = []
-        total_visits = 0
-        for row in cursor.fetchall():
-            visit_date = row[0].strftime('%Y-%m-%d')
-            visit_count = row[1]
-            total_visits += visit_count
-            visits_data.append({"visit_date": visit_date, "visit_count": visit_count})
-        
-        # Get document requests by type for the date range
-        cursor.execute("""
-        SELECT document_type, SUM(request_count) as total_requests 
-        FROM document_requests 
-        WHERE request_date BETWEEN %s AND %s
-        GROUP BY document_type
-        ORDER BY total_requests DESC
-        """, (start_date, end_date))
-        
-        document_types_data = []
-        total_requests = 0
-        for row in cursor.fetchall():
-            document_type = row[0]
-            request_count = row[1]
-            total_requests += request_count
-            document_types_data.append({"document_type": document_type, "total_requests": request_count})
-        
-        # Get document status counts for the date range
-        cursor.execute("""
-        SELECT status, COUNT(*) as count
-        FROM document_submissions
-        WHERE submission_date::date BETWEEN %s AND %s
-        GROUP BY status
-        ORDER BY count DESC
-        """, (start_date, end_date))
-        
-        status_data = []
-        total_documents = 0
-        for row in cursor.fetchall():
-            status = row[0]
-            count = row[1]
-            total_documents += count
-            status_data.append({"status": status, "count": count})
-        
-        # Get top user queries for the date range
-        cursor.execute("""
-        SELECT user_input as query, COUNT(*) as count
-        FROM conversation_logs
-        WHERE timestamp::date BETWEEN %s AND %s
-        GROUP BY user_input
-        ORDER BY count DESC
-        LIMIT 10
-        """, (start_date, end_date))
-        
-        top_queries = []
-        for row in cursor.fetchall():
-            query = row[0]
-            count = row[1]
-            # Skip admin login attempts and very short queries
-            if len(query) > 5 and ADMIN_KEY not in query and ADMIN_PASS not in query:
-                top_queries.append({"query": query, "count": count})
-        
-        # Get user registration data for the date range
-        cursor.execute("""
-        SELECT DATE(created_at) as reg_date, COUNT(*) as count
-        FROM app_users
-        WHERE created_at::date BETWEEN %s AND %s
-        GROUP BY reg_date
-        ORDER BY reg_date
-        """, (start_date, end_date))
-        
-        user_reg_data = []
-        total_new_users = 0
-        for row in cursor.fetchall():
-            reg_date = row[0].strftime('%Y-%m-%d')
-            count = row[1]
-            total_new_users += count
-            user_reg_data.append({"reg_date": reg_date, "count": count})
-        
-        # Generate AI insights based on the data
-        ai_insights = generate_ai_insights(
-            start_date, 
-            end_date, 
-            total_visits, 
-            total_requests, 
-            document_types_data, 
-            status_data
-        )
+        report = build_custom_report(cursor, start_date, end_date)
         
         return jsonify({
             "success": True,
-            "totalVisits": total_visits,
-            "totalRequests": total_requests,
-            "totalDocuments": total_documents,
-            "totalNewUsers": total_new_users,
-            "visitsData": visits_data,
-            "documentTypesData": document_types_data,
-            "statusData": status_data,
-            "topQueries": top_queries,
-            "userRegData": user_reg_data,
-            "aiInsights": ai_insights,
+            **report,
             "signatoryName": signatory_info["name"],
             "signatoryTitle": signatory_info["title"]
         })
@@ -3333,6 +3432,135 @@ def custom_report():
         cursor.close()
         return_connection(connection)
 
+# Route to generate the AI insights section of a custom report
+@app.route('/admin/custom_report/insights', methods=['POST'])
+def custom_report_insights():
+    if not session.get('admin_authenticated'):
+        return jsonify({"error": "Unauthorized"}), 401
+
+    start_date, end_date = get_report_dates(request.json)
+
+    if not start_date or not end_date:
+        return jsonify({"error": "Start date and end date are required"}), 400
+
+    connection = get_connection()
+    if connection is None:
+        return jsonify({"error": "Database connection failed"}), 500
+
+    try:
+        cursor = connection.cursor()
+        report = build_custom_report(cursor, start_date, end_date)
+        digest = report_insights_digest(start_date, end_date, report)
+        cached_insights = get_cached_insights(cursor, start_date, end_date, digest)
+    except Exception as e:
+        logger.error(f"Error loading report data for AI insights: {e}")
+        return jsonify({"error": f"Failed to generate insights: {str(e)}"}), 500
+    finally:
+        cursor.close()
+        return_connection(connection)
+
+    if cached_insights is not None:
+        return jsonify({"success": True, "aiInsights": cached_insights, "cached": True})
+
+    ai_insights = generate_report_insights(start_date, end_date, report, digest)
+    if ai_insights is None:
+        return jsonify({"success": True, "aiInsights": "<p>Unable to generate AI insights for this report.</p>", "cached": False})
+
+    return jsonify({"success": True, "aiInsights": ai_insights, "cached": False})
+
+# Function to fingerprint the numbers a report's AI insights are written from
+def report_insights_digest(start_date, end_date, report):
+    return insights_digest(
+        start_date,
+        end_date,
+        report["totalVisits"],
+        report["totalRequests"],
+        report["documentTypesData"],
+        report["statusData"]
+    )
+
+# Function to write a report's AI insights with Gemini (None if the call failed)
+def write_report_insights(start_date, end_date, report):
+    return generate_ai_insights(
+        start_date,
+        end_date,
+        report["totalVisits"],
+        report["totalRequests"],
+        report["documentTypesData"],
+        report["statusData"]
+    )
+
+# Function to generate AI insights for a report and store them for the range
+def generate_report_insights(start_date, end_date, report, digest):
+    # Don't hold a pooled connection while waiting on Gemini
+    db_connections.release_request_connection()
+    ai_insights = write_report_insights(start_date, end_date, report)
+    if ai_insights is None:
+        return None
+
+    connection = get_connection()
+    if connection is None:
+        return ai_insights
+    try:
+        cursor = connection.cursor()
+        store_insights(cursor, start_date, end_date, digest, ai_insights)
+        connection.commit()
+    except Exception as e:
+        logger.error(f"Error caching AI insights for {start_date} to {end_date}: {e}")
+        connection.rollback()
+    finally:
+        cursor.close()
+        return_connection(connection)
+    return ai_insights
+
+# Function to pre-generate AI insights for past months whose cached insights are missing or stale
+# One worker at a time runs it (session-level advisory lock); months whose numbers did not change cost no Gemini calls.
+# The job keeps its one connection for the lock, but commits before every Gemini call so the connection
+# never sits idle in a transaction while waiting on the API, and stores the insights on that same connection.
+def pregenerate_report_insights(months=None):
+    months = months or INSIGHTS_PREGENERATE_MONTHS
+    connection = get_connection()
+    if connection is None:
+        return 0
+
+    generated = 0
+    cursor = connection.cursor()
+    try:
+        cursor.execute("SELECT pg_try_advisory_lock(%s)", (INSIGHTS_JOB_LOCK_ID,))
+        locked = cursor.fetchone()[0]
+        connection.commit()
+        if not locked:
+            return 0
+        try:
+            for start_date, end_date in past_month_ranges(datetime.now().date(), months):
+                report = build_custom_report(cursor, start_date, end_date)
+                digest = report_insights_digest(start_date, end_date, report)
+                cached = get_cached_insights(cursor, start_date, end_date, digest)
+                connection.commit()
+                if report["totalVisits"] == 0 and report["totalRequests"] == 0:
+                    continue
+                if cached is not None:
+                    continue
+
+                ai_insights = write_report_insights(start_date, end_date, report)
+                if ai_insights is None:
+                    continue
+                store_insights(cursor, start_date, end_date, digest, ai_insights)
+                connection.commit()
+                generated += 1
+        finally:
+            # The lock belongs to the session, so release it even if the loop failed mid-transaction
+            connection.rollback()
+            cursor.execute("SELECT pg_advisory_unlock(%s)", (INSIGHTS_JOB_LOCK_ID,))
+            connection.commit()
+    finally:
+        cursor.close()
+        return_connection(connection)
+
+    if generated:
+        logger.info(f"Pre-generated AI insights for {generated} past months")
+    return generated
+
 # FIXED: Route to get user profile
 @app.route('/user/profile')
 @auth_required
@@ -3598,27 +3826,21 @@ def rename_chat(chat_id):
     
     try:
         cursor = connection.cursor()
-        # First verify the chat belongs to the user
-        verify_query = """
-        SELECT COUNT(*) FROM chat_histories
-        WHERE id = %s AND user_id = %s AND is_active = TRUE
-        """
-        cursor.execute(verify_query, (chat_id, user_id))
-        count = cursor.fetchone()[0]
-        
-        if count == 0:
-            logger.error(f"Chat {chat_id} not found or does not belong to user {user_id}")
-            return jsonify({"error": "Chat not found or access denied"}), 404
-        
-        # Update the chat title
+        # Update the chat title; the WHERE clause doubles as the ownership check
         query = """
         UPDATE chat_histories
         SET title = %s, updated_at = CURRENT_TIMESTAMP
-        WHERE id = %s AND user_id = %s
+        WHERE id = %s AND user_id = %s AND is_active = TRUE
         """
         cursor.execute(query, (new_title, chat_id, user_id))
+        updated = cursor.rowcount
         connection.commit()
         
+        if updated == 0:
+            logger.error(f"Chat {chat_id} not found or does not belong to user {user_id}")
+            return jsonify({"error": "Chat not found or access denied"}), 404
+        chat_context_cache.invalidate(chat_id)
+        
         # Log success
         logger.info(f"Successfully renamed chat {chat_id} to '{new_title}'")
         
@@ -3651,26 +3873,20 @@ def delete_chat_route(chat_id):
     
     try:
         cursor = connection.cursor()
-        # First verify the chat belongs to the user
-        verify_query = """
-        SELECT COUNT(*) FROM chat_histories
-        WHERE id = %s AND user_id = %s
-        """
-        cursor.execute(verify_query, (chat_id, user_id))
-        count = cursor.fetchone()[0]
-        
-        if count == 0:
-            logger.error(f"Chat {chat_id} not found or does not belong to user {user_id}")
-            return jsonify({"error": "Chat not found or access denied"}), 404
-        
-        # Delete the chat and its messages (relying on CASCADE)
+        # Delete the chat and its messages (relying on CASCADE); the WHERE clause doubles as the ownership check
         query = """
         DELETE FROM chat_histories
         WHERE id = %s AND user_id = %s
         """
         cursor.execute(query, (chat_id, user_id))
+        deleted = cursor.rowcount
         connection.commit()
         
+        if deleted == 0:
+            logger.error(f"Chat {chat_id} not found or does not belong to user {user_id}")
+            return jsonify({"error": "Chat not found or access denied"}), 404
+        chat_context_cache.invalidate(chat_id)
+        
         # Log success
         logger.info(f"Successfully deleted chat {chat_id}")
         
@@ -3702,40 +3918,13 @@ def get_chat_messages_route(chat_id):
     
     try:
         cursor = connection.cursor()
-        # First verify the chat belongs to the user
-        verify_query = """
-        SELECT COUNT(*), title FROM chat_histories
-        WHERE id = %s AND user_id = %s AND is_active = TRUE
-        GROUP BY title
-        """
-        cursor.execute(verify_query, (chat_id, user_id))
-        result = cursor.fetchone()
+        # Ownership check, title and messages in one statement
+        chat_title, messages = fetch_owned_chat_messages(cursor, chat_id, user_id)
         
-        if not result or result[0] == 0:
+        if messages is None:
             logger.error(f"Chat {chat_id} not found or does not belong to user {user_id}")
             return jsonify({"error": "Chat not found or access denied"}), 404
         
-        chat_title = result[1]
-        
-        # Get the chat messages
-        cursor = connection.cursor(cursor_factory=psycopg2.extras.DictCursor)
-        query = """
-        SELECT id, is_user, message, timestamp
-        FROM chat_messages
-        WHERE chat_id = %s
-        ORDER BY timestamp ASC
-        """
-        cursor.execute(query, (chat_id,))
-        
-        messages = []
-        for row in cursor.fetchall():
-            message = dict(row)
-            # Format dates for JSON
-            if message.get('timestamp'):
-                message['timestamp'] = message['timestamp'].strftime('%Y-%m-%d %H:%M:%S')
-            
-            messages.append(message)
-        
         # Log success
         logger.info(f"Successfully retrieved {len(messages)} messages for chat {chat_id}")
         
@@ -4045,7 +4234,7 @@ def preview_document(doc_id):
         return "Error generating document preview", 500
     finally:
         cursor.close()
-        connection.close()
+        return_connection(connection)
 
 @app.route('/request_document', methods=['POST'])
 def request_document():
@@ -4153,16 +4342,141 @@ def db_diagnostic():
         if connection:
             return_connection(connection)
 
-# Call this function after initializing the database connection
-# Add this line after creating the connection_pool
-load_admin_credentials()
-create_chat_history_tables()
-update_user_table_for_verification()
+# Diagnostic endpoint for the LLM response cache and request coalescing
+@app.route('/diagnostic/response-cache')
+def response_cache_diagnostic():
+    return jsonify({
+        "status": "success",
+        "response_cache": response_cache.stats(),
+        "singleflight": llm_singleflight.stats(),
+        "chat_context_cache": chat_context_cache.stats(),
+        "chat_summarizer": chat_summarizer.stats()
+    })
+
+# Diagnostic endpoint for the Gemini circuit breaker and admission control
+@app.route('/diagnostic/llm')
+def llm_diagnostic():
+    breaker_stats = llm_client.breaker.stats()
+    return jsonify({
+        "status": "success" if breaker_stats["state"] == CircuitBreaker.CLOSED else "degraded",
+        "timeout_seconds": llm_client.timeout,
+        "client": llm_client.stats(),
+        "circuit_breaker": breaker_stats,
+        "concurrency": llm_limiter.stats(),
+        "quota_pacing": llm_pacer.stats(),
+        "insights_job": insights_job.stats()
+    })
+
+# Diagnostic endpoint for database pool size, waits and checkouts in this worker
+@app.route('/diagnostic/db-pool')
+def db_pool_diagnostic():
+    return jsonify({
+        "status": "success",
+        "pool": connection_pool.stats(),
+        "request_connections": db_connections.stats(),
+        "write_behind": log_writer.stats(),
+        "sessions": app.session_interface.stats(),
+        "query_stats_job": query_stats_job.stats()
+    })
+
+# Diagnostic endpoint for prompt routing latency per stage and the knowledge index
+@app.route('/diagnostic/router')
+def router_diagnostic():
+    return jsonify({
+        "status": "success",
+        "router": prompt_router.stats(),
+        "knowledge_index": KNOWLEDGE_INDEX.stats()
+    })
+
+# Function to compact daily_query_stats for days older than QUERY_STATS_KEEP_DAYS to their top questions
+def compact_query_stats():
+    connection = get_connection()
+    if connection is None:
+        return 0
+    cursor = connection.cursor()
+    try:
+        cursor.execute("SELECT compact_daily_query_stats(%s, %s)", (QUERY_STATS_KEEP_DAYS, QUERY_STATS_TOP_N))
+        removed = cursor.fetchone()[0]
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        cursor.close()
+        return_connection(connection)
+    if removed:
+        logger.info(f"Compacted {removed} daily query stat rows")
+    return removed
+
+# CLI command to recompute the dashboard rollup tables from the base tables: flask --app App rebuild-rollups
+# The rollups are kept current by triggers (migrations/0006_dashboard_rollups.sql); this repairs drift or restores
+@app.cli.command("rebuild-rollups")
+def rebuild_rollups_command():
+    connection = get_connection()
+    if connection is None:
+        raise click.ClickException("Database connection failed")
+    try:
+        cursor = connection.cursor()
+        cursor.execute("SELECT rebuild_dashboard_rollups()")
+        connection.commit()
+        cursor.close()
+        click.echo("Dashboard rollups rebuilt")
+        click.echo(f"Compacted {compact_query_stats()} old query stat rows")
+    except Exception as e:
+        connection.rollback()
+        raise click.ClickException(f"Failed to rebuild rollups: {e}")
+    finally:
+        return_connection(connection)
+
+# CLI command to pre-generate report AI insights for past months: flask --app App pregenerate-insights
+@app.cli.command("pregenerate-insights")
+@click.option("--months", default=None, type=int, help="Number of past months to cover")
+def pregenerate_insights_command(months):
+    generated = pregenerate_report_insights(months)
+    click.echo(f"Generated AI insights for {generated} months")
+
+# CLI command to apply schema migrations: flask --app App migrate
+# Runs once per deploy instead of on every worker boot: Heroku runs it from the release line in the Procfile;
+# on Render or Railway set it as the pre-deploy command, or set MIGRATE_ON_START=true (see gunicorn.conf.py)
+@app.cli.command("migrate")
+@click.option("--status", is_flag=True, help="Show the schema version and pending migrations without applying them")
+def migrate_command(status):
+    connection = get_connection()
+    if connection is None:
+        raise click.ClickException("Database connection failed")
+    try:
+        if status:
+            click.echo(json.dumps(schema_status(connection), indent=2))
+            return
+        applied = migrate(connection)
+        if applied:
+            for migration in applied:
+                click.echo(f"Applied {migration.version:04d}_{migration.name}")
+        else:
+            click.echo("Schema is up to date")
+    finally:
+        return_connection(connection)
+
+# Keep past months' report insights warm in the background
+insights_job = PeriodicJob("insights-pregenerate", pregenerate_report_insights, INSIGHTS_PREGENERATE_INTERVAL)
+
+# Keep daily_query_stats bounded per day
+query_stats_job = PeriodicJob("query-stats-compact", compact_query_stats, QUERY_STATS_COMPACT_INTERVAL)
+
+# Function to prepare a web worker: load the admin credentials and start the background work.
+# Called from gunicorn's post_worker_init hook (gunicorn.conf.py) and by the development server below,
+# never at import, so flask CLI commands such as migrate, rebuild-rollups and pregenerate-insights
+# neither query the database nor start threads before they run
+def init_web_worker():
+    load_admin_credentials()
+    insights_job.start()
+    query_stats_job.start()
 
 # Use PORT environment variable provided by Render
 port = int(os.getenv("PORT", 8000))
 
 if __name__ == '__main__':
+    init_web_worker()
     app.run(debug=os.getenv('FLASK_DEBUG', 'False').lower() == 'true', 
             host=os.getenv('FLASK_HOST', '0.0.0.0'), 
             port=port)
@@ -140,79 +140,55 @@ Total: 140
 # Available document types
 AVAILABLE_DOCUMENTS = ["barangay clearance", "barangay indigency", "barangay residency"]
 
+# Keywords for each query type, compiled into one matcher by intent_matcher.py
+OFFICIAL_TERMS = [
+    "official", "officials", "barangay official", "barangay officials",
+    "kagawad", "councilor", "council", "secretary", "treasurer",
+    "captain", "kapitan", "chairman", "punong", "kap ", "cap ",
+    "sk", "sangguniang kabataan", "youth council", "youth",
+    "purok", "purok president", "purok leader", "president"
+]
+
+OFFICIAL_NAMES = [
+    "redondo", "flauta", "olipane", "arquero", "lonzanida", 
+    "sibug", "susa", "aramay", "castrence", "gutierrez",
+    "rico", "mercado", "barried", "dagsaan", "ednalaga",
+    "santos", "macalinao", "rebultan", "famisan",
+    "alarma", "abadam", "dagun", "arcino", "abad",
+    "baluyot", "cristobal", "adona", "mora"
+]
+
+POPULATION_TERMS = [
+    "population", "demographics", "residents", "people", "citizens",
+    "age", "gender", "male", "female", "men", "women", "boys", "girls",
+    "statistics", "census", "how many people", "total population"
+]
+
+# Document types in detection order, with common misspellings
+DOCUMENT_TYPE_TERMS = {
+    "barangay clearance": ["clearance"],
+    "barangay indigency": ["indigency", "indengency", "indengecy", "indegency"],
+    "barangay residency": ["residency"]
+}
+
 # Helper functions for checking query types
 def is_about_officials(query):
     """Check if a query is about barangay officials"""
-    query_lower = query.lower()
-
-    # Check for general terms about officials
-    official_terms = [
-        "official", "officials", "barangay official", "barangay officials",
-        "kagawad", "councilor", "council", "secretary", "treasurer",
-        "captain", "kapitan", "chairman", "punong", "kap ", "cap ",
-        "sk", "sangguniang kabataan", "youth council", "youth",
-        "purok", "purok president", "purok leader", "president"
-    ]
-
-    # Check for specific names of officials
-    official_names = [
-        "redondo", "flauta", "olipane", "arquero", "lonzanida", 
-        "sibug", "susa", "aramay", "castrence", "gutierrez",
-        "rico", "mercado", "barried", "dagsaan", "ednalaga",
-        "santos", "macalinao", "rebultan", "famisan",
-        "alarma", "abadam", "dagun", "arcino", "abad",
-        "baluyot", "cristobal", "adona", "mora"
-    ]
-
-    # Check if any term is in the query
-    for term in official_terms:
-        if term in query_lower:
-            return True
-
-    # Check if any name is in the query
-    for name in official_names:
-        if name in query_lower:
-            return True
-
-    return False
+    from intent_matcher import match_intents
+    return match_intents(query).has("officials")
 
 def is_about_population(query):
     """Check if a query is about population information"""
-    query_lower = query.lower()
-
-    # Check for population-related terms
-    population_terms = [
-        "population", "demographics", "residents", "people", "citizens",
-        "age", "gender", "male", "female", "men", "women", "boys", "girls",
-        "statistics", "census", "how many people", "total population"
-    ]
-
-    # Check if any term is in the query
-    for term in population_terms:
-        if term in query_lower:
-            return True
-
-    return False
+    from intent_matcher import match_intents
+    return match_intents(query).has("population")
 
 def detect_document_type(query):
     """Helper function to detect document type in a query"""
-    query_lower = query.lower()
-
-    # Check for barangay clearance
-    if "clearance" in query_lower:
-        return "barangay clearance"
-
-    # Check for barangay indigency (including common misspellings)
-    if any(word in query_lower for word in ["indigency", "indengency", "indengecy", "indegency"]):
-        return "barangay indigency"
-
-    # Check for barangay residency
-    if "residency" in query_lower:
-        return "barangay residency"
+    from intent_matcher import match_intents
+    matches = match_intents(query)
 
-    # If no specific document type is found, check for general document mentions
-    for doc_type in AVAILABLE_DOCUMENTS:
-        if doc_type in query_lower:
+    for doc_type in DOCUMENT_TYPE_TERMS:
+        if matches.has(f"document:{doc_type}"):
             return doc_type
 
     return None
@@ -16,12 +16,13 @@ the patron saint of farmers. It includes community masses, parades, and cultural
 """
 
 # --- Fiesta Query Checker ---
+FIESTA_TERMS = [
+    "fiesta", "festival", "feast", "celebration", "san isidro", "labrador", "may 15"
+]
+
 def is_about_fiesta(query):
-    query_lower = query.lower()
-    fiesta_terms = [
-        "fiesta", "festival", "feast", "celebration", "san isidro", "labrador", "may 15"
-    ]
-    return any(term in query_lower for term in fiesta_terms)
+    from intent_matcher import match_intents
+    return match_intents(query).has("fiesta")
 
 # Hardcoded Barangay History Information
 BARANGAY_HISTORY_INFO = """
@@ -220,115 +221,88 @@ Day Care Centers:
 8. Amungan Day Care Center III (Sitio Olpoy, Purok 14)
 """
 
+# Keywords for each query type, compiled into one matcher by intent_matcher.py
+HISTORY_TERMS = [
+    "history", "kasaysayan", "alamat", "legend", "story", "origin",
+    "established", "created", "founded", "ra 3590", "1963",
+    "chinese merchant", "amu-an", "amungan name", "how named",
+    "why called", "san isidro", "festival", "celebration"
+]
+
+GEOGRAPHY_TERMS = [
+    "location", "geography", "boundary", "boundaries", "north", "south",
+    "west", "mountains", "sea", "coastal", "area", "square",
+    "kilometers", "terrain", "elevation", "hills", "land use",
+    "residential", "agricultural", "commercial", "san agustin",
+    "bangatalinga", "zambales mountain", "south china sea"
+]
+
+DEMOGRAPHICS_2020_TERMS = [
+    "2020", "census", "religion", "religious", "catholic", "protestant",
+    "iglesia", "baptist", "jehovah", "islam", "families", "households",
+    "11332", "11,332"
+]
+
+FACILITY_TERMS = [
+    "facilities", "electricity", "water", "communication", "transport",
+    "zameco", "jetmatic", "pump", "cellphone", "radio", "bus",
+    "jeepney", "tricycle", "motorcycle"
+]
+
+ECONOMY_TERMS = [
+    "economy", "economic", "income", "revenue", "budget", "ira",
+    "occupation", "livelihood", "farming", "fishing", "business",
+    "employment", "bank", "lending", "financial", "institution",
+    "landbank", "peso", "₱", "13718953"
+]
+
+POLITICAL_TERMS = [
+    "district", "congressional", "puroks", "sitios", "voters",
+    "precincts", "election", "political", "second district",
+    "pangalawang distrito", "5512", "17 precincts"
+]
+
+SCHOOL_TERMS = [
+    "school", "schools", "education", "elementary", "high school",
+    "daycare", "day care", "lawak", "dampay", "national high",
+    "dona obieta", "doña obieta", "learning", "students"
+]
+
 # Helper functions for checking query types
 def is_about_history(query):
     """Check if a query is about barangay history"""
-    query_lower = query.lower()
-    
-    history_terms = [
-        "history", "kasaysayan", "alamat", "legend", "story", "origin",
-        "established", "created", "founded", "ra 3590", "1963",
-        "chinese merchant", "amu-an", "amungan name", "how named",
-        "why called", "san isidro", "festival", "celebration"
-    ]
-    
-    for term in history_terms:
-        if term in query_lower:
-            return True
-    return False
+    from intent_matcher import match_intents
+    return match_intents(query).has("history")
 
 def is_about_geography(query):
     """Check if a query is about barangay geography"""
-    query_lower = query.lower()
-    
-    geography_terms = [
-        "location", "geography", "boundary", "boundaries", "north", "south",
-        "west", "mountains", "sea", "coastal", "area", "square",
-        "kilometers", "terrain", "elevation", "hills", "land use",
-        "residential", "agricultural", "commercial", "san agustin",
-        "bangatalinga", "zambales mountain", "south china sea"
-    ]
-    
-    for term in geography_terms:
-        if term in query_lower:
-            return True
-    return False
+    from intent_matcher import match_intents
+    return match_intents(query).has("geography")
 
 def is_about_demographics_2020(query):
     """Check if a query is about 2020 demographic data"""
-    query_lower = query.lower()
-    
-    demo_terms = [
-        "2020", "census", "religion", "religious", "catholic", "protestant",
-        "iglesia", "baptist", "jehovah", "islam", "families", "households",
-        "11332", "11,332"
-    ]
-    
-    for term in demo_terms:
-        if term in query_lower:
-            return True
-    return False
+    from intent_matcher import match_intents
+    return match_intents(query).has("demographics_2020")
 
 def is_about_facilities(query):
     """Check if a query is about barangay facilities"""
-    query_lower = query.lower()
-    
-    facility_terms = [
-        "facilities", "electricity", "water", "communication", "transport",
-        "zameco", "jetmatic", "pump", "cellphone", "radio", "bus",
-        "jeepney", "tricycle", "motorcycle"
-    ]
-    
-    for term in facility_terms:
-        if term in query_lower:
-            return True
-    return False
+    from intent_matcher import match_intents
+    return match_intents(query).has("facilities")
 
 def is_about_economy(query):
     """Check if a query is about barangay economy"""
-    query_lower = query.lower()
-    
-    economy_terms = [
-        "economy", "economic", "income", "revenue", "budget", "ira",
-        "occupation", "livelihood", "farming", "fishing", "business",
-        "employment", "bank", "lending", "financial", "institution",
-        "landbank", "peso", "₱", "13718953"
-    ]
-    
-    for term in economy_terms:
-        if term in query_lower:
-            return True
-    return False
+    from intent_matcher import match_intents
+    return match_intents(query).has("economy")
 
 def is_about_politics(query):
     """Check if a query is about barangay politics"""
-    query_lower = query.lower()
-    
-    political_terms = [
-        "district", "congressional", "puroks", "sitios", "voters",
-        "precincts", "election", "political", "second district",
-        "pangalawang distrito", "5512", "17 precincts"
-    ]
-    
-    for term in political_terms:
-        if term in query_lower:
-            return True
-    return False
+    from intent_matcher import match_intents
+    return match_intents(query).has("politics")
 
 def is_about_schools(query):
     """Check if a query is about schools in the barangay"""
-    query_lower = query.lower()
-    
-    school_terms = [
-        "school", "schools", "education", "elementary", "high school",
-        "daycare", "day care", "lawak", "dampay", "national high",
-        "dona obieta", "doña obieta", "learning", "students"
-    ]
-    
-    for term in school_terms:
-        if term in query_lower:
-            return True
-    return False
+    from intent_matcher import match_intents
+    return match_intents(query).has("schools")
 
 def get_relevant_info(query):
     """Get relevant information based on the query"""
@@ -0,0 +1,133 @@
+"""
+Barangay Records Module
+Parses the free-text officials and population data in barangay_data.py into structured records.
+barangay_data.py is regenerated by the admin "update officials" form, so parsing happens here,
+once at import, instead of inside that file.
+"""
+
+import re
+from typing import Dict, List, Optional
+
+from barangay_data import BARANGAY_OFFICIALS_INFO
+
+POSITION_PUNONG_BARANGAY = "Punong Barangay"
+POSITION_KAGAWAD = "Barangay Kagawad"
+POSITION_SECRETARY = "Barangay Secretary"
+POSITION_TREASURER = "Barangay Treasurer"
+POSITION_SK_CHAIRPERSON = "SK Chairperson"
+POSITION_SK_OFFICIAL = "SK Official"
+POSITION_PUROK_PRESIDENT = "Purok President"
+
+
+def _section_items(text: str, heading_pattern: str) -> List[str]:
+    """Return the "- item" lines that follow a heading, up to the next blank line"""
+    match = re.search(heading_pattern + r"[^\n]*\n((?:-[^\n]*\n?)+)", text)
+    if not match:
+        return []
+    return [line[1:].strip() for line in match.group(1).splitlines() if line.startswith("-")]
+
+
+def _single_value(text: str, label_pattern: str) -> Optional[str]:
+    match = re.search(label_pattern + r"[^:\n]*:\s*([^\n]+)", text)
+    return match.group(1).strip() if match else None
+
+
+def parse_officials(text: str = BARANGAY_OFFICIALS_INFO) -> Dict:
+    """Parse positions, SK officials and the purok-to-president mapping"""
+    sk_chairperson = None
+    sk_officials = []
+    for item in _section_items(text, r"Sangguniang Kabataan \(SK\) Officials"):
+        if "(SK Chairperson)" in item:
+            sk_chairperson = item.replace("(SK Chairperson)", "").strip()
+        else:
+            sk_officials.append(item)
+
+    purok_presidents = {}
+    for item in _section_items(text, r"Purok Presidents"):
+        match = re.match(r"Purok\s+(\d+)\s*:\s*(.+)", item)
+        if match:
+            purok_presidents[int(match.group(1))] = match.group(2).strip()
+
+    return {
+        "punong_barangay": _single_value(text, r"Punong Barangay"),
+        "kagawads": _section_items(text, r"Barangay Kagawad"),
+        "secretary": _single_value(text, r"Barangay Secretary"),
+        "treasurer": _single_value(text, r"Barangay Treasurer"),
+        "sk_chairperson": sk_chairperson,
+        "sk_officials": sk_officials,
+        "purok_presidents": purok_presidents,
+    }
+
+
+def _parse_int(value: str) -> int:
+    return int(value.replace(",", ""))
+
+
+def parse_population(text: str = BARANGAY_OFFICIALS_INFO) -> List[Dict]:
+    """
+    Parse the age-bracket table into records ordered from youngest to oldest.
+    Each record has label, min_age, max_age (None for the open-ended last bracket), male, female and total.
+    """
+    population_text = text.split("Population Information", 1)[-1]
+    brackets = []
+    for block in re.split(r"\n\s*\n", population_text):
+        lines = [line.strip() for line in block.strip().splitlines() if line.strip()]
+        if not lines:
+            continue
+
+        label = lines[0]
+        if label.lower().startswith("under"):
+            min_age, max_age = 0, int(re.search(r"\d+", label).group()) - 1
+        elif "over" in label.lower():
+            min_age, max_age = int(re.search(r"\d+", label).group()), None
+        else:
+            ages = re.findall(r"\d+", label)
+            if len(ages) != 2:
+                continue
+            min_age, max_age = int(ages[0]), int(ages[1])
+
+        counts = {}
+        for line in lines[1:]:
+            match = re.match(r"(Male|Female|Total)\s*:\s*([\d,]+)", line)
+            if match:
+                counts[match.group(1).lower()] = _parse_int(match.group(2))
+        if "male" not in counts or "female" not in counts:
+            continue
+
+        brackets.append({
+            "label": label,
+            "min_age": min_age,
+            "max_age": max_age,
+            "male": counts["male"],
+            "female": counts["female"],
+            "total": counts.get("total", counts["male"] + counts["female"]),
+        })
+
+    return sorted(brackets, key=lambda bracket: bracket["min_age"])
+
+
+def build_people_index(officials: Dict) -> List[Dict]:
+    """Flatten the officials into (name, position) records for name lookups"""
+    people = []
+
+    def add(name, position, detail=None):
+        if name:
+            people.append({"name": name, "position": position, "detail": detail})
+
+    add(officials["punong_barangay"], POSITION_PUNONG_BARANGAY)
+    for name in officials["kagawads"]:
+        add(name, POSITION_KAGAWAD)
+    add(officials["secretary"], POSITION_SECRETARY)
+    add(officials["treasurer"], POSITION_TREASURER)
+    add(officials["sk_chairperson"], POSITION_SK_CHAIRPERSON)
+    for name in officials["sk_officials"]:
+        add(name, POSITION_SK_OFFICIAL)
+    for purok, name in sorted(officials["purok_presidents"].items()):
+        add(name, POSITION_PUROK_PRESIDENT, f"Purok {purok}")
+    return people
+
+
+# Parsed once at import
+OFFICIALS = parse_officials()
+POPULATION_BRACKETS = parse_population()
+PEOPLE = build_people_index(OFFICIALS)
@@ -0,0 +1,181 @@
+"""
+Chat Statement Benchmark
+Measures one chat turn (load the history context, then save the user and AI messages) the old way,
+with a separate ownership check before every read and write, against the single-statement versions in App.py.
+
+Usage (never point this at the production database; it creates and fills tables):
+    python benchmarks/chat_statements.py --database-url postgresql://localhost/baac_bench
+    python benchmarks/chat_statements.py --database-url ... --turns 2000
+
+Run it against a database on another host as well: the saving is one network round trip per statement,
+so the gap grows with the latency between the app and PostgreSQL.
+The queries mirror the SQL in App.py; keep them in sync when the chat functions change.
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+import psycopg2
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from schema_migrations import migrate  # noqa: E402
+
+CHATS = 200
+USERS = 50
+
+LEGACY_TURN = [
+    ("""
+        SELECT COUNT(*) FROM chat_histories
+        WHERE id = %(chat_id)s AND user_id = %(user_id)s AND is_active = TRUE
+    """, False),
+    ("""
+        SELECT is_user, message
+        FROM chat_messages
+        WHERE chat_id = %(chat_id)s
+        ORDER BY timestamp DESC
+        LIMIT 10
+    """, False),
+    ("""
+        SELECT COUNT(*) FROM chat_histories
+        WHERE id = %(chat_id)s AND user_id = %(user_id)s AND is_active = TRUE
+    """, False),
+    ("""
+        INSERT INTO chat_messages (chat_id, is_user, message)
+        VALUES (%(chat_id)s, TRUE, %(user_message)s)
+    """, False),
+    ("""
+        INSERT INTO chat_messages (chat_id, is_user, message)
+        VALUES (%(chat_id)s, FALSE, %(ai_message)s)
+    """, False),
+    ("""
+        UPDATE chat_histories
+        SET updated_at = CURRENT_TIMESTAMP
+        WHERE id = %(chat_id)s
+    """, True),
+]
+
+SINGLE_STATEMENT_TURN = [
+    ("""
+        SELECT recent.is_user, recent.message
+        FROM chat_histories ch
+        LEFT JOIN LATERAL (
+            SELECT is_user, message
+            FROM chat_messages
+            WHERE chat_id = ch.id
+            ORDER BY timestamp DESC, id DESC
+            LIMIT 10
+        ) recent ON TRUE
+        WHERE ch.id = %(chat_id)s AND ch.user_id = %(user_id)s AND ch.is_active = TRUE
+    """, False),
+    ("""
+        WITH owned_chat AS (
+            UPDATE chat_histories
+            SET updated_at = CURRENT_TIMESTAMP
+            WHERE id = %(chat_id)s AND user_id = %(user_id)s AND is_active = TRUE
+            RETURNING id
+        ),
+        saved AS (
+            INSERT INTO chat_messages (chat_id, is_user, message)
+            SELECT owned_chat.id, turn.is_user, turn.message
+            FROM owned_chat,
+                 (VALUES (1, TRUE, %(user_message)s), (2, FALSE, %(ai_message)s)) AS turn(position, is_user, message)
+            ORDER BY turn.position
+            RETURNING id
+        )
+        SELECT COUNT(*) FROM saved
+    """, True),
+]
+
+
+def seed(connection) -> list:
+    """A handful of users with a few chats each; returns (chat_id, user_id) pairs"""
+    cursor = connection.cursor()
+    cursor.execute("""
+        INSERT INTO app_users (name, email, purok, password_hash, is_verified)
+        SELECT 'Chat Bench ' || i, 'chat-bench-' || i || '@example.com', 'Purok 1', 'x', TRUE
+        FROM generate_series(1, %s) AS i
+        ON CONFLICT DO NOTHING
+    """, (USERS,))
+    cursor.execute("""
+        INSERT INTO chat_histories (user_id, title)
+        SELECT u.id, 'Chat ' || i
+        FROM generate_series(1, %s) AS i
+        JOIN LATERAL (
+            SELECT id FROM app_users WHERE email = 'chat-bench-' || (1 + i %% %s) || '@example.com'
+        ) u ON TRUE
+        RETURNING id, user_id
+    """, (CHATS, USERS))
+    chats = cursor.fetchall()
+    connection.commit()
+    cursor.close()
+    return chats
+
+
+def run_turns(connection, statements: list, chats: list, turns: int) -> dict:
+    """Run `turns` chat turns and time each, counting statements and commits as round trips"""
+    cursor = connection.cursor()
+    timings = []
+    round_trips = 0
+    for turn in range(turns):
+        chat_id, user_id = chats[turn % len(chats)]
+        params = {
+            "chat_id": chat_id,
+            "user_id": user_id,
+            "user_message": f"question {turn}",
+            "ai_message": f"answer {turn}",
+        }
+        started = time.perf_counter()
+        for sql, commit in statements:
+            cursor.execute(sql, params)
+            if cursor.description:
+                cursor.fetchall()
+            round_trips += 1
+            if commit:
+                connection.commit()
+                round_trips += 1
+        timings.append((time.perf_counter() - started) * 1000)
+    cursor.close()
+    return {
+        "round_trips_per_turn": round_trips / turns,
+        "median_ms": round(statistics.median(timings), 3),
+        "p95_ms": round(sorted(timings)[int(len(timings) * 0.95) - 1], 3),
+        "total_s": round(sum(timings) / 1000, 3),
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=os.getenv("BENCH_DATABASE_URL"), required=not os.getenv("BENCH_DATABASE_URL"))
+    parser.add_argument("--turns", type=int, default=1000)
+    args = parser.parse_args()
+
+    if args.database_url == os.getenv("DATABASE_URL"):
+        raise SystemExit("Refusing to run against DATABASE_URL; use a scratch database")
+
+    connection = psycopg2.connect(args.database_url)
+    migrate(connection)
+    chats = seed(connection)
+
+    # Warm up caches and plans so the first variant measured is not penalised
+    run_turns(connection, SINGLE_STATEMENT_TURN, chats, min(args.turns, 100))
+    results = {
+        "separate checks": run_turns(connection, LEGACY_TURN, chats, args.turns),
+        "single statement": run_turns(connection, SINGLE_STATEMENT_TURN, chats, args.turns),
+    }
+    connection.close()
+
+    print(f"{'variant':<18} {'round trips':>12} {'median ms':>10} {'p95 ms':>8} {'total s':>8}")
+    for name, result in results.items():
+        print(f"{name:<18} {result['round_trips_per_turn']:>12} {result['median_ms']:>10} "
+              f"{result['p95_ms']:>8} {result['total_s']:>8}")
+    old, new = results["separate checks"], results["single statement"]
+    if new["median_ms"]:
+        print(f"\nSpeedup per turn: {old['median_ms'] / new['median_ms']:.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
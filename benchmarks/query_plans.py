@@ -0,0 +1,314 @@
+"""
+Query Plan Benchmark
+Seeds a scratch PostgreSQL database with realistic volumes, then records EXPLAIN ANALYZE plans and timings
+for the hot queries before and after the index migration (migrations/0004_hot_path_indexes.sql).
+
+Usage (never point this at the production database; it creates and fills tables):
+    python benchmarks/query_plans.py --database-url postgresql://localhost/baac_bench
+    python benchmarks/query_plans.py --database-url ... --compare benchmarks/results/baseline.json
+
+The queries mirror the SQL in App.py; keep them in sync when the routes change.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+from datetime import datetime
+
+import psycopg2
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from schema_migrations import migrate  # noqa: E402
+
+# Schema version before the index pack, and the index pack itself
+BASELINE_VERSION = 3
+INDEX_VERSION = 4
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+# Rows per table; roughly two years of a busy barangay deployment
+VOLUMES = {
+    "users": 5000,
+    "conversation_logs": 200000,
+    "document_submissions": 50000,
+    "chat_histories": 20000,
+    "chat_messages": 400000,
+    "daily_copy_requests": 30000,
+    "days": 730,
+}
+
+SEED_STATEMENTS = [
+    """
+    INSERT INTO app_users (name, email, purok, password_hash, oauth_provider, is_verified, created_at)
+    SELECT 'User ' || i, 'user' || i || '@example.com', 'Purok ' || (1 + i %% 7), 'x',
+           CASE WHEN i %% 3 = 0 THEN 'google' END, TRUE,
+           now() - (random() * %(days)s) * INTERVAL '1 day'
+    FROM generate_series(1, %(users)s) AS i
+    """,
+    """
+    INSERT INTO conversation_logs (user_input, ai_response, timestamp, user_id)
+    SELECT (ARRAY['who is the kapitan', 'how to get barangay clearance', 'when is the fiesta',
+                  'population of amungan', 'where is the barangay hall'])[1 + i %% 5] || ' ' || (i %% 50),
+           repeat('answer ', 40),
+           now() - (random() * %(days)s) * INTERVAL '1 day',
+           1 + (i %% %(users)s)
+    FROM generate_series(1, %(conversation_logs)s) AS i
+    """,
+    """
+    INSERT INTO document_submissions (user_id, document_types, request_date, name, purok, purpose,
+                                      copyc, copyi, copyr, status, submission_date)
+    SELECT 1 + (i %% %(users)s),
+           ARRAY[(ARRAY['barangay clearance', 'barangay indigency', 'barangay residency'])[1 + i %% 3]],
+           CURRENT_DATE - (i %% %(days)s), 'User ' || (1 + i %% %(users)s), 'Purok ' || (1 + i %% 7), 'Employment',
+           1, 0, 0,
+           (ARRAY['Pending', 'Approved', 'Rejected', 'Claimed'])[1 + i %% 4],
+           now() - (random() * %(days)s) * INTERVAL '1 day'
+    FROM generate_series(1, %(document_submissions)s) AS i
+    """,
+    """
+    INSERT INTO chat_histories (user_id, title, created_at, updated_at, is_active)
+    SELECT 1 + (i %% %(users)s), 'Chat ' || i,
+           now() - (random() * %(days)s) * INTERVAL '1 day',
+           now() - (random() * 30) * INTERVAL '1 day',
+           i %% 10 <> 0
+    FROM generate_series(1, %(chat_histories)s) AS i
+    """,
+    """
+    INSERT INTO chat_messages (chat_id, is_user, message, timestamp)
+    SELECT 1 + (i %% %(chat_histories)s), i %% 2 = 0, repeat('message ', 20),
+           now() - (random() * %(days)s) * INTERVAL '1 day'
+    FROM generate_series(1, %(chat_messages)s) AS i
+    """,
+    """
+    INSERT INTO daily_copy_requests (user_id, document_type, request_date, copy_count)
+    SELECT 1 + (i %% %(users)s),
+           (ARRAY['barangay clearance', 'barangay indigency', 'barangay residency'])[1 + i %% 3],
+           CURRENT_DATE - (i / %(users)s), 1
+    FROM generate_series(1, %(daily_copy_requests)s) AS i
+    ON CONFLICT DO NOTHING
+    """,
+    """
+    INSERT INTO website_visits (visit_date, visit_count)
+    SELECT CURRENT_DATE - i, 50 + (random() * 200)::int
+    FROM generate_series(0, %(days)s - 1) AS i
+    """,
+    """
+    INSERT INTO document_requests (request_date, document_type, request_count)
+    SELECT CURRENT_DATE - i, t, 1 + (random() * 20)::int
+    FROM generate_series(0, %(days)s - 1) AS i,
+         unnest(ARRAY['barangay clearance', 'barangay indigency', 'barangay residency']) AS t
+    """,
+]
+
+# (name, sql, params) for the hot queries; %(user_id)s and %(chat_id)s are filled from the seeded data
+QUERIES = [
+    ("admin_stats.document_types_30d", """
+        SELECT UNNEST(document_types) AS document_type, COUNT(*) AS total_requests
+        FROM document_submissions
+        WHERE submission_date >= CURRENT_DATE - INTERVAL '30 days'
+        GROUP BY UNNEST(document_types)
+        ORDER BY total_requests DESC
+    """),
+    ("admin_document_requests.latest", """
+        SELECT ds.id, ds.status, ds.submission_date, au.name
+        FROM document_submissions ds
+        LEFT JOIN app_users au ON ds.user_id = au.id
+        ORDER BY ds.submission_date DESC, ds.id DESC
+        LIMIT 26
+    """),
+    ("custom_report.status_counts", """
+        SELECT status, COUNT(*) AS count
+        FROM document_submissions
+        WHERE submission_date >= %(start)s AND submission_date < %(end)s::date + 1
+        GROUP BY status
+        ORDER BY count DESC
+    """),
+    ("custom_report.top_queries", """
+        SELECT user_input AS query, COUNT(*) AS count
+        FROM conversation_logs
+        WHERE timestamp >= %(start)s AND timestamp < %(end)s::date + 1
+        GROUP BY user_input
+        ORDER BY count DESC
+        LIMIT 10
+    """),
+    ("custom_report.registrations", """
+        SELECT DATE(created_at) AS reg_date, COUNT(*) AS count
+        FROM app_users
+        WHERE created_at >= %(start)s AND created_at < %(end)s::date + 1
+        GROUP BY reg_date
+        ORDER BY reg_date
+    """),
+    ("ai_report.daily_conversations", """
+        SELECT COUNT(*) AS total_conversations, DATE(timestamp) AS date,
+               AVG(LENGTH(user_input)), AVG(LENGTH(ai_response))
+        FROM conversation_logs
+        GROUP BY DATE(timestamp)
+        ORDER BY date DESC
+        LIMIT 7
+    """),
+    ("get_chat_history_context.recent_messages", """
+        SELECT is_user, message
+        FROM chat_messages
+        WHERE chat_id = %(chat_id)s
+        ORDER BY timestamp DESC
+        LIMIT 10
+    """),
+    ("get_user_chats.active_chats", """
+        SELECT id, title, created_at, updated_at
+        FROM chat_histories
+        WHERE user_id = %(user_id)s AND is_active = TRUE
+        ORDER BY updated_at DESC
+    """),
+    ("user_profile.submissions", """
+        SELECT id, request_date, submission_date, status, notes
+        FROM document_submissions
+        WHERE user_id = %(user_id)s
+        ORDER BY submission_date DESC
+    """),
+    ("check_daily_limits.used_copies", """
+        SELECT COALESCE(SUM(copy_count), 0) FROM daily_copy_requests
+        WHERE user_id = %(user_id)s AND document_type = 'barangay clearance' AND request_date = CURRENT_DATE
+    """),
+]
+
+
+def seed(connection) -> None:
+    cursor = connection.cursor()
+    cursor.execute("SELECT COUNT(*) FROM app_users")
+    if cursor.fetchone()[0]:
+        raise SystemExit("Database already has users; use an empty scratch database or --skip-seed")
+    for statement in SEED_STATEMENTS:
+        cursor.execute(statement, VOLUMES)
+    connection.commit()
+    cursor.execute("ANALYZE")
+    connection.commit()
+    cursor.close()
+
+
+def query_params(connection) -> dict:
+    cursor = connection.cursor()
+    cursor.execute("SELECT user_id FROM chat_histories GROUP BY user_id ORDER BY COUNT(*) DESC LIMIT 1")
+    user_id = cursor.fetchone()[0]
+    cursor.execute("SELECT chat_id FROM chat_messages GROUP BY chat_id ORDER BY COUNT(*) DESC LIMIT 1")
+    chat_id = cursor.fetchone()[0]
+    cursor.execute("SELECT (CURRENT_DATE - 30)::text, CURRENT_DATE::text")
+    start, end = cursor.fetchone()
+    cursor.close()
+    return {"user_id": user_id, "chat_id": chat_id, "start": start, "end": end}
+
+
+def plan_nodes(plan: dict) -> list:
+    """Flatten a JSON plan into 'Node Type on relation (index)' strings"""
+    label = plan["Node Type"]
+    if plan.get("Index Name"):
+        label += f" using {plan['Index Name']}"
+    elif plan.get("Relation Name"):
+        label += f" on {plan['Relation Name']}"
+    nodes = [label]
+    for child in plan.get("Plans", []):
+        nodes.extend(plan_nodes(child))
+    return nodes
+
+
+def explain(connection, params: dict, runs: int) -> dict:
+    """EXPLAIN ANALYZE each query `runs` times and keep the median execution time and the last plan"""
+    results = {}
+    cursor = connection.cursor()
+    for name, sql in QUERIES:
+        timings = []
+        plan = None
+        for _ in range(runs):
+            cursor.execute("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + sql, params)
+            plan = cursor.fetchone()[0][0]
+            timings.append(plan["Execution Time"])
+        connection.rollback()
+        results[name] = {
+            "median_ms": round(statistics.median(timings), 3),
+            "min_ms": round(min(timings), 3),
+            "nodes": plan_nodes(plan["Plan"]),
+            "plan": plan,
+        }
+    cursor.close()
+    return results
+
+
+def print_comparison(before: dict, after: dict) -> None:
+    print(f"{'query':<45} {'before ms':>10} {'after ms':>10} {'speedup':>8}")
+    for name in after:
+        old = before.get(name, {}).get("median_ms")
+        new = after[name]["median_ms"]
+        speedup = f"{old / new:.1f}x" if old and new else "-"
+        print(f"{name:<45} {old if old is not None else '-':>10} {new:>10} {speedup:>8}")
+
+
+def find_regressions(baseline: dict, current: dict, tolerance: float) -> list:
+    """Queries slower than `tolerance` times the baseline, or that stopped using an index they used"""
+    regressions = []
+    for name, result in current.items():
+        previous = baseline.get(name)
+        if not previous:
+            continue
+        if result["median_ms"] > previous["median_ms"] * tolerance and result["median_ms"] - previous["median_ms"] > 1:
+            regressions.append(f"{name}: {previous['median_ms']}ms -> {result['median_ms']}ms")
+        lost = {node for node in previous["nodes"] if " using " in node} - set(result["nodes"])
+        if lost:
+            regressions.append(f"{name}: no longer uses {', '.join(sorted(lost))}")
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=os.getenv("BENCH_DATABASE_URL"), required=not os.getenv("BENCH_DATABASE_URL"))
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--skip-seed", action="store_true", help="Reuse data from a previous run")
+    parser.add_argument("--compare", help="Baseline results JSON; exit 1 if a query regressed")
+    parser.add_argument("--tolerance", type=float, default=1.5, help="Allowed slowdown factor against --compare")
+    args = parser.parse_args()
+
+    if args.database_url == os.getenv("DATABASE_URL"):
+        raise SystemExit("Refusing to run against DATABASE_URL; use a scratch database")
+
+    connection = psycopg2.connect(args.database_url)
+    migrate(connection, target=BASELINE_VERSION)
+    if not args.skip_seed:
+        seed(connection)
+    params = query_params(connection)
+
+    cursor = connection.cursor()
+    cursor.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version")
+    indexed = cursor.fetchone()[0] >= INDEX_VERSION
+    cursor.close()
+
+    before = None
+    if not indexed:
+        before = explain(connection, params, args.runs)
+        migrate(connection, target=INDEX_VERSION)
+        cursor = connection.cursor()
+        cursor.execute("ANALYZE")
+        connection.commit()
+        cursor.close()
+    after = explain(connection, params, args.runs)
+    connection.close()
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    output = os.path.join(RESULTS_DIR, f"query_plans_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump({"volumes": VOLUMES, "params": params, "before": before, "after": after}, f, indent=2, default=str)
+
+    print_comparison(before or {}, after)
+    print(f"\nPlans written to {output}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)["after"]
+        regressions = find_regressions(baseline, after, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,245 @@
+"""
+Chat Context Cache Module
+Bounded LRU of the recent plain-text messages (plus the rolling summary) of each chat, kept current
+write-through as turns are saved, so building an LLM prompt for a logged-in chat normally needs no database round trip
+"""
+
+import os
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows development machines: the cache stays coherent within one process only
+    fcntl = None
+
+# (is_user, plain text) in chronological order
+ChatMessage = Tuple[bool, str]
+
+
+class ChatWindow:
+    """
+    The newest messages of a chat, the chat's total message count, and the rolling summary
+    that covers its first `summarized` messages
+    """
+    __slots__ = ("messages", "total", "summary", "summarized")
+
+    def __init__(self, messages: List[ChatMessage], total: int, summary: Optional[str] = None, summarized: int = 0):
+        self.messages = messages
+        self.total = total
+        self.summary = summary
+        self.summarized = summarized
+
+    def copy(self) -> "ChatWindow":
+        return ChatWindow(list(self.messages), self.total, self.summary, self.summarized)
+
+
+class _Entry:
+    __slots__ = ("user_id", "window", "version")
+
+    def __init__(self, user_id, window: ChatWindow, version: str):
+        self.user_id = user_id
+        self.window = window
+        self.version = version
+
+
+class _VersionFiles:
+    """
+    One small file per chat holding a random version token, shared by every worker on the host.
+    Every write to a chat replaces the token under a file lock; an entry cached by any worker
+    is only served while it was built against the chat's current token.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._writes = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, chat_id) -> str:
+        return os.path.join(self.directory, f"chat-{int(chat_id)}")
+
+    def read(self, chat_id) -> Optional[str]:
+        try:
+            with open(self._path(chat_id), "r", encoding="ascii") as f:
+                return f.read().strip() or None
+        except OSError:
+            return None
+
+    def replace(self, chat_id, on_replace) -> str:
+        """Swap in a new token and call on_replace(old, new) while other writers are locked out"""
+        new = uuid.uuid4().hex
+        with open(self._path(chat_id), "a+", encoding="ascii") as f:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                f.seek(0)
+                old = f.read().strip() or None
+                on_replace(old, new)
+                f.seek(0)
+                f.truncate()
+                f.write(new)
+                f.flush()
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+        self._writes += 1
+        if self._writes % 1000 == 0:
+            self._prune()
+        return new
+
+    def _prune(self, max_age: float = 86400) -> None:
+        # A missing file only turns the next lookup into a miss, so old ones can go at any time
+        cutoff = time.time() - max_age
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+            except OSError:
+                pass
+
+
+class _LocalVersions:
+    """In-process version tokens, used when file locks are unavailable"""
+
+    def __init__(self):
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def read(self, chat_id) -> Optional[str]:
+        with self._lock:
+            return self._versions.get(chat_id)
+
+    def replace(self, chat_id, on_replace) -> str:
+        new = uuid.uuid4().hex
+        with self._lock:
+            on_replace(self._versions.get(chat_id), new)
+            self._versions[chat_id] = new
+        return new
+
+
+class ChatContextCache:
+    """
+    Thread-safe LRU of per-chat context windows (the last `window` messages as plain text).
+    - fill() stores a window loaded from the database, tagged with the version read before loading
+    - append_turn() updates the cached window in place after a turn is saved
+    - invalidate() drops a chat everywhere on the host (rename, delete, new summary)
+    A write made by another worker replaces the chat's version, so stale windows are never served;
+    across several hosts the versions are not shared, so run with max_chats=0 there.
+    """
+
+    def __init__(self, max_chats: int = 1024, window: int = 10, directory: Optional[str] = None):
+        self.max_chats = max_chats
+        self.window = window
+        self.versions = _VersionFiles(directory) if directory and fcntl is not None else _LocalVersions()
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.fills = 0
+        self.appends = 0
+        self.invalidations = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_chats > 0
+
+    def get(self, chat_id, user_id) -> Optional[ChatWindow]:
+        """The chat's cached window, or None if it is missing, stale or belongs to someone else"""
+        if not self.enabled:
+            return None
+        version = self.versions.read(chat_id)
+        with self._lock:
+            entry = self._entries.get(chat_id)
+            if entry is None or version is None or entry.version != version or entry.user_id != user_id:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(chat_id)
+            self.hits += 1
+            return entry.window.copy()
+
+    def version(self, chat_id) -> Optional[str]:
+        """Version to pass to fill(); read it before loading the window from the database"""
+        if not self.enabled:
+            return None
+        version = self.versions.read(chat_id)
+        if version is None:
+            version = self.versions.replace(chat_id, lambda old, new: None)
+        return version
+
+    def fill(self, chat_id, user_id, window: ChatWindow, version: Optional[str]) -> None:
+        """Cache a window loaded from the database"""
+        if not self.enabled or version is None:
+            return
+        window = window.copy()
+        del window.messages[:-self.window]
+        with self._lock:
+            self._entries[chat_id] = _Entry(user_id, window, version)
+            self._entries.move_to_end(chat_id)
+            self.fills += 1
+            self._evict()
+
+    def append_turn(self, chat_id, user_id, user_text: str, ai_text: str) -> None:
+        """Write-through after a turn is saved; the entry is dropped if another write got in between"""
+        if not self.enabled:
+            return
+
+        def on_replace(old, new):
+            with self._lock:
+                entry = self._entries.get(chat_id)
+                if entry is None:
+                    return
+                if old is None or entry.version != old or entry.user_id != user_id:
+                    del self._entries[chat_id]
+                    return
+                entry.window.messages.extend([(True, user_text), (False, ai_text)])
+                del entry.window.messages[:-self.window]
+                entry.window.total += 2
+                entry.version = new
+                self._entries.move_to_end(chat_id)
+                self.appends += 1
+
+        self.versions.replace(chat_id, on_replace)
+
+    def invalidate(self, chat_id) -> None:
+        """Forget a chat in this worker and make every other worker's copy stale"""
+        if not self.enabled:
+            return
+
+        def on_replace(old, new):
+            with self._lock:
+                self._entries.pop(chat_id, None)
+                self.invalidations += 1
+
+        self.versions.replace(chat_id, on_replace)
+
+    def _evict(self) -> None:
+        while len(self._entries) > self.max_chats:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        """Snapshot of the cache counters for monitoring"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "chats": len(self._entries),
+                "max_chats": self.max_chats,
+                "window": self.window,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "fills": self.fills,
+                "appends": self.appends,
+                "invalidations": self.invalidations,
+                "evictions": self.evictions,
+                "cross_worker": isinstance(self.versions, _VersionFiles),
+            }
+
+
+def default_cache_dir() -> str:
+    """Directory for the host-wide chat version files"""
+    return os.getenv("CHAT_CONTEXT_CACHE_DIR") or os.path.join(tempfile.gettempdir(), "baac-chat-context")
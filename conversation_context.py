@@ -0,0 +1,163 @@
+"""
+Conversation Context Module
+Builds the conversation-history part of LLM prompts within a token budget: newest turns first, the oldest
+kept turn truncated to fit, and a rolling summary (generated off the request path) standing in for the rest
+"""
+
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable, List, NamedTuple, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# (is_user, plain text) in chronological order
+ChatMessage = Tuple[bool, str]
+
+HISTORY_HEADER = "\nRecent conversation history:\n"
+SUMMARY_HEADER = "\nSummary of the earlier conversation:\n"
+
+# A truncated message shorter than this is not worth including
+MIN_TRUNCATED_TOKENS = 24
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token), the same rule the LLM limiter uses"""
+    return (len(text) + 3) // 4
+
+
+def truncate_to_tokens(text: str, tokens: int) -> str:
+    """Cut text to roughly `tokens` tokens at a word boundary"""
+    limit = tokens * 4
+    if len(text) <= limit:
+        return text
+    cut = text[:max(limit - 1, 0)]
+    if " " in cut:
+        cut = cut[:cut.rindex(" ")]
+    return cut.rstrip() + "…"
+
+
+def format_message(is_user: bool, text: str) -> str:
+    return f"User: {text}\n" if is_user else f"BAAC: {text}\n\n"
+
+
+class HistoryContext(NamedTuple):
+    text: str
+    kept: int  # newest messages included, the oldest of them possibly truncated
+    tokens: int
+
+
+def build_history_context(messages: List[ChatMessage], budget: int, summary: Optional[str] = None) -> HistoryContext:
+    """
+    Prompt text for the conversation so far using at most about `budget` tokens.
+    The summary (if any) is included first; the remaining budget goes to the newest messages,
+    walking backwards and truncating the oldest one that only partly fits.
+    """
+    if not messages and not summary:
+        return HistoryContext("", 0, 0)
+
+    parts = []
+    used = estimate_tokens(HISTORY_HEADER)
+    if summary:
+        summary_text = SUMMARY_HEADER + truncate_to_tokens(summary, max(budget // 3, MIN_TRUNCATED_TOKENS)) + "\n"
+        used += estimate_tokens(summary_text)
+
+    for is_user, text in reversed(messages):
+        line = format_message(is_user, text)
+        cost = estimate_tokens(line)
+        if used + cost <= budget:
+            parts.append(line)
+            used += cost
+            continue
+
+        remaining = budget - used - estimate_tokens(format_message(is_user, ""))
+        if remaining >= MIN_TRUNCATED_TOKENS:
+            line = format_message(is_user, truncate_to_tokens(text, remaining))
+            parts.append(line)
+            used += estimate_tokens(line)
+        break
+
+    text = (summary_text if summary else "") + (HISTORY_HEADER + "".join(reversed(parts)) if parts else "")
+    return HistoryContext(text, len(parts), used)
+
+
+class BackgroundSummarizer:
+    """
+    Runs summarize(chat_id) on a background thread for chats whose history outgrew the prompt budget.
+    Requests for a chat that is already queued are merged; the queue is bounded and drops the oldest request,
+    which is safe because the next turn in that chat asks again.
+    """
+
+    def __init__(self, summarize: Callable[[int], None], max_pending: int = 256):
+        self.summarize = summarize
+        self.max_pending = max_pending
+        self._pending = OrderedDict()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._pid = None
+
+        self.requested = 0
+        self.completed = 0
+        self.failures = 0
+        self.dropped = 0
+
+    def _ensure_thread(self) -> None:
+        # Started lazily, and again after a fork, since threads do not survive into gunicorn workers
+        if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                self._pending.clear()
+                self._pid = os.getpid()
+                self._thread = None
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="chat-summarizer", daemon=True)
+                self._thread.start()
+
+    def request(self, chat_id: int) -> None:
+        """Queue a chat for summarizing; returns immediately"""
+        self._ensure_thread()
+        with self._lock:
+            if chat_id in self._pending:
+                return
+            if len(self._pending) >= self.max_pending:
+                self._pending.popitem(last=False)
+                self.dropped += 1
+            self._pending[chat_id] = True
+            self.requested += 1
+        self._wakeup.set()
+
+    def _next(self) -> Optional[int]:
+        with self._lock:
+            if not self._pending:
+                self._wakeup.clear()
+                return None
+            chat_id, _ = self._pending.popitem(last=False)
+            return chat_id
+
+    def _run(self) -> None:
+        while True:
+            self._wakeup.wait()
+            chat_id = self._next()
+            if chat_id is None:
+                continue
+            try:
+                self.summarize(chat_id)
+                with self._lock:
+                    self.completed += 1
+            except Exception as e:
+                logger.error(f"Summarizing chat {chat_id} failed: {e}")
+                with self._lock:
+                    self.failures += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "pending": len(self._pending),
+                "requested": self.requested,
+                "completed": self.completed,
+                "failures": self.failures,
+                "dropped": self.dropped,
+            }
@@ -0,0 +1,84 @@
+"""
+Daily Limits Module
+Per-user, per-document-type daily request quotas. A submission claims quota for every requested type
+in one conditional upsert, so concurrent submissions queue on the counter rows and can never overshoot a limit
+"""
+
+import json
+from datetime import date, datetime, timedelta
+from typing import Dict, List
+
+# Claims one request of quota per type in a single conditional upsert. Existing counters are only
+# bumped while they stay within the limit (the row lock makes concurrent submissions queue up here),
+# and every requested type comes back with its count after the claim, or the unchanged count if it was refused.
+CLAIM_DAILY_LIMITS_QUERY = """
+WITH requested AS (
+    SELECT document_type, (%(limits)s::jsonb ->> document_type)::int AS daily_limit
+    FROM unnest(%(document_types)s::text[]) AS document_type
+),
+claimed AS (
+    INSERT INTO daily_copy_requests (user_id, document_type, request_date, copy_count)
+    SELECT %(user_id)s, document_type, %(today)s, 1
+    FROM requested
+    WHERE daily_limit >= 1
+    ON CONFLICT (user_id, document_type, request_date)
+    DO UPDATE SET copy_count = daily_copy_requests.copy_count + EXCLUDED.copy_count
+    WHERE daily_copy_requests.copy_count + EXCLUDED.copy_count
+          <= (%(limits)s::jsonb ->> EXCLUDED.document_type)::int
+    RETURNING document_type, copy_count
+)
+SELECT r.document_type, c.copy_count IS NOT NULL AS allowed, COALESCE(c.copy_count, d.copy_count, 0) AS used
+FROM requested r
+LEFT JOIN claimed c ON c.document_type = r.document_type
+LEFT JOIN daily_copy_requests d
+       ON d.user_id = %(user_id)s AND d.document_type = r.document_type AND d.request_date = %(today)s
+"""
+
+# Today's usage per limited type; types not used today have no row
+DAILY_USAGE_QUERY = """
+SELECT document_type, SUM(copy_count) FROM daily_copy_requests
+WHERE user_id = %s AND request_date = %s AND document_type = ANY(%s)
+GROUP BY document_type
+"""
+
+
+def copy_limit_status(limit: int, used: int, today: date) -> Dict:
+    """One document type's quota as shown by the copy limit UI"""
+    tomorrow = today + timedelta(days=1)
+    return {
+        "limit": limit,
+        "used": used,
+        "remaining": max(0, limit - used),
+        "reset_time": tomorrow.isoformat(),
+        "reset_timestamp": int((datetime.combine(tomorrow, datetime.min.time()) - datetime(1970, 1, 1)).total_seconds() * 1000)
+    }
+
+
+def daily_limit_usage(cursor, limits: Dict[str, int], user_id, today: date) -> Dict[str, Dict]:
+    """Today's quota for every limited document type, in one grouped query"""
+    cursor.execute(DAILY_USAGE_QUERY, (user_id, today, list(limits)))
+    used = dict(cursor.fetchall())
+    return {doc_type: copy_limit_status(limit, used.get(doc_type, 0), today) for doc_type, limit in limits.items()}
+
+
+def claim_daily_limits(cursor, limits: Dict[str, int], user_id, document_types: List[str], today: date) -> Dict[str, Dict]:
+    """
+    Claim today's quota for the requested document types (which must all be keys of `limits`).
+    Every status has "allowed"; the caller rolls the transaction back if any type was refused.
+    """
+    cursor.execute(CLAIM_DAILY_LIMITS_QUERY, {
+        "limits": json.dumps(limits),
+        "document_types": document_types,
+        "user_id": user_id,
+        "today": today
+    })
+
+    limit_status = {}
+    for doc_type, allowed, used in cursor.fetchall():
+        status = copy_limit_status(limits[doc_type], used, today)
+        status["allowed"] = allowed
+        status["document_type"] = doc_type
+        if not allowed:
+            status["message"] = f"Daily limit reached for {doc_type}. You can request again tomorrow at midnight."
+        limit_status[doc_type] = status
+    return limit_status
@@ -0,0 +1,174 @@
+"""
+Database Context Module
+Request-scoped PostgreSQL connections: the first get_connection() in a request checks a connection
+out of the pool and every later helper in the same request reuses it until teardown
+"""
+
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import g, has_app_context
+from psycopg2 import extensions
+
+logger = logging.getLogger(__name__)
+
+# Checkouts slower than this are logged so pool pressure shows up in the logs
+SLOW_CHECKOUT_MS = 100
+
+
+class RequestConnectionManager:
+    """
+    Hands out one pooled connection per Flask app context and records checkout metrics.
+    Outside an app context (startup code, background threads) every call checks out its own connection.
+    """
+
+    def __init__(self, connection_pool):
+        self.pool = connection_pool
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.reuses = 0
+        self.checkout_failures = 0
+        self.early_releases = 0
+        self.rollbacks = 0
+        self.discarded = 0
+        self.in_use = 0
+        self.peak_in_use = 0
+        self.total_wait_ms = 0.0
+        self.max_wait_ms = 0.0
+
+    def _checkout(self):
+        started = time.perf_counter()
+        try:
+            connection = self.pool.getconn()
+        except Exception:
+            with self._lock:
+                self.checkout_failures += 1
+                in_use = self.in_use
+            logger.error(f"Database pool checkout failed with {in_use} connections in use in this worker")
+            raise
+
+        waited_ms = (time.perf_counter() - started) * 1000
+        with self._lock:
+            self.checkouts += 1
+            self.in_use += 1
+            self.peak_in_use = max(self.peak_in_use, self.in_use)
+            self.total_wait_ms += waited_ms
+            self.max_wait_ms = max(self.max_wait_ms, waited_ms)
+        if waited_ms > SLOW_CHECKOUT_MS:
+            logger.warning(f"Slow database pool checkout: {waited_ms:.0f}ms")
+        return connection
+
+    def _checkin(self, connection):
+        # Like the pool's own putconn, drop uncommitted work so the next user starts clean
+        close = bool(connection.closed)
+        if not close:
+            try:
+                if connection.info.transaction_status != extensions.TRANSACTION_STATUS_IDLE:
+                    connection.rollback()
+                    with self._lock:
+                        self.rollbacks += 1
+            except Exception as e:
+                logger.warning(f"Discarding database connection that failed to roll back: {e}")
+                close = True
+
+        try:
+            self.pool.putconn(connection, close=close)
+        finally:
+            with self._lock:
+                self.in_use -= 1
+                if close:
+                    self.discarded += 1
+
+    def get_connection(self):
+        """Return the request's connection, checking one out on first use"""
+        if not has_app_context():
+            return self._checkout()
+
+        connection = g.get("_db_connection")
+        if connection is not None and connection.closed:
+            # The server dropped it mid-request; replace it
+            self._forget_request_connection()
+            connection = None
+
+        if connection is None:
+            connection = self._checkout()
+            g._db_connection = connection
+            g._db_depth = 0
+        else:
+            with self._lock:
+                self.reuses += 1
+
+        g._db_depth += 1
+        return connection
+
+    def return_connection(self, connection):
+        """Release a connection from get_connection; the request's connection stays bound until teardown"""
+        if connection is None:
+            return
+        if not has_app_context() or connection is not g.get("_db_connection"):
+            self._checkin(connection)
+            return
+
+        g._db_depth = max(0, g._db_depth - 1)
+        if g._db_depth == 0 and not connection.closed:
+            # Same clean-slate guarantee as a real checkin, without the pool round trip
+            try:
+                if connection.info.transaction_status != extensions.TRANSACTION_STATUS_IDLE:
+                    connection.rollback()
+                    with self._lock:
+                        self.rollbacks += 1
+            except Exception as e:
+                logger.warning(f"Request database connection failed to roll back: {e}")
+                self._forget_request_connection()
+
+    def _forget_request_connection(self):
+        connection = g.pop("_db_connection", None)
+        g.pop("_db_depth", None)
+        if connection is not None:
+            self._checkin(connection)
+
+    def release_request_connection(self):
+        """
+        Give the request's connection back to the pool early, e.g. before a long LLM call,
+        so it is not pinned while the request waits on something else.
+        The next get_connection() in the request checks out a fresh one.
+        """
+        if not has_app_context() or g.get("_db_connection") is None or g.get("_db_depth", 0) > 0:
+            return
+        with self._lock:
+            self.early_releases += 1
+        self._forget_request_connection()
+
+    def teardown(self, exception=None):
+        """Return the request's connection to the pool; registered as an app-context teardown"""
+        if g.get("_db_connection") is not None:
+            self._forget_request_connection()
+
+    @contextmanager
+    def connection(self):
+        """Context-managed access to the request's connection"""
+        connection = self.get_connection()
+        try:
+            yield connection
+        finally:
+            self.return_connection(connection)
+
+    def stats(self) -> dict:
+        """Snapshot of pool checkout metrics for this worker"""
+        with self._lock:
+            return {
+                "pool_min": getattr(self.pool, "minconn", None),
+                "pool_max": getattr(self.pool, "maxconn", None),
+                "in_use": self.in_use,
+                "peak_in_use": self.peak_in_use,
+                "checkouts": self.checkouts,
+                "reuses": self.reuses,
+                "checkout_failures": self.checkout_failures,
+                "early_releases": self.early_releases,
+                "rollbacks_on_return": self.rollbacks,
+                "discarded": self.discarded,
+                "avg_wait_ms": round(self.total_wait_ms / self.checkouts, 3) if self.checkouts else 0.0,
+                "max_wait_ms": round(self.max_wait_ms, 3),
+            }
@@ -0,0 +1,235 @@
+"""
+Database Pool Module
+Thread-safe PostgreSQL pool that makes callers wait (up to a limit) for a free connection instead of
+failing immediately, and checks connections on checkout so stale proxy connections are replaced
+"""
+
+import os
+import threading
+import time
+from collections import deque
+import psycopg2
+from psycopg2 import extensions, pool
+
+# TCP keepalives so idle connections through the Railway proxy are not silently dropped
+KEEPALIVE_OPTIONS = {
+    "keepalives": 1,
+    "keepalives_idle": 30,
+    "keepalives_interval": 10,
+    "keepalives_count": 3,
+}
+
+
+class PoolTimeoutError(pool.PoolError):
+    """Raised when no connection became free within the wait timeout"""
+
+
+class _PooledConnection:
+    __slots__ = ("connection", "created_at", "last_used")
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+
+
+class BlockingConnectionPool:
+    """
+    Drop-in replacement for psycopg2's ThreadedConnectionPool (getconn / putconn / closeall).
+    - getconn() waits up to `wait_timeout` seconds when all `maxconn` connections are in use
+    - connections older than `max_age` seconds are recycled
+    - connections idle for more than `validate_after` seconds are pinged with SELECT 1 before reuse
+    - broken connections are replaced transparently
+    """
+
+    def __init__(self, minconn: int, maxconn: int, dsn: str, wait_timeout: float = 5,
+                 max_age: float = 1800, validate_after: float = 30, connect_timeout: int = 10):
+        if maxconn < 1 or minconn > maxconn:
+            raise ValueError("Pool needs 1 <= maxconn and minconn <= maxconn")
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.dsn = dsn
+        self.wait_timeout = wait_timeout
+        self.max_age = max_age
+        self.validate_after = validate_after
+        self.connect_timeout = connect_timeout
+
+        self._idle = deque()
+        self._in_use = {}
+        self._pending = 0
+        self._condition = threading.Condition()
+        self._closed = False
+
+        self.waiting = 0
+        self.checkouts = 0
+        self.waits = 0
+        self.timeouts = 0
+        self.total_wait_ms = 0.0
+        self.max_wait_ms = 0.0
+        self.connects = 0
+        self.recycled = 0
+        self.failed_validations = 0
+
+        for _ in range(minconn):
+            self._idle.append(self._connect())
+
+    def _connect(self) -> _PooledConnection:
+        connection = psycopg2.connect(self.dsn, connect_timeout=self.connect_timeout, **KEEPALIVE_OPTIONS)
+        self.connects += 1
+        return _PooledConnection(connection)
+
+    @property
+    def size(self) -> int:
+        return len(self._idle) + len(self._in_use) + self._pending
+
+    def _is_usable(self, pooled: _PooledConnection) -> bool:
+        """Cheap checks first (closed flag, age); ping only connections that sat idle for a while"""
+        connection = pooled.connection
+        if connection.closed:
+            return False
+
+        now = time.monotonic()
+        if now - pooled.created_at > self.max_age:
+            self.recycled += 1
+            return False
+
+        if now - pooled.last_used > self.validate_after:
+            try:
+                with connection.cursor() as cursor:
+                    cursor.execute("SELECT 1")
+                connection.rollback()
+            except Exception:
+                self.failed_validations += 1
+                return False
+        return True
+
+    @staticmethod
+    def _close_quietly(pooled: _PooledConnection) -> None:
+        try:
+            pooled.connection.close()
+        except Exception:
+            pass
+
+    def getconn(self):
+        """Check out a healthy connection, waiting up to wait_timeout for one to free up"""
+        started = time.monotonic()
+        deadline = started + self.wait_timeout
+        waited = False
+        pooled = None
+
+        with self._condition:
+            while True:
+                if self._closed:
+                    raise pool.PoolError("connection pool is closed")
+                if self._idle:
+                    pooled = self._idle.pop()
+                    break
+                if self.size < self.maxconn:
+                    break
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.timeouts += 1
+                    raise PoolTimeoutError(
+                        f"No database connection became free within {self.wait_timeout}s "
+                        f"({len(self._in_use)} in use, {self.waiting} waiting)"
+                    )
+                waited = True
+                self.waiting += 1
+                try:
+                    self._condition.wait(remaining)
+                finally:
+                    self.waiting -= 1
+
+            # Hold the slot while connecting / validating outside the lock
+            self._pending += 1
+
+        try:
+            if pooled is None:
+                pooled = self._connect()
+            elif not self._is_usable(pooled):
+                # Stale or dropped by the proxy; replace it transparently
+                self._close_quietly(pooled)
+                pooled = self._connect()
+        except Exception:
+            # Give the slot back so waiters can try again
+            with self._condition:
+                self._pending -= 1
+                self._condition.notify()
+            raise
+
+        waited_ms = (time.monotonic() - started) * 1000
+        with self._condition:
+            self._pending -= 1
+            self._in_use[id(pooled.connection)] = pooled
+            self.checkouts += 1
+            if waited:
+                self.waits += 1
+            self.total_wait_ms += waited_ms
+            self.max_wait_ms = max(self.max_wait_ms, waited_ms)
+        return pooled.connection
+
+    def putconn(self, connection, key=None, close: bool = False) -> None:
+        """Return a connection; broken ones (or close=True) are discarded and their slot freed"""
+        with self._condition:
+            pooled = self._in_use.pop(id(connection), None)
+        if pooled is None:
+            raise pool.PoolError("trying to put an unkeyed connection")
+
+        if not close and not connection.closed:
+            try:
+                status = connection.info.transaction_status
+                if status == extensions.TRANSACTION_STATUS_UNKNOWN:
+                    close = True
+                elif status != extensions.TRANSACTION_STATUS_IDLE:
+                    connection.rollback()
+            except Exception:
+                close = True
+
+        with self._condition:
+            if close or connection.closed or self._closed:
+                self._close_quietly(pooled)
+            else:
+                pooled.last_used = time.monotonic()
+                self._idle.append(pooled)
+            self._condition.notify()
+
+    def closeall(self) -> None:
+        with self._condition:
+            self._closed = True
+            for pooled in list(self._idle) + list(self._in_use.values()):
+                self._close_quietly(pooled)
+            self._idle.clear()
+            self._in_use.clear()
+            self._condition.notify_all()
+
+    def stats(self) -> dict:
+        """Snapshot of pool size, usage and wait metrics for this worker"""
+        with self._condition:
+            return {
+                "min": self.minconn,
+                "max": self.maxconn,
+                "size": self.size,
+                "idle": len(self._idle),
+                "in_use": len(self._in_use),
+                "waiting": self.waiting,
+                "checkouts": self.checkouts,
+                "waits": self.waits,
+                "timeouts": self.timeouts,
+                "avg_wait_ms": round(self.total_wait_ms / self.checkouts, 3) if self.checkouts else 0.0,
+                "max_wait_ms": round(self.max_wait_ms, 3),
+                "connects": self.connects,
+                "recycled": self.recycled,
+                "failed_validations": self.failed_validations,
+            }
+
+
+def pool_size_from_env() -> int:
+    """
+    Connections per worker process: one per gunicorn thread (each request holds at most one
+    connection) plus headroom for background work. DB_POOL_MAX overrides the calculation.
+    """
+    if os.getenv("DB_POOL_MAX"):
+        return int(os.getenv("DB_POOL_MAX"))
+    threads = int(os.getenv("GUNICORN_THREADS", 4))
+    return max(threads + 2, 4)
@@ -0,0 +1,154 @@
+"""
+Document Queries Module
+Builds the keyset-paginated, filtered query behind the admin document requests table,
+so each page costs one index range scan no matter how many submissions have accumulated
+"""
+
+import base64
+import json
+import re
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+DEFAULT_PAGE_SIZE = 25
+MAX_PAGE_SIZE = 100
+
+DOCUMENT_STATUSES = ["Pending", "Approved", "Rejected", "Claimed"]
+
+# "REF-123", "ref123" or a bare "123" searches by reference number
+REFERENCE_SEARCH = re.compile(r"^\s*(?:ref-?)?(\d+)\s*$", re.IGNORECASE)
+
+PAGE_COLUMNS = """
+    ds.id,
+    CASE
+        WHEN ds.document_types IS NOT NULL THEN array_to_string(ds.document_types, ', ')
+        ELSE 'Unknown'
+    END as document_type,
+    to_char(ds.request_date, 'YYYY-MM-DD') as request_date,
+    ds.name,
+    ds.purok,
+    ds.purpose,
+    ds.copyc,
+    ds.copyi,
+    ds.copyr,
+    to_char(ds.submission_date, 'YYYY-MM-DD HH24:MI:SS') as submission_date,
+    ds.status,
+    to_char(ds.pickup_date, 'YYYY-MM-DD') as pickup_date,
+    ds.notes,
+    au.name as user_name,
+    au.email as user_email,
+    ds.submission_date as cursor_date
+"""
+
+
+class InvalidPageRequest(ValueError):
+    """Raised for malformed cursors or filter values; routes answer these with 400"""
+
+
+def encode_cursor(submission_date: datetime, document_id: int) -> str:
+    """Opaque cursor pointing just past the given row"""
+    payload = json.dumps([submission_date.isoformat(), document_id])
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        submission_date, document_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return datetime.fromisoformat(submission_date), int(document_id)
+    except (ValueError, TypeError) as e:
+        raise InvalidPageRequest("Invalid cursor") from e
+
+
+def _parse_date(value: Optional[str], name: str) -> Optional[date]:
+    if not value:
+        return None
+    try:
+        return date.fromisoformat(value)
+    except ValueError as e:
+        raise InvalidPageRequest(f"{name} must be YYYY-MM-DD") from e
+
+
+def _escape_like(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def build_document_page_query(args: Dict[str, Any]) -> Tuple[str, List[Any], int]:
+    """
+    Build (sql, params, limit) for one page from request arguments:
+    limit, cursor, status, type, purok, date_from, date_to (submission date, inclusive) and q (name or REF number).
+    The query fetches limit + 1 rows so the caller can tell whether another page follows.
+    """
+    try:
+        limit = min(max(int(args.get("limit") or DEFAULT_PAGE_SIZE), 1), MAX_PAGE_SIZE)
+    except ValueError as e:
+        raise InvalidPageRequest("limit must be a number") from e
+
+    conditions = []
+    params: List[Any] = []
+
+    status = args.get("status")
+    if status and status != "all":
+        if status not in DOCUMENT_STATUSES:
+            raise InvalidPageRequest(f"Unknown status: {status}")
+        conditions.append("ds.status = %s")
+        params.append(status)
+
+    document_type = args.get("type")
+    if document_type and document_type != "all":
+        # Containment rather than = ANY() so the GIN index on document_types applies
+        conditions.append("ds.document_types @> ARRAY[%s]::text[]")
+        params.append(document_type)
+
+    purok = args.get("purok")
+    if purok and purok != "all":
+        conditions.append("ds.purok = %s")
+        params.append(purok)
+
+    date_from = _parse_date(args.get("date_from"), "date_from")
+    if date_from:
+        conditions.append("ds.submission_date >= %s")
+        params.append(date_from)
+    date_to = _parse_date(args.get("date_to"), "date_to")
+    if date_to:
+        conditions.append("ds.submission_date < %s::date + 1")
+        params.append(date_to)
+
+    search = (args.get("q") or "").strip()
+    if search:
+        reference = REFERENCE_SEARCH.match(search)
+        if reference:
+            conditions.append("ds.id = %s")
+            params.append(int(reference.group(1)))
+        else:
+            conditions.append("ds.name ILIKE %s")
+            params.append(f"%{_escape_like(search)}%")
+
+    cursor = args.get("cursor")
+    if cursor:
+        submission_date, document_id = decode_cursor(cursor)
+        conditions.append("(ds.submission_date, ds.id) < (%s, %s)")
+        params.extend([submission_date, document_id])
+
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    sql = f"""
+    SELECT {PAGE_COLUMNS}
+    FROM document_submissions ds
+    LEFT JOIN app_users au ON ds.user_id = au.id
+    {where}
+    ORDER BY ds.submission_date DESC, ds.id DESC
+    LIMIT %s
+    """
+    params.append(limit + 1)
+    return sql, params, limit
+
+
+def page_from_rows(rows: List[Dict[str, Any]], limit: int) -> Dict[str, Any]:
+    """Trim the look-ahead row and compute the next cursor"""
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    next_cursor = None
+    if has_more and rows:
+        next_cursor = encode_cursor(rows[-1]["cursor_date"], rows[-1]["id"])
+    for row in rows:
+        row.pop("cursor_date", None)
+    return {"document_requests": rows, "next_cursor": next_cursor, "has_more": has_more}
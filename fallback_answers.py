@@ -0,0 +1,45 @@
+"""
+Fallback Answers Module
+Builds fast answers from local barangay knowledge when the LLM is unavailable
+"""
+
+from barangay_data import BARANGAY_OFFICIALS_INFO, AVAILABLE_DOCUMENTS, is_about_officials, is_about_population, detect_document_type
+from barangay_history import get_relevant_info
+from local_answers import answer_locally
+
+UNAVAILABLE_NOTICE = "Our AI assistant is busy right now, so here is what I can tell you from the barangay records:"
+
+
+def _as_html(text):
+    """Render a plain-text knowledge block as simple HTML paragraphs"""
+    return "<p>" + text.strip().replace("\n\n", "</p><p>").replace("\n", "<br>") + "</p>"
+
+
+def fallback_answer(prompt):
+    """Answer a prompt from barangay_data.py and barangay_history.py without calling the LLM"""
+    relevant_info = get_relevant_info(prompt)
+    if relevant_info:
+        sections = "".join(f"<h4>{title}</h4>{_as_html(info)}" for title, info in relevant_info)
+        return f"<p>{UNAVAILABLE_NOTICE}</p>{sections}"
+
+    if is_about_officials(prompt) or is_about_population(prompt):
+        local_answer = answer_locally(prompt)
+        if local_answer:
+            return local_answer
+        return f"<p>{UNAVAILABLE_NOTICE}</p>{_as_html(BARANGAY_OFFICIALS_INFO)}"
+
+    document_type = detect_document_type(prompt)
+    if document_type:
+        return (
+            f"<p>I can help you request a <strong>{document_type.title()}</strong>. "
+            "Just tell me you want to request it and I will show you the request form.</p>"
+            "<p>To check an existing request, send me your reference number (e.g., REF-123).</p>"
+        )
+
+    documents = "".join(f"<li>{doc.title()}</li>" for doc in AVAILABLE_DOCUMENTS)
+    return (
+        "<p>I'm sorry, our AI assistant is taking longer than usual to respond. Please try again in a moment.</p>"
+        "<p>In the meantime, I can still help you with:</p>"
+        f"<ul>{documents}<li>Checking a document request status with your reference number (e.g., REF-123)</li>"
+        "<li>Barangay history, officials, population, schools and notable places</li></ul>"
+    )
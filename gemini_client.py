@@ -0,0 +1,241 @@
+"""
+Gemini Client Module
+Wraps the Gemini model with per-call deadlines and a circuit breaker so a slow or failing
+API cannot pin every gunicorn worker
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Iterator, Optional
+
+
+class LLMUnavailableError(Exception):
+    """Raised when the LLM cannot produce an answer right now"""
+
+
+class CircuitOpenError(LLMUnavailableError):
+    """Raised without calling the API while the circuit breaker is open"""
+
+
+class LLMTimeoutError(LLMUnavailableError):
+    """Raised when a call exceeds its deadline"""
+
+
+class CircuitBreaker:
+    """
+    Classic closed / open / half-open breaker.
+    Opens after `failure_threshold` consecutive failures and lets a single trial call
+    through once `reset_timeout` seconds have passed.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.trip_count = 0
+        self.opened_at = None
+        self.total_successes = 0
+        self.total_failures = 0
+        self.total_timeouts = 0
+        self.rejected_calls = 0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow_request(self) -> bool:
+        """Check whether a call may go to the API"""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+
+            if self.state == self.HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+
+            self.rejected_calls += 1
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.total_successes += 1
+            self.consecutive_failures = 0
+            self.state = self.CLOSED
+            self._trial_in_flight = False
+
+    def record_failure(self, timed_out: bool = False) -> None:
+        with self._lock:
+            self.total_failures += 1
+            if timed_out:
+                self.total_timeouts += 1
+            self.consecutive_failures += 1
+            self._trial_in_flight = False
+
+            if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    self.trip_count += 1
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+    def abandon(self) -> None:
+        """Release a half-open trial whose caller went away without an outcome"""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def stats(self) -> dict:
+        """Snapshot of breaker state and counters for monitoring"""
+        with self._lock:
+            return {
+                "state": self.state,
+                "consecutive_failures": self.consecutive_failures,
+                "failure_threshold": self.failure_threshold,
+                "reset_timeout": self.reset_timeout,
+                "trip_count": self.trip_count,
+                "seconds_since_trip": round(time.monotonic() - self.opened_at, 1) if self.opened_at else None,
+                "total_successes": self.total_successes,
+                "total_failures": self.total_failures,
+                "total_timeouts": self.total_timeouts,
+                "rejected_calls": self.rejected_calls,
+            }
+
+
+class GeminiClient:
+    """
+    Deadline- and breaker-aware wrapper around a genai.GenerativeModel.
+    Calls run on a fixed pool of `max_workers` threads. A call that times out cannot be interrupted,
+    so it keeps its thread until the API returns; such abandoned calls are counted, and once every
+    thread is taken new calls are refused instead of queueing behind them.
+    """
+
+    def __init__(self, model, timeout: float = 20, breaker: Optional[CircuitBreaker] = None, max_workers: int = 8):
+        self.model = model
+        self.timeout = timeout
+        self.breaker = breaker or CircuitBreaker()
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="gemini")
+        self._slots = threading.BoundedSemaphore(max_workers)
+        self._lock = threading.Lock()
+        self.abandoned_calls = 0
+        self.running_abandoned = 0
+        self.rejected_busy = 0
+
+    def _submit(self, fn):
+        """Run fn on a free pool thread, or raise without calling the API if none is free"""
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected_busy += 1
+            self.breaker.abandon()
+            raise LLMUnavailableError("Every Gemini call thread is busy")
+        try:
+            future = self._executor.submit(fn)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def _abandon(self, future) -> None:
+        """Count a call given up on while its thread is still waiting for the API"""
+        with self._lock:
+            self.abandoned_calls += 1
+            self.running_abandoned += 1
+
+        def finished(_):
+            with self._lock:
+                self.running_abandoned -= 1
+
+        future.add_done_callback(finished)
+
+    def generate_text(self, prompt: str, timeout: Optional[float] = None) -> str:
+        """Generate a full answer, raising LLMUnavailableError on an open breaker, timeout or API error"""
+        if not self.breaker.allow_request():
+            raise CircuitOpenError("Gemini circuit breaker is open")
+
+        future = self._submit(lambda: self.model.generate_content(prompt).text)
+        try:
+            text = future.result(timeout=timeout or self.timeout)
+        except FutureTimeoutError:
+            self._abandon(future)
+            self.breaker.record_failure(timed_out=True)
+            raise LLMTimeoutError(f"Gemini call exceeded {timeout or self.timeout}s")
+        except Exception as e:
+            self.breaker.record_failure()
+            raise LLMUnavailableError(f"Gemini call failed: {e}") from e
+
+        self.breaker.record_success()
+        return text
+
+    def stream_text(self, prompt: str, timeout: Optional[float] = None) -> Iterator[str]:
+        """
+        Yield answer chunks as Gemini produces them.
+        The deadline applies to the first chunk and to each gap between chunks, not to the whole stream,
+        so a long answer that keeps arriving is never cut off; chunks without text are skipped.
+        """
+        if not self.breaker.allow_request():
+            raise CircuitOpenError("Gemini circuit breaker is open")
+
+        idle_timeout = timeout or self.timeout
+        chunks = queue.Queue()
+        stop = threading.Event()
+        done = object()
+
+        def produce():
+            try:
+                for chunk in self.model.generate_content(prompt, stream=True):
+                    if stop.is_set():
+                        # Nobody is reading any more; stop pulling chunks from the API
+                        return
+                    try:
+                        text = chunk.text
+                    except ValueError:
+                        # Chunks without text parts (e.g. safety metadata) carry nothing to show
+                        continue
+                    if text:
+                        chunks.put(text)
+                chunks.put(done)
+            except Exception as e:
+                chunks.put(e)
+
+        future = self._submit(produce)
+
+        while True:
+            try:
+                item = chunks.get(timeout=idle_timeout)
+            except queue.Empty:
+                stop.set()
+                self._abandon(future)
+                self.breaker.record_failure(timed_out=True)
+                raise LLMTimeoutError(f"Gemini stream sent nothing for {idle_timeout}s")
+
+            if item is done:
+                self.breaker.record_success()
+                return
+            if isinstance(item, Exception):
+                self.breaker.record_failure()
+                raise LLMUnavailableError(f"Gemini stream failed: {item}") from item
+
+            try:
+                yield item
+            except GeneratorExit:
+                # The client disconnected mid-stream
+                stop.set()
+                self.breaker.abandon()
+                raise
+
+    def stats(self) -> dict:
+        """Thread-pool usage, including calls abandoned after their deadline that still hold a thread"""
+        with self._lock:
+            return {
+                "max_workers": self.max_workers,
+                "abandoned_calls": self.abandoned_calls,
+                "running_abandoned": self.running_abandoned,
+                "rejected_busy": self.rejected_busy,
+            }
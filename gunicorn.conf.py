@@ -0,0 +1,41 @@
+"""
+Gunicorn Configuration
+Threaded workers; each worker process owns one database pool sized from GUNICORN_THREADS (see db_pool.py),
+so keep WEB_CONCURRENCY * DB_POOL_MAX below the database's connection limit.
+
+Schema migrations: Heroku applies them from the Procfile's release line. Render and Railway ignore that line;
+use "flask --app App migrate" as their pre-deploy command, or set MIGRATE_ON_START=true so the gunicorn master
+applies them once before any worker starts (concurrent instances take turns on an advisory lock).
+"""
+
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', 8000)}"
+workers = int(os.getenv("WEB_CONCURRENCY", 2))
+worker_class = "gthread"
+threads = int(os.getenv("GUNICORN_THREADS", 4))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", 120))
+
+
+def on_starting(server):
+    if os.getenv("MIGRATE_ON_START", "false").lower() != "true":
+        return
+    # A plain connection in the master: App (and its pools) must not be imported before the workers fork
+    import psycopg2
+    from schema_migrations import migrate
+
+    database_url = os.getenv("DATABASE_URL")
+    if not database_url:
+        raise RuntimeError("MIGRATE_ON_START is set but DATABASE_URL is not")
+    connection = psycopg2.connect(database_url)
+    try:
+        for migration in migrate(connection):
+            server.log.info(f"Applied migration {migration.version:04d}_{migration.name}")
+    finally:
+        connection.close()
+
+
+def post_worker_init(worker):
+    # Startup queries and background jobs belong to the web workers only, not to flask CLI commands that import App
+    from App import init_web_worker
+    init_web_worker()
@@ -0,0 +1,134 @@
+"""
+Intent Matcher Module
+Compiles every routing keyword list into one Aho-Corasick automaton so a prompt is scanned once,
+no matter how many keywords or intents there are
+"""
+
+from collections import deque
+from functools import lru_cache
+from typing import Dict, Iterable, List, Tuple
+
+from barangay_data import OFFICIAL_TERMS, OFFICIAL_NAMES, POPULATION_TERMS, DOCUMENT_TYPE_TERMS
+from barangay_history import (
+    FIESTA_TERMS, HISTORY_TERMS, GEOGRAPHY_TERMS, DEMOGRAPHICS_2020_TERMS,
+    FACILITY_TERMS, ECONOMY_TERMS, POLITICAL_TERMS, SCHOOL_TERMS,
+)
+from notable_places import NOTABLE_PLACES, PLACE_KEYWORDS, VIEW_KEYWORDS, PLACE_RELATED_WORDS, ALL_PLACES_KEYWORDS
+
+# Words that mark a document status lookup ("REF-123", "my reference number")
+REFERENCE_TERMS = ["ref-", "reference"]
+
+
+class KeywordAutomaton:
+    """Aho-Corasick automaton mapping each keyword to the intents it signals"""
+
+    def __init__(self, keywords_by_intent: Dict[str, Iterable[str]]):
+        # Trie as parallel lists: goto transitions, failure links and outputs per state
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[Tuple[str, str]]] = [[]]
+
+        for intent, keywords in keywords_by_intent.items():
+            for keyword in keywords:
+                self._add(keyword, intent)
+        self._build_failure_links()
+
+    def _add(self, keyword: str, intent: str) -> None:
+        state = 0
+        for char in keyword:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            state = next_state
+        if (intent, keyword) not in self._output[state]:
+            self._output[state].append((intent, keyword))
+
+    def _build_failure_links(self) -> None:
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[next_state] = self._goto[fallback].get(char, 0)
+                # Inherit matches that end at the failure state (keywords that are suffixes of this one)
+                self._output[next_state] = self._output[next_state] + self._output[self._fail[next_state]]
+
+    def scan(self, text: str) -> List[Tuple[int, str, str]]:
+        """Return (start, intent, keyword) for every keyword occurrence in text"""
+        matches = []
+        state = 0
+        for index, char in enumerate(text):
+            while state and char not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(char, 0)
+            for intent, keyword in self._output[state]:
+                matches.append((index - len(keyword) + 1, intent, keyword))
+        return matches
+
+
+class IntentMatches:
+    """Intents found in one prompt, with the keyword positions that triggered them"""
+
+    def __init__(self, matches: List[Tuple[int, str, str]]):
+        self.positions: Dict[str, List[Tuple[int, str]]] = {}
+        for start, intent, keyword in sorted(matches):
+            self.positions.setdefault(intent, []).append((start, keyword))
+
+    def has(self, intent: str) -> bool:
+        return intent in self.positions
+
+    def keywords(self, intent: str) -> List[str]:
+        return [keyword for _, keyword in self.positions.get(intent, [])]
+
+    def __contains__(self, intent: str) -> bool:
+        return self.has(intent)
+
+    def __repr__(self) -> str:
+        return f"IntentMatches({self.positions})"
+
+
+def build_intent_keywords() -> Dict[str, List[str]]:
+    """Collect every keyword list used for routing, keyed by intent name"""
+    intents = {
+        "fiesta": FIESTA_TERMS,
+        "history": HISTORY_TERMS,
+        "geography": GEOGRAPHY_TERMS,
+        "demographics_2020": DEMOGRAPHICS_2020_TERMS,
+        "facilities": FACILITY_TERMS,
+        "economy": ECONOMY_TERMS,
+        "politics": POLITICAL_TERMS,
+        "schools": SCHOOL_TERMS,
+        "officials": OFFICIAL_TERMS + OFFICIAL_NAMES,
+        "population": POPULATION_TERMS,
+        "place_view": VIEW_KEYWORDS,
+        "place_related": PLACE_RELATED_WORDS,
+        "all_places": ALL_PLACES_KEYWORDS,
+        "reference": REFERENCE_TERMS,
+    }
+    for document_type, terms in DOCUMENT_TYPE_TERMS.items():
+        intents[f"document:{document_type}"] = terms
+    for place in NOTABLE_PLACES:
+        intents[f"place:{place}"] = [place]
+    for place, keywords in PLACE_KEYWORDS.items():
+        intents[f"place_keyword:{place}"] = keywords
+    return intents
+
+
+# Built once at import
+INTENT_MATCHER = KeywordAutomaton(build_intent_keywords())
+
+
+@lru_cache(maxsize=256)
+def match_intents(text: str) -> IntentMatches:
+    """
+    Scan a prompt once and return every matched intent.
+    Cached so the routing helpers that each ask about the same prompt share one scan.
+    """
+    return IntentMatches(INTENT_MATCHER.scan(text.lower()))
@@ -0,0 +1,147 @@
+"""
+Intent Router Module
+Classifies a chat prompt once into a typed Intent and dispatches it to handlers registered
+with an explicit precedence, timing every stage so routing latency can be attributed
+"""
+
+import logging
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+from intent_matcher import IntentMatches, match_intents
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Intent:
+    """Everything the handlers need to know about a prompt, computed once per request"""
+    prompt: str
+    normalized: str
+    words: List[str]
+    matches: IntentMatches
+    scores: Dict[str, float]
+    flags: Dict[str, Any] = field(default_factory=dict)
+    timings: Dict[str, float] = field(default_factory=dict)
+    handled_by: Optional[str] = None
+
+    def has(self, *names: str) -> bool:
+        """True when any of the named keyword intents matched"""
+        return any(self.matches.has(name) for name in names)
+
+    def score(self, name: str) -> float:
+        return self.scores.get(name, 0.0)
+
+    @property
+    def top(self) -> Optional[str]:
+        """Keyword intent with the highest score, if any matched"""
+        return max(self.scores, key=self.scores.get) if self.scores else None
+
+
+@dataclass
+class Handler:
+    name: str
+    precedence: int
+    func: Callable
+    when: Optional[Callable[[Intent], bool]] = None
+
+
+def score_matches(normalized: str, matches: IntentMatches) -> Dict[str, float]:
+    """Score each matched intent by the share of the prompt its keywords cover (0-1)"""
+    if not normalized:
+        return {}
+    scores = {}
+    for name, positions in matches.positions.items():
+        covered = set()
+        for start, keyword in positions:
+            covered.update(range(start, start + len(keyword)))
+        scores[name] = round(len(covered) / len(normalized), 3)
+    return scores
+
+
+class IntentRouter:
+    """
+    Ordered handler registry.
+    Handlers run from the lowest precedence number up; the first one that returns
+    something other than None answers the request.
+    """
+
+    def __init__(self):
+        self._handlers: List[Handler] = []
+        self._stats: Dict[str, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def handler(self, name: str, precedence: int, when: Optional[Callable[[Intent], bool]] = None):
+        """Decorator registering a handler; `when` is a cheap predicate checked before calling it"""
+        def register(func):
+            for existing in self._handlers:
+                if existing.precedence == precedence:
+                    raise ValueError(f"Handler {name!r} has the same precedence as {existing.name!r}")
+            self._handlers.append(Handler(name, precedence, func, when))
+            self._handlers.sort(key=lambda handler: handler.precedence)
+            return func
+        return register
+
+    def classify(self, prompt: str, flags: Optional[Dict[str, Any]] = None) -> Intent:
+        """Normalize and scan the prompt once"""
+        normalized = prompt.lower().strip()
+        matches = match_intents(prompt)
+        return Intent(
+            prompt=prompt,
+            normalized=normalized,
+            words=normalized.split(),
+            matches=matches,
+            scores=score_matches(prompt.lower(), matches),
+            flags=dict(flags or {}),
+        )
+
+    def _record(self, intent: Intent, stage: str, started: float) -> None:
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        intent.timings[stage] = intent.timings.get(stage, 0.0) + elapsed_ms
+        with self._lock:
+            stats = self._stats.setdefault(stage, {"calls": 0, "total_ms": 0.0, "max_ms": 0.0})
+            stats["calls"] += 1
+            stats["total_ms"] += elapsed_ms
+            stats["max_ms"] = max(stats["max_ms"], elapsed_ms)
+
+    def route(self, prompt: str, flags: Optional[Dict[str, Any]] = None, *args, **kwargs):
+        """Classify the prompt and return the first handler result; extra arguments are passed to handlers"""
+        started = time.perf_counter()
+        intent = self.classify(prompt, flags)
+        self._record(intent, "classify", started)
+
+        for handler in self._handlers:
+            started = time.perf_counter()
+            try:
+                if handler.when is not None and not handler.when(intent):
+                    continue
+                result = handler.func(intent, *args, **kwargs)
+            finally:
+                self._record(intent, handler.name, started)
+            if result is not None:
+                intent.handled_by = handler.name
+                break
+        else:
+            result = None
+
+        logger.debug(f"Routed prompt to {intent.handled_by}: " +
+                     ", ".join(f"{stage}={ms:.2f}ms" for stage, ms in intent.timings.items()))
+        return result
+
+    def handlers(self) -> List[str]:
+        return [handler.name for handler in self._handlers]
+
+    def stats(self) -> Dict[str, Any]:
+        """Per-stage call counts and latency for monitoring"""
+        with self._lock:
+            stages = {
+                stage: {
+                    "calls": int(stats["calls"]),
+                    "avg_ms": round(stats["total_ms"] / stats["calls"], 3) if stats["calls"] else 0.0,
+                    "max_ms": round(stats["max_ms"], 3),
+                }
+                for stage, stats in self._stats.items()
+            }
+        return {"handlers": self.handlers(), "stages": stages}
@@ -0,0 +1,173 @@
+"""
+Knowledge Index Module
+Chunks the barangay knowledge texts into passages at startup and ranks them with BM25,
+so LLM prompts carry only the passages relevant to the question
+"""
+
+import heapq
+import math
+import re
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+from barangay_data import BARANGAY_OFFICIALS_INFO
+from barangay_history import (
+    FIESTA_INFO, BARANGAY_HISTORY_INFO, GEOGRAPHIC_INFO, DEMOGRAPHIC_INFO_2020,
+    FACILITIES_INFO, ECONOMIC_INFO, POLITICAL_INFO, SCHOOLS_INFO,
+)
+
+# Passages are built from whole paragraphs up to about this many characters
+MAX_PASSAGE_CHARS = 600
+
+# Common English and Tagalog words that carry no meaning for retrieval
+STOPWORDS = {
+    "a", "an", "the", "and", "or", "of", "to", "in", "on", "at", "for", "by", "with", "from", "as",
+    "is", "are", "was", "were", "be", "been", "it", "its", "this", "that", "these", "those",
+    "what", "who", "whom", "which", "when", "where", "why", "how", "do", "does", "did", "can",
+    "could", "would", "should", "will", "i", "me", "my", "you", "your", "we", "our", "they", "their",
+    "there", "here", "about", "please", "tell", "know", "any", "some", "have", "has", "had",
+    "ang", "ng", "mga", "sa", "na", "ay", "ano", "sino", "saan", "paano", "po", "ba", "ko", "mo",
+    "barangay", "amungan",
+}
+
+
+def stem(token: str) -> str:
+    """Very light suffix stripping so that banks/bank and religion/religious share a term"""
+    if len(token) <= 3 or token.isdigit():
+        return token
+    if token.endswith("ies"):
+        token = token[:-3] + "y"
+    elif token.endswith("s") and not token.endswith(("ss", "us")):
+        token = token[:-1]
+    for suffix in ("ious", "ous", "ion", "ing"):
+        if token.endswith(suffix) and len(token) - len(suffix) >= 4:
+            return token[:-len(suffix)]
+    return token
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase, stemmed word tokens without stopwords; thousands separators are dropped so 11,332 matches 11332"""
+    text = re.sub(r"(?<=\d),(?=\d)", "", text.lower())
+    return [stem(token) for token in re.findall(r"[a-z0-9ñ]+", text) if token not in STOPWORDS]
+
+
+class Passage:
+    """A chunk of one knowledge section"""
+
+    def __init__(self, source: str, title: str, text: str):
+        self.source = source
+        self.title = title
+        self.text = text
+
+    def __repr__(self) -> str:
+        return f"Passage({self.source!r}, {self.title!r}, {len(self.text)} chars)"
+
+
+def chunk_text(source: str, text: str, max_chars: int = MAX_PASSAGE_CHARS) -> List[Passage]:
+    """
+    Split a knowledge text into passages of whole paragraphs.
+    The section heading (first line) is kept as the passage title and prefixed to each passage
+    so that passages stay understandable on their own.
+    """
+    paragraphs = [paragraph.strip() for paragraph in re.split(r"\n\s*\n", text.strip()) if paragraph.strip()]
+    if not paragraphs:
+        return []
+
+    title = paragraphs[0].splitlines()[0].strip().rstrip(":")
+    passages = []
+    current = []
+    current_length = 0
+    for paragraph in paragraphs:
+        if current and current_length + len(paragraph) > max_chars:
+            passages.append(Passage(source, title, "\n\n".join(current)))
+            current, current_length = [], 0
+        current.append(paragraph)
+        current_length += len(paragraph)
+    if current:
+        passages.append(Passage(source, title, "\n\n".join(current)))
+
+    # Every passage but the first starts mid-section; give it the heading for context
+    for passage in passages[1:]:
+        passage.text = f"{title} (continued):\n{passage.text}"
+    return passages
+
+
+class BM25Index:
+    """Okapi BM25 over a fixed list of passages, with an inverted index for sparse scoring"""
+
+    def __init__(self, passages: List[Passage], k1: float = 1.5, b: float = 0.75):
+        self.passages = passages
+        self.k1 = k1
+        self.b = b
+        self._postings: Dict[str, List[Tuple[int, int]]] = {}
+        self._lengths: List[int] = []
+
+        for doc_id, passage in enumerate(passages):
+            tokens = tokenize(f"{passage.title} {passage.text}")
+            self._lengths.append(len(tokens))
+            for term, count in Counter(tokens).items():
+                self._postings.setdefault(term, []).append((doc_id, count))
+
+        self._average_length = sum(self._lengths) / len(self._lengths) if self._lengths else 0.0
+        total = len(passages)
+        self._idf = {
+            term: math.log(1 + (total - len(postings) + 0.5) / (len(postings) + 0.5))
+            for term, postings in self._postings.items()
+        }
+
+    def search(self, query: str, k: int = 4, min_score: float = 0.0) -> List[Tuple[Passage, float]]:
+        """Return up to k (passage, score) pairs, best first"""
+        scores: Dict[int, float] = {}
+        for term in set(tokenize(query)):
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            idf = self._idf[term]
+            for doc_id, tf in postings:
+                norm = self.k1 * (1 - self.b + self.b * self._lengths[doc_id] / self._average_length)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+
+        best = heapq.nlargest(k, ((score, doc_id) for doc_id, score in scores.items() if score > min_score))
+        return [(self.passages[doc_id], round(score, 3)) for score, doc_id in best]
+
+    def stats(self) -> dict:
+        return {
+            "passages": len(self.passages),
+            "terms": len(self._postings),
+            "average_passage_tokens": round(self._average_length, 1),
+        }
+
+
+# Knowledge texts indexed at startup; add new barangay documents here
+KNOWLEDGE_SOURCES = {
+    "officials_population": BARANGAY_OFFICIALS_INFO,
+    "fiesta": FIESTA_INFO,
+    "history": BARANGAY_HISTORY_INFO,
+    "geography": GEOGRAPHIC_INFO,
+    "demographics_2020": DEMOGRAPHIC_INFO_2020,
+    "facilities": FACILITIES_INFO,
+    "economy": ECONOMIC_INFO,
+    "politics": POLITICAL_INFO,
+    "schools": SCHOOLS_INFO,
+}
+
+
+def build_knowledge_index(sources: Optional[Dict[str, str]] = None) -> BM25Index:
+    passages = []
+    for source, text in (sources or KNOWLEDGE_SOURCES).items():
+        passages.extend(chunk_text(source, text))
+    return BM25Index(passages)
+
+
+# Built once at import
+KNOWLEDGE_INDEX = build_knowledge_index()
+
+
+def retrieve_passages(query: str, k: int = 4) -> List[Passage]:
+    """Top-k passages for a question, best first"""
+    return [passage for passage, _ in KNOWLEDGE_INDEX.search(query, k)]
+
+
+def format_passages(passages: List[Passage]) -> str:
+    """Join passages into a prompt section"""
+    return "\n\n---\n\n".join(passage.text for passage in passages)
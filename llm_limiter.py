@@ -0,0 +1,238 @@
+"""
+LLM Limiter Module
+Caps how many Gemini calls run at once, queues a few more for a short time, sheds the rest,
+and paces calls against the requests-per-minute and tokens-per-minute quota shared by all workers
+"""
+
+import json
+import math
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows development machines: limits apply per process only
+    fcntl = None
+
+# Rough output budget reserved per call on top of the prompt tokens
+OUTPUT_TOKEN_RESERVATION = 512
+
+
+def estimate_tokens(prompt: str) -> int:
+    """Cheap token estimate (~4 characters per token) plus the expected answer size"""
+    return len(prompt) // 4 + OUTPUT_TOKEN_RESERVATION
+
+
+class LLMOverloadedError(Exception):
+    """Raised when a call is shed instead of queued; carries a retry hint in seconds"""
+
+    def __init__(self, message: str, retry_after: int = 1):
+        super().__init__(message)
+        self.retry_after = max(1, int(retry_after))
+
+
+class ConcurrencyLimiter:
+    """
+    Bounded executor admission: at most `max_in_flight` calls run at once (host-wide when
+    file locks are available), at most `max_queue` callers per process wait for a slot,
+    and nobody waits longer than `queue_timeout` seconds.
+    """
+
+    def __init__(self, max_in_flight: int = 4, max_queue: int = 8, queue_timeout: float = 2,
+                 directory: Optional[str] = None):
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.directory = directory if fcntl is not None else None
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._local_in_flight = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.max_wait_seconds = 0.0
+
+    def _try_acquire(self):
+        """Grab a free slot without blocking; returns a release token or None"""
+        if self.directory is None:
+            with self._lock:
+                if self._local_in_flight < self.max_in_flight:
+                    self._local_in_flight += 1
+                    return True
+            return None
+
+        for index in range(self.max_in_flight):
+            slot_file = open(os.path.join(self.directory, f"slot-{index}.lock"), "a+")
+            try:
+                fcntl.flock(slot_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                slot_file.close()
+                continue
+            with self._lock:
+                self._local_in_flight += 1
+            return slot_file
+        return None
+
+    def _release(self, token) -> None:
+        if token is not True:
+            fcntl.flock(token.fileno(), fcntl.LOCK_UN)
+            token.close()
+        with self._lock:
+            self._local_in_flight -= 1
+
+    def acquire(self):
+        """Wait briefly for a slot, raising LLMOverloadedError when the queue is full or the wait times out"""
+        token = self._try_acquire()
+        if token is None:
+            with self._lock:
+                if self.waiting >= self.max_queue:
+                    self.rejected += 1
+                    raise LLMOverloadedError("LLM wait queue is full", retry_after=self.queue_timeout)
+                self.waiting += 1
+
+            started = time.monotonic()
+            try:
+                while token is None:
+                    if time.monotonic() - started >= self.queue_timeout:
+                        with self._lock:
+                            self.rejected += 1
+                        raise LLMOverloadedError("Timed out waiting for an LLM slot", retry_after=self.queue_timeout)
+                    time.sleep(0.02)
+                    token = self._try_acquire()
+            finally:
+                waited = time.monotonic() - started
+                with self._lock:
+                    self.waiting -= 1
+                    self.max_wait_seconds = max(self.max_wait_seconds, waited)
+
+        with self._lock:
+            self.admitted += 1
+        return token
+
+    def release(self, token) -> None:
+        self._release(token)
+
+    @contextmanager
+    def slot(self):
+        """Hold an LLM slot for the duration of the block"""
+        token = self.acquire()
+        try:
+            yield
+        finally:
+            self.release(token)
+
+    def stats(self) -> dict:
+        """Snapshot of limiter counters for monitoring"""
+        with self._lock:
+            return {
+                "max_in_flight": self.max_in_flight,
+                "max_queue": self.max_queue,
+                "queue_timeout": self.queue_timeout,
+                "host_wide": self.directory is not None,
+                "in_flight": self._local_in_flight,
+                "waiting": self.waiting,
+                "admitted": self.admitted,
+                "rejected": self.rejected,
+                "max_wait_seconds": round(self.max_wait_seconds, 3),
+            }
+
+
+class TokenBucketPacer:
+    """
+    Two token buckets (requests/minute and tokens/minute) refilled continuously.
+    With file locks available the bucket state lives in one file shared by every worker.
+    """
+
+    def __init__(self, requests_per_minute: int, tokens_per_minute: int, max_wait: float = 3,
+                 state_path: Optional[str] = None):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.max_wait = max_wait
+        self.state_path = state_path if fcntl is not None else None
+        self._lock = threading.Lock()
+        self._state = {"requests": float(requests_per_minute), "tokens": float(tokens_per_minute), "updated_at": time.time()}
+        self.paced = 0
+        self.rejected = 0
+
+    def _refill(self, state: dict) -> dict:
+        now = time.time()
+        elapsed = max(0.0, now - state["updated_at"])
+        state["requests"] = min(self.requests_per_minute, state["requests"] + elapsed * self.requests_per_minute / 60)
+        state["tokens"] = min(self.tokens_per_minute, state["tokens"] + elapsed * self.tokens_per_minute / 60)
+        state["updated_at"] = now
+        return state
+
+    def _try_take(self, tokens: int) -> float:
+        """Take one request and `tokens` tokens if available; otherwise return the seconds to wait"""
+        with self._lock:
+            if self.state_path is None:
+                return self._take_from(self._state, tokens)
+
+            with open(self.state_path, "a+") as f:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+                try:
+                    f.seek(0)
+                    try:
+                        state = json.loads(f.read())
+                    except ValueError:
+                        state = {"requests": float(self.requests_per_minute), "tokens": float(self.tokens_per_minute), "updated_at": time.time()}
+                    wait = self._take_from(state, tokens)
+                    f.seek(0)
+                    f.truncate()
+                    f.write(json.dumps(state))
+                    f.flush()
+                    return wait
+                finally:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+    def _take_from(self, state: dict, tokens: int) -> float:
+        self._refill(state)
+        tokens = min(tokens, self.tokens_per_minute)
+        if state["requests"] >= 1 and state["tokens"] >= tokens:
+            state["requests"] -= 1
+            state["tokens"] -= tokens
+            return 0.0
+
+        request_wait = (1 - state["requests"]) * 60 / self.requests_per_minute if state["requests"] < 1 else 0.0
+        token_wait = (tokens - state["tokens"]) * 60 / self.tokens_per_minute if state["tokens"] < tokens else 0.0
+        return max(request_wait, token_wait)
+
+    def acquire(self, tokens: int) -> None:
+        """Block until the quota allows the call, or raise LLMOverloadedError if that would take too long"""
+        waited = 0.0
+        while True:
+            wait = self._try_take(tokens)
+            if wait <= 0:
+                if waited:
+                    with self._lock:
+                        self.paced += 1
+                return
+            if waited + wait > self.max_wait:
+                with self._lock:
+                    self.rejected += 1
+                raise LLMOverloadedError("Gemini quota exhausted", retry_after=math.ceil(wait))
+            sleep_for = min(wait, 0.25)
+            time.sleep(sleep_for)
+            waited += sleep_for
+
+    def stats(self) -> dict:
+        """Snapshot of pacing configuration and counters"""
+        with self._lock:
+            return {
+                "requests_per_minute": self.requests_per_minute,
+                "tokens_per_minute": self.tokens_per_minute,
+                "max_wait": self.max_wait,
+                "shared_across_workers": self.state_path is not None,
+                "paced": self.paced,
+                "rejected": self.rejected,
+            }
+
+
+def default_state_dir() -> str:
+    """Directory for the host-wide slot and bucket files"""
+    return os.getenv("LLM_LIMITER_DIR") or os.path.join(tempfile.gettempdir(), "baac-llm-limiter")
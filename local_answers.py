@@ -0,0 +1,328 @@
+"""
+Local Answers Module
+Rule-based answers for officials and population lookups, built from the structured records
+in barangay_records.py so that common questions do not need an LLM call
+"""
+
+import re
+from functools import lru_cache
+from typing import List, Optional
+
+from barangay_records import (
+    OFFICIALS, POPULATION_BRACKETS, PEOPLE,
+    POSITION_PUNONG_BARANGAY, POSITION_KAGAWAD, POSITION_SK_CHAIRPERSON, POSITION_SK_OFFICIAL,
+)
+from population_stats import SUMMARY, sex_ratio
+
+# Words that mark a lookup question ("who is ...", "sino ang ...")
+LOOKUP_TERMS = ["who", "sino", "sinu", "name", "pangalan", "list", "ano ang", "what is the", "give me", "show me", "tell me"]
+
+# Words that mark a counting question
+COUNT_TERMS = ["how many", "ilan", "number of", "count", "total", "population", "ilang"]
+
+# Words that ask for explanation rather than a lookup; these go to the LLM
+EXPLANATION_TERMS = ["why", "bakit", "how do", "how does", "how can", "what does", "duties", "responsible",
+                     "responsibility", "responsibilities", "role of", "job of", "explain", "describe", "history",
+                     "contact", "where", "when"]
+
+# Words that show a counting question is about residents (and not, say, kagawads)
+POPULATION_TERMS = ["population", "residents", "people", "citizens", "census", "demographic", "demographics", "tao",
+                    "age", "aged", "years old"]
+
+# Places other than Barangay Amungan; the records here say nothing about them
+OTHER_PLACE_TERMS = ["iba", "zambales", "san agustin", "bangatalinga", "botolan", "palauig", "olongapo", "luzon",
+                     "philippines", "pilipinas", "municipality", "town", "province", "city", "country", "region",
+                     "bayan", "lalawigan", "bansa"]
+
+# Words that ask about another time than the current term and the current population table
+OTHER_TIME_TERMS = ["first", "former", "previous", "past", "last", "was", "were", "before", "ago", "used to",
+                    "original", "originally", "founder", "founding", "next", "future", "will be",
+                    "dati", "dating", "noon", "una", "unang", "nakaraan", "susunod"]
+
+# Words that narrow an official down to a committee or portfolio, which the records do not list
+COMMITTEE_TERMS = ["committee", "committees", "komite", "in charge", "incharge", "handles", "handling", "assigned",
+                   "namamahala"]
+
+# "kagawad for health", but not "officials for barangay amungan"
+FOR_TOPIC_PATTERN = re.compile(r"\bfor\s+(?!(?:barangay|brgy|amungan|purok|this|our|us|me)\b)[a-z]")
+
+YEAR_PATTERN = re.compile(r"\b(?:1[89]|20)\d\d\b")
+
+# Words that put a count question about officials rather than residents ("how many kagawads are women")
+OFFICIAL_ROLE_WORDS = ["kagawad", "kagawads", "councilor", "councilors", "konsehal", "official", "officials",
+                       "captain", "kapitan", "chairman", "sk"]
+
+# Personal details the records do not hold ("how old is the kapitan", "is redondo married")
+ATTRIBUTE_TERMS = ["old", "age", "edad", "ilang taon", "birthday", "born", "kaarawan", "married", "wife", "husband",
+                   "asawa", "children", "anak", "contact", "phone", "cellphone", "email", "address", "nakatira",
+                   "salary", "sweldo", "elected", "party", "facebook", "photo", "picture", "women", "men", "female",
+                   "male", "babae", "lalaki"]
+
+# Offices outside the barangay ("secretary of the interior", "DILG secretary")
+OTHER_OFFICE_TERMS = ["dilg", "deped", "doh", "comelec", "senate", "senator", "congress", "congressman", "mayor",
+                      "governor", "cabinet", "department", "national", "pangulo"]
+OTHER_OFFICE_PATTERN = re.compile(
+    r"\b(?:secretary|treasurer|captain|chairman|chairperson|president|head)\s+of\s+"
+    r"(?!(?:the\s+)?(?:barangay|brgy|amungan|purok|sk|sangguniang|youth)\b)"
+)
+
+MALE_TERMS = ["male", "males", "men", "man", "boys", "boy", "lalaki", "lalake"]
+FEMALE_TERMS = ["female", "females", "women", "woman", "girls", "girl", "babae"]
+
+# Questions this short are treated as lookups even without a question word ("kapitan?", "purok 8")
+SHORT_QUERY_WORDS = 5
+
+
+def _words(text: str) -> List[str]:
+    return re.findall(r"[a-z0-9]+", text.lower())
+
+
+@lru_cache(maxsize=None)
+def _terms_pattern(terms: tuple):
+    return re.compile(r"\b(?:" + "|".join(re.escape(term) for term in terms) + r")\b")
+
+
+def _has_any(text: str, terms: List[str]) -> bool:
+    """True if any term occurs in the text as whole words ("age" does not match "page")"""
+    return _terms_pattern(tuple(terms)).search(text) is not None
+
+
+def _has_word(words: List[str], terms: List[str]) -> bool:
+    return any(word in terms for word in words)
+
+
+def _wrap(body: str) -> str:
+    return f'<div class="ai-response" style="text-align: justify; line-height: 1.6;">{body}</div>'
+
+
+def _list_html(items: List[str]) -> str:
+    return "<ul>" + "".join(f"<li>{item}</li>" for item in items) + "</ul>"
+
+
+def _is_lookup(query: str) -> bool:
+    if _has_any(query, EXPLANATION_TERMS):
+        return False
+    return _has_any(query, LOOKUP_TERMS) or len(_words(query)) <= SHORT_QUERY_WORDS
+
+
+def _is_out_of_scope(query: str) -> bool:
+    """True if the question is about another place or another time than the records describe"""
+    return (_has_any(query, OTHER_PLACE_TERMS) or _has_any(query, OTHER_TIME_TERMS)
+            or YEAR_PATTERN.search(query) is not None)
+
+
+def _count_officials(query: str, words: List[str]) -> Optional[str]:
+    """Answer "how many kagawads / SK officials / puroks" with a number, or None for other counts"""
+    if _has_word(words, ["purok", "puroks"]):
+        count = len(OFFICIALS["purok_presidents"])
+        return _wrap(f"<p>Barangay Amungan has <strong>{count}</strong> puroks, each with its own Purok President.</p>")
+    if "sk" in words or "sangguniang kabataan" in query or "youth council" in query:
+        count = len(OFFICIALS["sk_officials"]) + (1 if OFFICIALS["sk_chairperson"] else 0)
+        return _wrap(f"<p>Barangay Amungan has <strong>{count}</strong> Sangguniang Kabataan (SK) Officials, "
+                     "including the SK Chairperson.</p>")
+    if _has_word(words, ["kagawad", "kagawads", "councilor", "councilors", "konsehal"]):
+        count = len(OFFICIALS["kagawads"])
+        return _wrap(f"<p>Barangay Amungan has <strong>{count}</strong> Barangay Kagawad (Councilors).</p>")
+    return None
+
+
+# Function to answer questions about officials
+def answer_officials_query(query: str) -> Optional[str]:
+    """Answer a lookup about an official, or return None when the question needs the LLM"""
+    if not _is_lookup(query) or _is_out_of_scope(query):
+        return None
+    if (_has_any(query, ATTRIBUTE_TERMS) or _has_any(query, OTHER_OFFICE_TERMS)
+            or OTHER_OFFICE_PATTERN.search(query) is not None):
+        return None
+    # "how many people in purok 3" asks for a count of residents, not for the purok president
+    if _has_any(query, COUNT_TERMS) and _has_any(query, POPULATION_TERMS):
+        return None
+    words = _words(query)
+    if _has_any(query, COUNT_TERMS):
+        return _count_officials(query, words)
+
+    # Purok presidents: a specific purok or the whole list
+    if "purok" in words:
+        numbers = [int(n) for n in re.findall(r"purok\s*#?\s*(\d+)", query)]
+        presidents = OFFICIALS["purok_presidents"]
+        if numbers:
+            if any(number not in presidents for number in numbers):
+                return _wrap(f"<p>Barangay Amungan has a total of {len(presidents)} puroks, numbered 1 to {max(presidents)}.</p>")
+            if len(numbers) == 1:
+                return _wrap(f"<p>The Purok President of <strong>Purok {numbers[0]}</strong> is <strong>{presidents[numbers[0]]}</strong>.</p>")
+            return _wrap("<p>Here are the Purok Presidents you asked about:</p>" +
+                         _list_html([f"Purok {number}: {presidents[number]}" for number in numbers]))
+        if _has_any(query, ["president", "leader", "puroks"]):
+            return _wrap(f"<p>Barangay Amungan has a total of {len(presidents)} puroks. Here are the Purok Presidents:</p>" +
+                         _list_html([f"Purok {number}: {name}" for number, name in sorted(presidents.items())]))
+        return None
+
+    if _has_any(query, COMMITTEE_TERMS) or FOR_TOPIC_PATTERN.search(query):
+        return None
+
+    # SK officials
+    if "sk" in words or "sangguniang kabataan" in query or "youth council" in query:
+        if _has_any(query, ["chair", "chairman", "chairperson", "head", "leader", "president"]):
+            return _wrap(f"<p>The {POSITION_SK_CHAIRPERSON} of Barangay Amungan is <strong>{OFFICIALS['sk_chairperson']}</strong>.</p>")
+        return _wrap("<p>Here are the Sangguniang Kabataan (SK) Officials of Barangay Amungan (in hierarchical order):</p>" +
+                     _list_html([f"{OFFICIALS['sk_chairperson']} (SK Chairperson)"] + OFFICIALS["sk_officials"]))
+
+    # Barangay council positions
+    if _has_word(words, ["kagawad", "kagawads", "councilor", "councilors", "council", "konsehal"]):
+        return _wrap("<p>Here are the Barangay Kagawad (Councilors) of Barangay Amungan:</p>" + _list_html(OFFICIALS["kagawads"]))
+    if _has_word(words, ["captain", "kapitan", "kap", "cap", "punong", "chairman"]):
+        return _wrap(f"<p>The {POSITION_PUNONG_BARANGAY} (Barangay Captain) of Barangay Amungan is <strong>{OFFICIALS['punong_barangay']}</strong>.</p>")
+    if "secretary" in words:
+        return _wrap(f"<p>The Barangay Secretary of Barangay Amungan is <strong>{OFFICIALS['secretary']}</strong>.</p>")
+    if "treasurer" in words:
+        return _wrap(f"<p>The Barangay Treasurer of Barangay Amungan is <strong>{OFFICIALS['treasurer']}</strong>.</p>")
+
+    # Reverse lookup by surname ("who is Flauta?")
+    matches = [person for person in PEOPLE if _words(person["name"])[-1] in words
+               or (_words(person["name"])[-1] in ["jr", "sr"] and _words(person["name"])[-2] in words)]
+    if matches:
+        lines = []
+        for person in matches:
+            position = person["position"]
+            if person["detail"]:
+                position = f"{position} of {person['detail']}"
+            elif position == POSITION_KAGAWAD:
+                position = "a Barangay Kagawad (Councilor)"
+            elif position == POSITION_SK_OFFICIAL:
+                position = "a Sangguniang Kabataan (SK) Official"
+            lines.append(f"<strong>{person['name']}</strong> is {position}")
+        if len(lines) == 1:
+            return _wrap(f"<p>{lines[0]} of Barangay Amungan.</p>")
+        return _wrap("<p>I found these officials of Barangay Amungan with that name:</p>" + _list_html(lines))
+
+    if _has_word(words, ["officials", "official"]):
+        return _wrap(
+            "<p>Here are the officials of Barangay Amungan:</p>" + _list_html([
+                f"Punong Barangay: {OFFICIALS['punong_barangay']}",
+                "Barangay Kagawad: " + ", ".join(OFFICIALS["kagawads"]),
+                f"Barangay Secretary: {OFFICIALS['secretary']}",
+                f"Barangay Treasurer: {OFFICIALS['treasurer']}",
+                f"SK Chairperson: {OFFICIALS['sk_chairperson']}",
+            ]) + "<p>You can also ask me about the SK Officials or the Purok Presidents of any of the "
+            f"{len(OFFICIALS['purok_presidents'])} puroks.</p>"
+        )
+
+    return None
+
+
+def _age_range(query: str):
+    """Extract an inclusive (min_age, max_age) range from the query; max_age None means open-ended"""
+    match = re.search(r"(\d+)\s*(?:-|to|hanggang|and)\s*(\d+)", query)
+    if match:
+        low, high = int(match.group(1)), int(match.group(2))
+        return (low, high) if low <= high else (high, low)
+    match = re.search(r"(?:under|below|less than|younger than)\s*(\d+)", query)
+    if match:
+        return 0, int(match.group(1)) - 1
+    match = re.search(r"(\d+)\s*(?:years old )?(?:and|or) (?:over|above|older)|(?:over|above|older than)\s*(\d+)", query)
+    if match:
+        if match.group(1):
+            return int(match.group(1)), None
+        return int(match.group(2)) + 1, None
+    match = re.search(r"(?:aged?|edad)\s*(\d+)|(\d+)\s*(?:years? old|yrs? old|taong gulang)", query)
+    if match:
+        age = int(match.group(1) or match.group(2))
+        return age, age
+    return None
+
+
+def _brackets_for(min_age: int, max_age: Optional[int]):
+    """
+    Return the brackets that exactly cover the range, or None when it cuts through a bracket.
+    A single age ("18 year olds") is only covered by a one-year bracket, never by the bracket around it.
+    """
+    selected = [bracket for bracket in POPULATION_BRACKETS
+                if bracket["max_age"] is None or bracket["max_age"] >= min_age]
+    if max_age is not None:
+        selected = [bracket for bracket in selected if bracket["min_age"] <= max_age]
+    if not selected or selected[0]["min_age"] != min_age:
+        return None
+    last_max = selected[-1]["max_age"]
+    if last_max != max_age:
+        return None
+    return selected
+
+
+# Function to answer questions about population
+def answer_population_query(query: str) -> Optional[str]:
+    """Answer a population count, or return None when the question needs the LLM"""
+    if _has_any(query, EXPLANATION_TERMS) or _is_out_of_scope(query):
+        return None
+    # The table covers the whole barangay; there are no per-purok counts, nor counts of officials
+    if _has_word(_words(query), ["purok", "puroks"] + OFFICIAL_ROLE_WORDS):
+        return None
+
+    # Precomputed aggregates
+    if "dependency ratio" in query:
+        ratios = SUMMARY["dependency_ratios"]
+        return _wrap(
+            f"<p>The total dependency ratio of Barangay Amungan is <strong>{ratios['total']}</strong> "
+            "dependents (ages 0-14 and 65 and over) per 100 working-age residents (ages 15-64).</p>" +
+            _list_html([f"Youth dependency ratio: {ratios['youth']}", f"Old-age dependency ratio: {ratios['old_age']}"])
+        )
+    if "sex ratio" in query or "gender ratio" in query:
+        return _wrap(f"<p>Barangay Amungan has <strong>{sex_ratio()}</strong> males for every 100 females.</p>")
+    if "median" in query and _has_any(query, ["age", "population"]):
+        return _wrap(f"<p>The median resident of Barangay Amungan is in the <strong>{SUMMARY['median_age_bracket']}</strong> age group.</p>")
+
+    if not _has_any(query, COUNT_TERMS):
+        return None
+    words = _words(query)
+    age_range = _age_range(query)
+    # A number that is not an age ("how many people in 2 households") means a question this table cannot answer
+    if age_range is None and re.search(r"\d", query):
+        return None
+
+    wants_male = _has_word(words, MALE_TERMS)
+    wants_female = _has_word(words, FEMALE_TERMS)
+    if wants_male and wants_female:
+        wants_male = wants_female = False
+        by_sex = True
+    else:
+        by_sex = _has_any(query, ["by sex", "by gender", "gender", "breakdown"])
+
+    if not (age_range or wants_male or wants_female or by_sex or _has_any(query, POPULATION_TERMS)):
+        return None
+
+    if age_range:
+        brackets = _brackets_for(*age_range)
+        if brackets is None:
+            return None
+        if len(brackets) == 1:
+            description = f"in the <strong>{brackets[0]['label']}</strong> age group"
+        else:
+            last = brackets[-1]
+            if last["max_age"] is None:
+                description = f"aged <strong>{brackets[0]['min_age']} and over</strong>"
+            else:
+                description = f"aged <strong>{brackets[0]['min_age']} to {last['max_age']}</strong>"
+    else:
+        brackets = POPULATION_BRACKETS
+        description = None
+
+    male = sum(bracket["male"] for bracket in brackets)
+    female = sum(bracket["female"] for bracket in brackets)
+    total = sum(bracket["total"] for bracket in brackets)
+    group = f"residents {description}" if description else "residents"
+
+    if wants_male:
+        body = f"<p>Barangay Amungan has <strong>{male:,}</strong> male {group}.</p>"
+    elif wants_female:
+        body = f"<p>Barangay Amungan has <strong>{female:,}</strong> female {group}.</p>"
+    else:
+        body = f"<p>Barangay Amungan has <strong>{total:,}</strong> {group}.</p>"
+        if by_sex or description is None:
+            body += _list_html([f"Male: {male:,}", f"Female: {female:,}"])
+
+    return _wrap(body)
+
+
+def answer_locally(query: str) -> Optional[str]:
+    """Try the population and officials rules in turn; None means the LLM should answer"""
+    query = query.lower().strip()
+    return answer_population_query(query) or answer_officials_query(query)
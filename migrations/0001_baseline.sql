@@ -0,0 +1,97 @@
+-- Baseline schema: every table the app uses, as it exists in production.
+-- IF NOT EXISTS keeps this a no-op on databases created before migrations existed.
+
+CREATE TABLE IF NOT EXISTS app_users (
+    id SERIAL PRIMARY KEY,
+    name VARCHAR(255) NOT NULL,
+    email VARCHAR(255) UNIQUE NOT NULL,
+    purok VARCHAR(100),
+    password_hash TEXT,
+    oauth_provider VARCHAR(50),
+    oauth_id VARCHAR(255),
+    profile_pic TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS conversation_logs (
+    id SERIAL PRIMARY KEY,
+    user_input TEXT NOT NULL,
+    ai_response TEXT,
+    timestamp TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    user_id INTEGER
+);
+
+CREATE TABLE IF NOT EXISTS website_visits (
+    visit_date DATE PRIMARY KEY,
+    visit_count INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS document_requests (
+    request_date DATE NOT NULL,
+    document_type VARCHAR(100) NOT NULL,
+    request_count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (request_date, document_type)
+);
+
+CREATE TABLE IF NOT EXISTS document_submissions (
+    id SERIAL PRIMARY KEY,
+    user_id INTEGER NOT NULL,
+    document_types TEXT[] NOT NULL,
+    request_date DATE NOT NULL,
+    name VARCHAR(255) NOT NULL,
+    purok VARCHAR(100) NOT NULL,
+    purpose TEXT NOT NULL,
+    copies INTEGER DEFAULT 1,
+    copyc INTEGER DEFAULT 0,
+    copyi INTEGER DEFAULT 0,
+    copyr INTEGER DEFAULT 0,
+    status VARCHAR(50) DEFAULT 'Pending',
+    submission_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    pickup_date DATE,
+    notes TEXT
+);
+
+CREATE TABLE IF NOT EXISTS daily_copy_requests (
+    id SERIAL PRIMARY KEY,
+    user_id INTEGER NOT NULL,
+    document_type VARCHAR(100) NOT NULL,
+    request_date DATE NOT NULL,
+    copy_count INTEGER DEFAULT 1,
+    CONSTRAINT daily_copy_requests_user_id_fkey
+        FOREIGN KEY (user_id) REFERENCES app_users(id) ON DELETE CASCADE,
+    UNIQUE(user_id, document_type, request_date)
+);
+
+CREATE TABLE IF NOT EXISTS env_variables (
+    key VARCHAR(255) PRIMARY KEY,
+    value TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS oauth_tokens (
+    id SERIAL PRIMARY KEY,
+    user_id INTEGER NOT NULL,
+    provider VARCHAR(50) NOT NULL,
+    token TEXT NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS chat_histories (
+    id SERIAL PRIMARY KEY,
+    user_id INTEGER NOT NULL,
+    title VARCHAR(255) NOT NULL DEFAULT 'New Chat',
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    is_active BOOLEAN NOT NULL DEFAULT TRUE
+);
+
+CREATE TABLE IF NOT EXISTS chat_messages (
+    id SERIAL PRIMARY KEY,
+    chat_id INTEGER NOT NULL,
+    is_user BOOLEAN NOT NULL,
+    message TEXT NOT NULL,
+    timestamp TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    CONSTRAINT chat_messages_chat_id_fkey
+        FOREIGN KEY (chat_id) REFERENCES chat_histories(id) ON DELETE CASCADE
+);
+
+CREATE INDEX IF NOT EXISTS idx_chat_messages_chat_id ON chat_messages(chat_id);
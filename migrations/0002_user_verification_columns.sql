@@ -0,0 +1,7 @@
+-- Email verification and password reset columns (previously added by update_user_table_for_verification)
+
+ALTER TABLE app_users ADD COLUMN IF NOT EXISTS is_verified BOOLEAN DEFAULT FALSE;
+ALTER TABLE app_users ADD COLUMN IF NOT EXISTS verification_token TEXT;
+ALTER TABLE app_users ADD COLUMN IF NOT EXISTS verification_expires TIMESTAMP;
+ALTER TABLE app_users ADD COLUMN IF NOT EXISTS reset_token TEXT;
+ALTER TABLE app_users ADD COLUMN IF NOT EXISTS reset_expires TIMESTAMP;
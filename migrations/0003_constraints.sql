@@ -0,0 +1,24 @@
+-- Constraints that used to be probed for in information_schema at startup and on every submission,
+-- plus the unique key store_oauth_token's ON CONFLICT (user_id, provider) relies on
+
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'chat_histories_user_id_fkey') THEN
+        ALTER TABLE chat_histories
+            ADD CONSTRAINT chat_histories_user_id_fkey
+            FOREIGN KEY (user_id) REFERENCES app_users(id) ON DELETE CASCADE;
+    END IF;
+
+    -- Submissions from deleted users may exist; as before, skip the constraint rather than fail
+    IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'document_submissions_user_id_fkey') THEN
+        BEGIN
+            ALTER TABLE document_submissions
+                ADD CONSTRAINT document_submissions_user_id_fkey
+                FOREIGN KEY (user_id) REFERENCES app_users(id) ON DELETE CASCADE;
+        EXCEPTION WHEN foreign_key_violation THEN
+            RAISE WARNING 'Could not add document_submissions_user_id_fkey: %', SQLERRM;
+        END;
+    END IF;
+END $$;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_oauth_tokens_user_provider ON oauth_tokens(user_id, provider);
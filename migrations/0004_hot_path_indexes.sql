@@ -0,0 +1,35 @@
+-- Indexes for the queries that filter or sort on otherwise unindexed columns.
+-- Measured with benchmarks/query_plans.py; re-run it when changing these.
+-- (daily_copy_requests is already covered by its UNIQUE (user_id, document_type, request_date) key.)
+
+-- custom_report / ai_report: conversation_logs filtered by timestamp range
+CREATE INDEX IF NOT EXISTS idx_conversation_logs_timestamp
+    ON conversation_logs (timestamp);
+
+-- admin document list (ORDER BY submission_date DESC), 30-day type counts and custom_report ranges
+CREATE INDEX IF NOT EXISTS idx_document_submissions_submission_date
+    ON document_submissions (submission_date DESC, id DESC);
+
+-- user_profile: a user's submissions, newest first
+CREATE INDEX IF NOT EXISTS idx_document_submissions_user_submitted
+    ON document_submissions (user_id, submission_date DESC);
+
+-- admin list filtered by status, newest first
+CREATE INDEX IF NOT EXISTS idx_document_submissions_status_submitted
+    ON document_submissions (status, submission_date DESC, id DESC);
+
+-- get_chat_history_context: last N messages of a chat (ORDER BY timestamp DESC LIMIT 10)
+CREATE INDEX IF NOT EXISTS idx_chat_messages_chat_timestamp
+    ON chat_messages (chat_id, timestamp DESC);
+
+-- Superseded by idx_chat_messages_chat_timestamp, whose leading column is chat_id
+DROP INDEX IF EXISTS idx_chat_messages_chat_id;
+
+-- get_user_chats: a user's active chats, most recently updated first
+CREATE INDEX IF NOT EXISTS idx_chat_histories_user_active_updated
+    ON chat_histories (user_id, updated_at DESC)
+    WHERE is_active;
+
+-- custom_report: registrations in a date range
+CREATE INDEX IF NOT EXISTS idx_app_users_created_at
+    ON app_users (created_at);
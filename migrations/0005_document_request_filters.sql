@@ -0,0 +1,26 @@
+-- Support for the keyset-paginated admin document list (document_queries.py).
+-- Pages are ordered by (submission_date, id), so submission_date must never be NULL.
+
+UPDATE document_submissions
+SET submission_date = COALESCE(request_date::timestamp, CURRENT_TIMESTAMP)
+WHERE submission_date IS NULL;
+
+ALTER TABLE document_submissions ALTER COLUMN submission_date SET NOT NULL;
+
+-- Type filter: document_types @> ARRAY['barangay clearance']
+CREATE INDEX IF NOT EXISTS idx_document_submissions_types
+    ON document_submissions USING gin (document_types);
+
+-- Purok filter, newest first
+CREATE INDEX IF NOT EXISTS idx_document_submissions_purok_submitted
+    ON document_submissions (purok, submission_date DESC, id DESC);
+
+-- Name search (ILIKE '%juan%') needs trigram indexes; skipped where the extension cannot be installed
+DO $$
+BEGIN
+    CREATE EXTENSION IF NOT EXISTS pg_trgm;
+    EXECUTE 'CREATE INDEX IF NOT EXISTS idx_document_submissions_name_trgm
+             ON document_submissions USING gin (name gin_trgm_ops)';
+EXCEPTION WHEN insufficient_privilege OR feature_not_supported OR undefined_file THEN
+    RAISE WARNING 'pg_trgm unavailable, name search will scan: %', SQLERRM;
+END $$;
@@ -0,0 +1,210 @@
+-- Daily rollup tables for the admin dashboard and reports, kept current by triggers on the base tables,
+-- so dashboard queries read a few rows per day instead of scanning the whole history.
+-- website_visits and document_requests are already daily counters and are read directly.
+-- Repair or backfill with: flask --app App rebuild-rollups  (calls rebuild_dashboard_rollups())
+
+CREATE TABLE IF NOT EXISTS daily_document_status (
+    day DATE NOT NULL,
+    status VARCHAR(50) NOT NULL,
+    purok VARCHAR(100) NOT NULL,
+    submissions INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, status, purok)
+);
+
+-- One row per document type in a submission; copies come from the type's copy column
+CREATE TABLE IF NOT EXISTS daily_document_types (
+    day DATE NOT NULL,
+    document_type VARCHAR(100) NOT NULL,
+    status VARCHAR(50) NOT NULL,
+    submissions INTEGER NOT NULL DEFAULT 0,
+    copies INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, document_type, status)
+);
+
+CREATE TABLE IF NOT EXISTS daily_conversation_stats (
+    day DATE PRIMARY KEY,
+    conversations INTEGER NOT NULL DEFAULT 0,
+    user_input_chars BIGINT NOT NULL DEFAULT 0,
+    ai_responses INTEGER NOT NULL DEFAULT 0,
+    ai_response_chars BIGINT NOT NULL DEFAULT 0
+);
+
+-- Per-day counts of identical questions, for the report's top queries
+CREATE TABLE IF NOT EXISTS daily_query_stats (
+    day DATE NOT NULL,
+    input_hash CHAR(32) NOT NULL,
+    user_input TEXT NOT NULL,
+    queries INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, input_hash)
+);
+
+-- Users without created_at are counted on 1970-01-01 so totals stay exact
+CREATE TABLE IF NOT EXISTS daily_registrations (
+    day DATE NOT NULL,
+    auth_method VARCHAR(50) NOT NULL,
+    registrations INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, auth_method)
+);
+
+-- Add (sign = 1) or remove (sign = -1) one submission from the rollups
+CREATE OR REPLACE FUNCTION rollup_document_submission(submission document_submissions, sign INTEGER)
+RETURNS void AS $$
+BEGIN
+    INSERT INTO daily_document_status (day, status, purok, submissions)
+    VALUES (submission.submission_date::date, COALESCE(submission.status, 'Unknown'), submission.purok, sign)
+    ON CONFLICT (day, status, purok)
+    DO UPDATE SET submissions = daily_document_status.submissions + EXCLUDED.submissions;
+
+    INSERT INTO daily_document_types (day, document_type, status, submissions, copies)
+    SELECT submission.submission_date::date, types.document_type, COALESCE(submission.status, 'Unknown'), sign,
+           sign * COALESCE(CASE types.document_type
+               WHEN 'barangay clearance' THEN submission.copyc
+               WHEN 'barangay indigency' THEN submission.copyi
+               WHEN 'barangay residency' THEN submission.copyr
+           END, 0)
+    FROM (SELECT DISTINCT unnest(submission.document_types) AS document_type) types
+    ON CONFLICT (day, document_type, status)
+    DO UPDATE SET submissions = daily_document_types.submissions + EXCLUDED.submissions,
+                  copies = daily_document_types.copies + EXCLUDED.copies;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION document_submissions_rollup_trigger() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM rollup_document_submission(OLD, -1);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM rollup_document_submission(NEW, 1);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS document_submissions_rollup_insert_delete ON document_submissions;
+CREATE TRIGGER document_submissions_rollup_insert_delete
+    AFTER INSERT OR DELETE ON document_submissions
+    FOR EACH ROW EXECUTE PROCEDURE document_submissions_rollup_trigger();
+
+DROP TRIGGER IF EXISTS document_submissions_rollup_update ON document_submissions;
+CREATE TRIGGER document_submissions_rollup_update
+    AFTER UPDATE ON document_submissions
+    FOR EACH ROW
+    WHEN (OLD.status IS DISTINCT FROM NEW.status
+          OR OLD.purok IS DISTINCT FROM NEW.purok
+          OR OLD.document_types IS DISTINCT FROM NEW.document_types
+          OR OLD.submission_date IS DISTINCT FROM NEW.submission_date
+          OR OLD.copyc IS DISTINCT FROM NEW.copyc
+          OR OLD.copyi IS DISTINCT FROM NEW.copyi
+          OR OLD.copyr IS DISTINCT FROM NEW.copyr)
+    EXECUTE PROCEDURE document_submissions_rollup_trigger();
+
+-- Statement-level, so a batched multi-row INSERT updates each day's rollup row once
+CREATE OR REPLACE FUNCTION conversation_logs_rollup_trigger() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO daily_conversation_stats (day, conversations, user_input_chars, ai_responses, ai_response_chars)
+    SELECT timestamp::date, COUNT(*), COALESCE(SUM(LENGTH(user_input)), 0),
+           COUNT(ai_response), COALESCE(SUM(LENGTH(ai_response)), 0)
+    FROM new_rows
+    GROUP BY timestamp::date
+    ON CONFLICT (day)
+    DO UPDATE SET conversations = daily_conversation_stats.conversations + EXCLUDED.conversations,
+                  user_input_chars = daily_conversation_stats.user_input_chars + EXCLUDED.user_input_chars,
+                  ai_responses = daily_conversation_stats.ai_responses + EXCLUDED.ai_responses,
+                  ai_response_chars = daily_conversation_stats.ai_response_chars + EXCLUDED.ai_response_chars;
+
+    INSERT INTO daily_query_stats (day, input_hash, user_input, queries)
+    SELECT timestamp::date, md5(user_input), MIN(user_input), COUNT(*)
+    FROM new_rows
+    GROUP BY timestamp::date, md5(user_input)
+    ON CONFLICT (day, input_hash)
+    DO UPDATE SET queries = daily_query_stats.queries + EXCLUDED.queries;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS conversation_logs_rollup ON conversation_logs;
+CREATE TRIGGER conversation_logs_rollup
+    AFTER INSERT ON conversation_logs
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE PROCEDURE conversation_logs_rollup_trigger();
+
+CREATE OR REPLACE FUNCTION app_users_rollup_trigger() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        INSERT INTO daily_registrations (day, auth_method, registrations)
+        VALUES (COALESCE(OLD.created_at::date, DATE '1970-01-01'), COALESCE(OLD.oauth_provider, 'email'), -1)
+        ON CONFLICT (day, auth_method)
+        DO UPDATE SET registrations = daily_registrations.registrations + EXCLUDED.registrations;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO daily_registrations (day, auth_method, registrations)
+        VALUES (COALESCE(NEW.created_at::date, DATE '1970-01-01'), COALESCE(NEW.oauth_provider, 'email'), 1)
+        ON CONFLICT (day, auth_method)
+        DO UPDATE SET registrations = daily_registrations.registrations + EXCLUDED.registrations;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS app_users_rollup_insert_delete ON app_users;
+CREATE TRIGGER app_users_rollup_insert_delete
+    AFTER INSERT OR DELETE ON app_users
+    FOR EACH ROW EXECUTE PROCEDURE app_users_rollup_trigger();
+
+-- Linking a Google account to an email user moves them to the google auth method
+DROP TRIGGER IF EXISTS app_users_rollup_update ON app_users;
+CREATE TRIGGER app_users_rollup_update
+    AFTER UPDATE ON app_users
+    FOR EACH ROW
+    WHEN (OLD.oauth_provider IS DISTINCT FROM NEW.oauth_provider
+          OR OLD.created_at IS DISTINCT FROM NEW.created_at)
+    EXECUTE PROCEDURE app_users_rollup_trigger();
+
+-- Recompute every rollup from the base tables; writers are blocked meanwhile so the result is exact
+CREATE OR REPLACE FUNCTION rebuild_dashboard_rollups() RETURNS void AS $$
+BEGIN
+    LOCK TABLE document_submissions, conversation_logs, app_users IN SHARE MODE;
+    TRUNCATE daily_document_status, daily_document_types, daily_conversation_stats,
+             daily_query_stats, daily_registrations;
+
+    INSERT INTO daily_document_status (day, status, purok, submissions)
+    SELECT submission_date::date, COALESCE(status, 'Unknown'), purok, COUNT(*)
+    FROM document_submissions
+    GROUP BY 1, 2, 3;
+
+    INSERT INTO daily_document_types (day, document_type, status, submissions, copies)
+    SELECT day, document_type, status, COUNT(*), COALESCE(SUM(copies), 0)
+    FROM (
+        SELECT DISTINCT ds.id, ds.submission_date::date AS day, types.document_type,
+               COALESCE(ds.status, 'Unknown') AS status,
+               COALESCE(CASE types.document_type
+                   WHEN 'barangay clearance' THEN ds.copyc
+                   WHEN 'barangay indigency' THEN ds.copyi
+                   WHEN 'barangay residency' THEN ds.copyr
+               END, 0) AS copies
+        FROM document_submissions ds, unnest(ds.document_types) AS types(document_type)
+    ) per_type
+    GROUP BY day, document_type, status;
+
+    INSERT INTO daily_conversation_stats (day, conversations, user_input_chars, ai_responses, ai_response_chars)
+    SELECT timestamp::date, COUNT(*), COALESCE(SUM(LENGTH(user_input)), 0),
+           COUNT(ai_response), COALESCE(SUM(LENGTH(ai_response)), 0)
+    FROM conversation_logs
+    GROUP BY 1;
+
+    INSERT INTO daily_query_stats (day, input_hash, user_input, queries)
+    SELECT timestamp::date, md5(user_input), MIN(user_input), COUNT(*)
+    FROM conversation_logs
+    GROUP BY 1, 2;
+
+    INSERT INTO daily_registrations (day, auth_method, registrations)
+    SELECT COALESCE(created_at::date, DATE '1970-01-01'), COALESCE(oauth_provider, 'email'), COUNT(*)
+    FROM app_users
+    GROUP BY 1, 2;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Backfill from existing data
+SELECT rebuild_dashboard_rollups();
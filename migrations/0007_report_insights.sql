@@ -0,0 +1,11 @@
+-- Generated AI insights per report date range. input_digest fingerprints the numbers the insights were
+-- written from; a cached entry is reused only while the digest still matches the current numbers.
+
+CREATE TABLE IF NOT EXISTS report_insights (
+    start_date DATE NOT NULL,
+    end_date DATE NOT NULL,
+    input_digest CHAR(64) NOT NULL,
+    insights TEXT NOT NULL,
+    generated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (start_date, end_date)
+);
@@ -0,0 +1,9 @@
+-- Client-generated key per document submission, so a retried POST /submit_document returns the
+-- original reference number instead of inserting (and charging daily quota for) a second request.
+-- Keys are scoped to the submitting user; submissions made before this migration have none.
+
+ALTER TABLE document_submissions ADD COLUMN IF NOT EXISTS idempotency_key UUID;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_document_submissions_idempotency_key
+    ON document_submissions (user_id, idempotency_key)
+    WHERE idempotency_key IS NOT NULL;
@@ -0,0 +1,10 @@
+-- Server-side Flask sessions (session_store.py). The cookie holds a random session id; rows are keyed by
+-- its SHA-256 so the table alone cannot be used to hijack sessions. Expired rows are pruned by the app.
+
+CREATE TABLE IF NOT EXISTS web_sessions (
+    id CHAR(64) PRIMARY KEY,
+    data TEXT NOT NULL,
+    expires_at TIMESTAMPTZ NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_web_sessions_expires_at ON web_sessions (expires_at);
@@ -0,0 +1,6 @@
+-- Rolling summary of each saved chat's older messages, used in LLM prompts in place of turns that no
+-- longer fit the history token budget. summarized_count is how many of the chat's oldest messages
+-- (ordered by timestamp, id) the summary covers; messages are never removed individually, so it stays valid.
+
+ALTER TABLE chat_histories ADD COLUMN IF NOT EXISTS context_summary TEXT;
+ALTER TABLE chat_histories ADD COLUMN IF NOT EXISTS summarized_count INTEGER NOT NULL DEFAULT 0;
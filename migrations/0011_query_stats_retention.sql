@@ -0,0 +1,26 @@
+-- daily_query_stats has one row per distinct question per day, so unlike the other rollups it grows with
+-- the variety of questions asked, not just with the number of days. Days older than keep_days are compacted
+-- to their top_n questions, which bounds every compacted day at top_n rows. Report top queries over ranges
+-- that reach past keep_days are then computed from each day's top_n, an approximation that only drops
+-- questions too rare to matter for a top-10 list.
+-- Called by the query-stats compaction job in App.py and after: flask --app App rebuild-rollups
+
+CREATE OR REPLACE FUNCTION compact_daily_query_stats(keep_days INTEGER, top_n INTEGER)
+RETURNS INTEGER AS $$
+DECLARE
+    removed INTEGER;
+BEGIN
+    DELETE FROM daily_query_stats q
+    USING (
+        SELECT day, input_hash,
+               ROW_NUMBER() OVER (PARTITION BY day ORDER BY queries DESC, input_hash) AS rank
+        FROM daily_query_stats
+        WHERE day < CURRENT_DATE - keep_days
+    ) ranked
+    WHERE q.day = ranked.day AND q.input_hash = ranked.input_hash AND ranked.rank > top_n;
+    GET DIAGNOSTICS removed = ROW_COUNT;
+    RETURN removed;
+END;
+$$ LANGUAGE plpgsql;
+
+SELECT compact_daily_query_stats(7, 50);
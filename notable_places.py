@@ -56,6 +56,27 @@ PLACE_KEYWORDS = {
     "beach resort": ["resort", "beach resort", "beach"]
 }
 
+# Words that ask to see something, and words that refer to a place
+VIEW_KEYWORDS = ["show", "see", "view", "picture", "photo", "image", "itsura","patingin","look at"]
+PLACE_RELATED_WORDS = ["place", "location", "area", "site", "spot", "landmark", "building", "school", "market", "hall", "plaza", "center","beach","resort","beach resort"]
+
+# Phrases that ask to see every notable place at once
+ALL_PLACES_KEYWORDS = [
+    "all places", "lahat ng lugar", "mga lugar", "notable places", 
+    "tourist spots", "landmarks", "mga landmark", "show me places",
+    "pictures of places", "images of places", "mga larawan ng lugar"
+]
+
+# Precompiled "show me the <keyword>" / "<keyword> picture" patterns for each place keyword
+PLACE_VIEW_PATTERNS = {
+    (place, keyword): [
+        re.compile(r"(show|see|view|picture|photo|image|look at).*\b" + re.escape(keyword) + r"\b"),
+        re.compile(r"\b" + re.escape(keyword) + r"\b.*(show|see|view|picture|photo|image)")
+    ]
+    for place, keywords in PLACE_KEYWORDS.items()
+    for keyword in keywords
+}
+
 # Base directory for images
 IMAGE_BASE_DIR = "static/images"
 
@@ -70,27 +91,22 @@ def detect_place_request(user_message: str) -> Optional[str]:
     Returns:
         The detected place name or None if no place is detected
     """
-    # Convert to lowercase for case-insensitive matching
-    message_lower = user_message.lower()
+    from intent_matcher import match_intents
+    matches = match_intents(user_message)
     
     # Check for direct place mentions
     for place in NOTABLE_PLACES.keys():
-        if place in message_lower:
+        if matches.has(f"place:{place}"):
             return place
     
     # Check for keywords
-    for place, keywords in PLACE_KEYWORDS.items():
-        for keyword in keywords:
-            if keyword in message_lower:
-                # Check if the message is asking to see/view/show the place
-                view_patterns = [
-                    r"(show|see|view|picture|photo|image|look at).*\b" + re.escape(keyword) + r"\b",
-                    r"\b" + re.escape(keyword) + r"\b.*(show|see|view|picture|photo|image)"
-                ]
-                
-                for pattern in view_patterns:
-                    if re.search(pattern, message_lower):
-                        return place
+    message_lower = user_message.lower()
+    for place in PLACE_KEYWORDS.keys():
+        for keyword in matches.keywords(f"place_keyword:{place}"):
+            # Check if the message is asking to see/view/show the place
+            for pattern in PLACE_VIEW_PATTERNS[(place, keyword)]:
+                if pattern.search(message_lower):
+                    return place
     
     return None
 
@@ -185,32 +201,18 @@ def is_place_request(user_message: str) -> bool:
     Returns:
         True if it's a place request, False otherwise
     """
-    # Convert to lowercase for case-insensitive matching
-    message_lower = user_message.lower()
-    
-    # Check for view/see/show keywords combined with place-related words
-    view_keywords = ["show", "see", "view", "picture", "photo", "image", "itsura","patingin","look at"]
-    place_related = ["place", "location", "area", "site", "spot", "landmark", "building", "school", "market", "hall", "plaza", "center","beach","resort","beach resort"]
-    
-    for view_word in view_keywords:
-        if view_word in message_lower:
-            # Check if any place-related word is in the message
-            for place_word in place_related:
-                if place_word in message_lower:
-                    return True
-            
-            # Check if any specific place name is in the message
-            for place in NOTABLE_PLACES.keys():
-                if place in message_lower:
-                    return True
-                    
-            # Check if any place keyword is in the message
-            for keywords in PLACE_KEYWORDS.values():
-                for keyword in keywords:
-                    if keyword in message_lower:
-                        return True
-    
-    return False
+    from intent_matcher import match_intents
+    matches = match_intents(user_message)
+    
+    # Check for view/see/show keywords combined with place-related words,
+    # a specific place name or any place keyword
+    if not matches.has("place_view"):
+        return False
+    
+    return any(
+        intent == "place_related" or intent.startswith("place:") or intent.startswith("place_keyword:")
+        for intent in matches.positions
+    )
 
 # Example usage:
 if __name__ == "__main__":
@@ -0,0 +1,119 @@
+"""
+Population Statistics Module
+NumPy table of the barangay population (age brackets x sex) built once at import,
+with precomputed aggregates for the chatbot and the admin dashboard
+"""
+
+from typing import Dict, Optional
+
+import numpy as np
+
+from barangay_records import POPULATION_BRACKETS
+
+MALE = 0
+FEMALE = 1
+SEXES = {"male": MALE, "female": FEMALE}
+
+# Standard dependency-ratio age groups
+YOUTH_MAX_AGE = 14
+OLD_AGE_MIN_AGE = 65
+
+LABELS = [bracket["label"] for bracket in POPULATION_BRACKETS]
+MIN_AGES = np.array([bracket["min_age"] for bracket in POPULATION_BRACKETS], dtype=np.int64)
+# The open-ended last bracket ("80 and over") is stored with an upper bound of -1
+MAX_AGES = np.array([-1 if bracket["max_age"] is None else bracket["max_age"] for bracket in POPULATION_BRACKETS], dtype=np.int64)
+
+# counts[bracket, sex]
+COUNTS = np.array([[bracket["male"], bracket["female"]] for bracket in POPULATION_BRACKETS], dtype=np.int64)
+TOTALS = COUNTS.sum(axis=1)
+
+# Prefix sums so that any bracket-aligned range sum is two lookups
+_PREFIX = np.vstack([np.zeros((1, 2), dtype=np.int64), np.cumsum(COUNTS, axis=0)])
+
+
+def _bracket_span(min_age: int, max_age: Optional[int]):
+    """Return the [start, stop) bracket indexes covering exactly min_age..max_age"""
+    starts = np.flatnonzero(MIN_AGES == min_age)
+    if max_age is None:
+        stops = np.array([len(MIN_AGES) - 1]) if MAX_AGES[-1] == -1 else np.array([], dtype=np.int64)
+    else:
+        stops = np.flatnonzero(MAX_AGES == max_age)
+    if not len(starts) or not len(stops) or stops[0] < starts[0]:
+        raise ValueError(f"Age range {min_age}-{max_age if max_age is not None else 'over'} does not match the age brackets")
+    return int(starts[0]), int(stops[0]) + 1
+
+
+def range_sum(min_age: int = 0, max_age: Optional[int] = None, sex: Optional[str] = None) -> int:
+    """
+    Population between min_age and max_age inclusive (max_age None means "and over").
+    The range must line up with bracket edges. sex is "male", "female" or None for both.
+    """
+    start, stop = _bracket_span(min_age, max_age)
+    counts = _PREFIX[stop] - _PREFIX[start]
+    if sex is None:
+        return int(counts.sum())
+    return int(counts[SEXES[sex]])
+
+
+def sex_ratio(min_age: int = 0, max_age: Optional[int] = None) -> float:
+    """Males per 100 females in the age range"""
+    male = range_sum(min_age, max_age, "male")
+    female = range_sum(min_age, max_age, "female")
+    return round(male * 100 / female, 2) if female else 0.0
+
+
+def dependency_ratios() -> Dict[str, float]:
+    """Youth, old-age and total dependency ratios per 100 working-age residents (15-64)"""
+    youth = range_sum(0, YOUTH_MAX_AGE)
+    old_age = range_sum(OLD_AGE_MIN_AGE, None)
+    working_age = range_sum(YOUTH_MAX_AGE + 1, OLD_AGE_MIN_AGE - 1)
+    return {
+        "youth": round(youth * 100 / working_age, 2),
+        "old_age": round(old_age * 100 / working_age, 2),
+        "total": round((youth + old_age) * 100 / working_age, 2),
+    }
+
+
+def median_age_bracket(sex: Optional[str] = None) -> str:
+    """Label of the bracket that holds the median resident"""
+    counts = TOTALS if sex is None else COUNTS[:, SEXES[sex]]
+    cumulative = np.cumsum(counts)
+    index = int(np.searchsorted(cumulative, cumulative[-1] / 2))
+    return LABELS[index]
+
+
+def pyramid_data() -> Dict:
+    """Per-bracket counts by sex, youngest first, ready for a population-pyramid chart"""
+    return {
+        "labels": LABELS,
+        "male": COUNTS[:, MALE].tolist(),
+        "female": COUNTS[:, FEMALE].tolist(),
+        "total": TOTALS.tolist(),
+    }
+
+
+def _build_summary() -> Dict:
+    total = int(TOTALS.sum())
+    return {
+        "total_population": total,
+        "male": int(COUNTS[:, MALE].sum()),
+        "female": int(COUNTS[:, FEMALE].sum()),
+        "sex_ratio": sex_ratio(),
+        "dependency_ratios": dependency_ratios(),
+        "median_age_bracket": median_age_bracket(),
+        "age_groups": {
+            "youth_0_14": range_sum(0, YOUTH_MAX_AGE),
+            "working_age_15_64": range_sum(YOUTH_MAX_AGE + 1, OLD_AGE_MIN_AGE - 1),
+            "senior_65_plus": range_sum(OLD_AGE_MIN_AGE, None),
+        },
+        "pyramid": pyramid_data(),
+    }
+
+
+# Computed once at import; the data only changes when barangay_data.py is redeployed
+SUMMARY = _build_summary()
+
+
+def get_population_summary() -> Dict:
+    """Precomputed population aggregates for the admin dashboard"""
+    return SUMMARY
@@ -0,0 +1,104 @@
+"""
+Report Insights Module
+Persistent cache for the AI insights of admin reports, keyed by date range and a digest of the numbers
+the insights describe, plus a periodic background job that pre-generates insights for past months
+"""
+
+import hashlib
+import json
+import logging
+import threading
+from datetime import date, timedelta
+from typing import Callable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Bump when the insights prompt changes so cached insights are regenerated
+INSIGHTS_PROMPT_VERSION = 1
+
+
+def insights_digest(start_date, end_date, total_visits, total_requests, document_types_data, status_data) -> str:
+    """Fingerprint of everything the insights prompt is built from"""
+    payload = {
+        "version": INSIGHTS_PROMPT_VERSION,
+        "range": [str(start_date), str(end_date)],
+        "total_visits": total_visits,
+        "total_requests": total_requests,
+        "document_types": sorted((row["document_type"], row["total_requests"]) for row in document_types_data),
+        "statuses": sorted((row["status"], row["count"]) for row in status_data),
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def get_cached_insights(cursor, start_date, end_date, digest: str) -> Optional[str]:
+    """Cached insights for the range, or None if missing or written from different numbers"""
+    cursor.execute("""
+    SELECT insights FROM report_insights
+    WHERE start_date = %s AND end_date = %s AND input_digest = %s
+    """, (start_date, end_date, digest))
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def store_insights(cursor, start_date, end_date, digest: str, insights: str) -> None:
+    cursor.execute("""
+    INSERT INTO report_insights (start_date, end_date, input_digest, insights, generated_at)
+    VALUES (%s, %s, %s, %s, CURRENT_TIMESTAMP)
+    ON CONFLICT (start_date, end_date)
+    DO UPDATE SET input_digest = EXCLUDED.input_digest,
+                  insights = EXCLUDED.insights,
+                  generated_at = EXCLUDED.generated_at
+    """, (start_date, end_date, digest, insights))
+
+
+def past_month_ranges(today: date, months: int) -> List[Tuple[str, str]]:
+    """(first day, last day) of the `months` complete months before today, most recent first"""
+    ranges = []
+    month_end = today.replace(day=1) - timedelta(days=1)
+    for _ in range(months):
+        month_start = month_end.replace(day=1)
+        ranges.append((month_start.isoformat(), month_end.isoformat()))
+        month_end = month_start - timedelta(days=1)
+    return ranges
+
+
+class PeriodicJob:
+    """Runs `func` every `interval` seconds on a daemon thread, starting `initial_delay` seconds after start()"""
+
+    def __init__(self, name: str, func: Callable[[], None], interval: float, initial_delay: float = 60):
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.initial_delay = initial_delay
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.runs = 0
+        self.failures = 0
+
+    def start(self) -> None:
+        if self.interval <= 0 or (self._thread is not None and self._thread.is_alive()):
+            return
+        self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _run(self) -> None:
+        delay = self.initial_delay
+        while not self._stop.wait(delay):
+            delay = self.interval
+            try:
+                self.func()
+                self.runs += 1
+            except Exception as e:
+                self.failures += 1
+                logger.error(f"Background job {self.name} failed: {e}")
+
+    def stats(self) -> dict:
+        return {
+            "interval_seconds": self.interval,
+            "running": self._thread is not None and self._thread.is_alive(),
+            "runs": self.runs,
+            "failures": self.failures,
+        }
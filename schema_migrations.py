@@ -0,0 +1,123 @@
+"""
+Schema Migrations Module
+Applies the ordered SQL files in migrations/ once each and records them in a schema_version table,
+so schema changes run from a deploy command instead of on worker startup or inside request handlers
+"""
+
+import hashlib
+import logging
+import os
+import re
+from typing import List, NamedTuple, Optional
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+
+# Arbitrary key for pg_advisory_lock so concurrent deploys apply migrations one at a time
+MIGRATION_LOCK_ID = 4_217_301
+
+MIGRATION_FILE_PATTERN = re.compile(r"^(\d+)_([a-z0-9_]+)\.sql$")
+
+CREATE_SCHEMA_VERSION = """
+CREATE TABLE IF NOT EXISTS schema_version (
+    version INTEGER PRIMARY KEY,
+    name VARCHAR(255) NOT NULL,
+    checksum VARCHAR(64) NOT NULL,
+    applied_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+)
+"""
+
+
+class Migration(NamedTuple):
+    version: int
+    name: str
+    path: str
+
+    def read(self) -> str:
+        with open(self.path, "r", encoding="utf-8") as f:
+            return f.read()
+
+    def checksum(self) -> str:
+        return hashlib.sha256(self.read().encode("utf-8")).hexdigest()
+
+
+def discover_migrations(directory: str = MIGRATIONS_DIR) -> List[Migration]:
+    """Migration files sorted by version; versions must be unique"""
+    migrations = []
+    for filename in os.listdir(directory):
+        match = MIGRATION_FILE_PATTERN.match(filename)
+        if match:
+            migrations.append(Migration(int(match.group(1)), match.group(2), os.path.join(directory, filename)))
+    migrations.sort()
+
+    versions = [migration.version for migration in migrations]
+    duplicates = {version for version in versions if versions.count(version) > 1}
+    if duplicates:
+        raise ValueError(f"Duplicate migration versions: {sorted(duplicates)}")
+    return migrations
+
+
+def applied_migrations(cursor) -> dict:
+    """{version: checksum} for migrations already recorded in schema_version"""
+    cursor.execute("SELECT version, checksum FROM schema_version")
+    return dict(cursor.fetchall())
+
+
+def migrate(connection, directory: str = MIGRATIONS_DIR, target: Optional[int] = None) -> List[Migration]:
+    """
+    Apply pending migrations in order, each in its own transaction, up to and including `target` if given.
+    Returns the migrations that were applied. Stops at the first failure (the failed migration is rolled back).
+    """
+    migrations = [m for m in discover_migrations(directory) if target is None or m.version <= target]
+    applied_now = []
+    cursor = connection.cursor()
+    try:
+        cursor.execute("SELECT pg_advisory_lock(%s)", (MIGRATION_LOCK_ID,))
+        cursor.execute(CREATE_SCHEMA_VERSION)
+        connection.commit()
+
+        applied = applied_migrations(cursor)
+        for migration in migrations:
+            if migration.version in applied:
+                if applied[migration.version] != migration.checksum():
+                    logger.warning(f"Migration {migration.version}_{migration.name} changed after it was applied")
+                continue
+
+            logger.info(f"Applying migration {migration.version}_{migration.name}")
+            try:
+                cursor.execute(migration.read())
+                cursor.execute(
+                    "INSERT INTO schema_version (version, name, checksum) VALUES (%s, %s, %s)",
+                    (migration.version, migration.name, migration.checksum())
+                )
+                connection.commit()
+            except Exception as e:
+                connection.rollback()
+                logger.error(f"Migration {migration.version}_{migration.name} failed: {e}")
+                raise
+            applied_now.append(migration)
+    finally:
+        try:
+            cursor.execute("SELECT pg_advisory_unlock(%s)", (MIGRATION_LOCK_ID,))
+            connection.commit()
+        except Exception:
+            connection.rollback()
+        cursor.close()
+    return applied_now
+
+
+def schema_status(connection, directory: str = MIGRATIONS_DIR) -> dict:
+    """Current schema version and any migrations not yet applied"""
+    migrations = discover_migrations(directory)
+    cursor = connection.cursor()
+    try:
+        cursor.execute("SELECT to_regclass('schema_version') IS NOT NULL")
+        applied = applied_migrations(cursor) if cursor.fetchone()[0] else {}
+    finally:
+        cursor.close()
+    return {
+        "current_version": max(applied) if applied else 0,
+        "latest_version": migrations[-1].version if migrations else 0,
+        "pending": [f"{m.version:04d}_{m.name}" for m in migrations if m.version not in applied],
+    }
@@ -0,0 +1,304 @@
+"""
+Session Store Module
+Server-side Flask sessions: the cookie carries only an opaque random id and the session data lives in
+PostgreSQL (shared by every worker and node) or a local SQLite file (single node), selected by SESSION_BACKEND
+"""
+
+import hashlib
+import logging
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from flask.sessions import SessionInterface, SessionMixin, session_json_serializer
+from werkzeug.datastructures import CallbackDict
+
+logger = logging.getLogger(__name__)
+
+# Expired sessions are deleted at most this often per process
+PRUNE_INTERVAL = 600
+
+
+def _storage_key(session_id: str) -> str:
+    # Only a hash of the id is stored, so a leaked table or file cannot be replayed as cookies
+    return hashlib.sha256(session_id.encode("utf-8")).hexdigest()
+
+
+class ServerSideSession(CallbackDict, SessionMixin):
+    """Session dict that remembers its id, the id the client's cookie carries, and when its stored copy expires"""
+
+    def __init__(self, initial=None, session_id: Optional[str] = None, expires_at: Optional[datetime] = None):
+        def on_update(self):
+            self.modified = True
+
+        super().__init__(initial, on_update)
+        self.session_id = session_id
+        self.cookie_id = session_id
+        self.replaced_id = None
+        self.expires_at = expires_at
+        self.modified = False
+
+    def regenerate(self) -> None:
+        """
+        Move the data to a new session id and drop the old stored row when the session is next saved.
+        Call it whenever the session gains privileges (login, admin access) so an id planted
+        in the visitor's browser beforehand (session fixation) is worthless.
+        """
+        if self.session_id is not None and self.replaced_id is None:
+            self.replaced_id = self.session_id
+        self.session_id = None
+        self.expires_at = None
+        self.modified = True
+
+
+class PostgresSessionStore:
+    """Sessions in the web_sessions table (migrations/0009_web_sessions.sql)"""
+
+    def __init__(self, connections):
+        self.connections = connections
+
+    def load(self, key: str):
+        connection = self.connections.get_connection()
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT data, expires_at FROM web_sessions WHERE id = %s AND expires_at > CURRENT_TIMESTAMP",
+                    (key,)
+                )
+                return cursor.fetchone()
+        finally:
+            self.connections.return_connection(connection)
+
+    def save(self, key: str, data: str, expires_at: datetime) -> None:
+        connection = self.connections.get_connection()
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute("""
+                    INSERT INTO web_sessions (id, data, expires_at) VALUES (%s, %s, %s)
+                    ON CONFLICT (id) DO UPDATE SET data = EXCLUDED.data, expires_at = EXCLUDED.expires_at
+                """, (key, data, expires_at))
+            connection.commit()
+        finally:
+            self.connections.return_connection(connection)
+
+    def delete(self, key: str) -> None:
+        connection = self.connections.get_connection()
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute("DELETE FROM web_sessions WHERE id = %s", (key,))
+            connection.commit()
+        finally:
+            self.connections.return_connection(connection)
+
+    def prune(self) -> int:
+        connection = self.connections.get_connection()
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute("DELETE FROM web_sessions WHERE expires_at <= CURRENT_TIMESTAMP")
+                deleted = cursor.rowcount
+            connection.commit()
+            return deleted
+        finally:
+            self.connections.return_connection(connection)
+
+
+class SQLiteSessionStore:
+    """Sessions in a local SQLite file shared by the workers of one node"""
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("""
+                CREATE TABLE IF NOT EXISTS web_sessions (
+                    id TEXT PRIMARY KEY,
+                    data TEXT NOT NULL,
+                    expires_at REAL NOT NULL
+                )
+            """)
+        connection.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=5)
+
+    def _execute(self, sql: str, params=()):
+        connection = self._connect()
+        try:
+            with connection:
+                cursor = connection.execute(sql, params)
+                return cursor.fetchone() if cursor.description else cursor.rowcount
+        finally:
+            connection.close()
+
+    def load(self, key: str):
+        row = self._execute("SELECT data, expires_at FROM web_sessions WHERE id = ? AND expires_at > ?",
+                            (key, time.time()))
+        if row is None:
+            return None
+        return row[0], datetime.fromtimestamp(row[1], timezone.utc)
+
+    def save(self, key: str, data: str, expires_at: datetime) -> None:
+        self._execute("INSERT OR REPLACE INTO web_sessions (id, data, expires_at) VALUES (?, ?, ?)",
+                      (key, data, expires_at.timestamp()))
+
+    def delete(self, key: str) -> None:
+        self._execute("DELETE FROM web_sessions WHERE id = ?", (key,))
+
+    def prune(self) -> int:
+        return self._execute("DELETE FROM web_sessions WHERE expires_at <= ?", (time.time(),))
+
+
+class ServerSideSessionInterface(SessionInterface):
+    """
+    Flask session interface backed by a session store.
+    - static files never touch the store
+    - empty sessions get neither a stored row nor a cookie
+    - an unmodified session is written back only when less than half of its lifetime is left
+    """
+
+    serializer = session_json_serializer
+
+    def __init__(self, store):
+        self.store = store
+        self._lock = threading.Lock()
+        self._last_prune = time.monotonic()
+        self.loads = 0
+        self.writes = 0
+        self.failures = 0
+
+    def _lifetime(self, app) -> timedelta:
+        return app.permanent_session_lifetime
+
+    def open_session(self, app, request):
+        if app.static_url_path and request.path.startswith(app.static_url_path + "/"):
+            return ServerSideSession()
+
+        session_id = request.cookies.get(self.get_cookie_name(app))
+        if not session_id:
+            return ServerSideSession()
+
+        try:
+            row = self.store.load(_storage_key(session_id))
+            self.loads += 1
+        except Exception as e:
+            # Treat the visitor as signed out rather than failing the request
+            logger.error(f"Could not load session: {e}")
+            self.failures += 1
+            return ServerSideSession()
+
+        if row is None:
+            return ServerSideSession()
+        data, expires_at = row
+        try:
+            return ServerSideSession(self.serializer.loads(data), session_id=session_id, expires_at=expires_at)
+        except Exception as e:
+            logger.warning(f"Discarding unreadable session: {e}")
+            return ServerSideSession()
+
+    def save_session(self, app, session, response):
+        cookie_name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+
+        if not session:
+            if session.modified and (session.session_id or session.replaced_id):
+                # Cleared (e.g. on logout): drop the stored row as well as the cookie
+                for session_id in (session.session_id, session.replaced_id):
+                    if session_id:
+                        self._delete(session_id)
+                session.session_id = session.replaced_id = None
+                response.delete_cookie(cookie_name, domain=domain, path=path)
+            return
+
+        refresh_cookie = self.should_set_cookie(app, session)
+        if not self.persist(app, session):
+            return
+
+        # A new or regenerated id (possibly stored early by persist()) always needs a fresh cookie
+        set_cookie = refresh_cookie or session.session_id != session.cookie_id
+
+        if set_cookie:
+            response.set_cookie(
+                cookie_name,
+                session.session_id,
+                expires=self.get_expiration_time(app, session),
+                httponly=self.get_cookie_httponly(app),
+                domain=domain,
+                path=path,
+                secure=self.get_cookie_secure(app),
+                samesite=self.get_cookie_samesite(app)
+            )
+        response.vary.add("Cookie")
+
+    def persist(self, app, session) -> bool:
+        """
+        Write the session to the store if it changed or is due for an expiry refresh.
+        Also usable after the response headers are gone, e.g. at the end of a streamed response,
+        as long as the session already had an id when the headers were sent.
+        Returns False if the write failed.
+        """
+        now = datetime.now(timezone.utc)
+        lifetime = self._lifetime(app)
+        if (not session.modified and session.expires_at is not None
+                and session.expires_at - now > lifetime / 2):
+            return True
+
+        if session.session_id is None:
+            session.session_id = secrets.token_urlsafe(32)
+        expires_at = now + lifetime
+        try:
+            self.store.save(_storage_key(session.session_id), self.serializer.dumps(dict(session)), expires_at)
+        except Exception as e:
+            logger.error(f"Could not save session: {e}")
+            self.failures += 1
+            return False
+
+        session.expires_at = expires_at
+        session.modified = False
+        self.writes += 1
+        if session.replaced_id is not None:
+            self._delete(session.replaced_id)
+            session.replaced_id = None
+        self._maybe_prune()
+        return True
+
+    def _delete(self, session_id: str) -> None:
+        try:
+            self.store.delete(_storage_key(session_id))
+        except Exception as e:
+            logger.error(f"Could not delete session: {e}")
+            self.failures += 1
+
+    def _maybe_prune(self) -> None:
+        with self._lock:
+            if time.monotonic() - self._last_prune < PRUNE_INTERVAL:
+                return
+            self._last_prune = time.monotonic()
+        try:
+            deleted = self.store.prune()
+            if deleted:
+                logger.info(f"Pruned {deleted} expired sessions")
+        except Exception as e:
+            logger.warning(f"Could not prune expired sessions: {e}")
+
+    def stats(self) -> dict:
+        return {
+            "backend": type(self.store).__name__,
+            "loads": self.loads,
+            "writes": self.writes,
+            "failures": self.failures,
+        }
+
+
+def create_session_store(backend: str, connections=None, path: Optional[str] = None):
+    """'postgres' (default, needs the pooled connections) or 'sqlite' (needs a file path)"""
+    if backend == "sqlite":
+        return SQLiteSessionStore(path)
+    if backend == "postgres":
+        return PostgresSessionStore(connections)
+    raise ValueError(f"Unknown SESSION_BACKEND: {backend}")
@@ -0,0 +1,294 @@
+"""
+Single-Flight Module
+Coalesces identical concurrent LLM calls so that one in-flight request serves every caller,
+both inside a worker process and across gunicorn workers on the same host
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from typing import Callable, Iterator, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows development machines: fall back to in-process coalescing only
+    fcntl = None
+
+
+def fingerprint(prompt: str) -> str:
+    """Stable fingerprint used to detect identical prompts"""
+    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+
+
+class _Call:
+    """An in-flight call that followers wait on"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class FileLockTable:
+    """
+    Per-key file locks shared by every worker on the host.
+    The worker holding a key's lock runs the call and publishes its result next to the lock.
+    Workers that were already waiting on the same key reuse that result instead of calling again;
+    a result published before a worker started waiting is never served, so this is not a cache.
+    """
+
+    def __init__(self, directory: str, wait_timeout: float = 30, idle_ttl: float = 600):
+        self.directory = directory
+        self.wait_timeout = wait_timeout
+        self.idle_ttl = idle_ttl
+        self._runs = 0
+        self._runs_lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str, suffix: str) -> str:
+        return os.path.join(self.directory, f"{key}{suffix}")
+
+    def _read_result_since(self, key: str, since: float) -> Optional[str]:
+        """The key's result if it was published at or after `since` (wall-clock seconds)"""
+        try:
+            with open(self._path(key, ".json"), "r", encoding="utf-8") as f:
+                published = json.load(f)
+            if published["published_at"] < since:
+                return None
+            return published["result"]
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    def _write_result(self, key: str, result: str) -> None:
+        path = self._path(key, ".json")
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"result": result, "published_at": time.time()}, f)
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def _is_current(lock_file, path: str) -> bool:
+        """True if the locked file is still the one at `path` (a pruner may have unlinked it)"""
+        try:
+            return os.fstat(lock_file.fileno()).st_ino == os.stat(path).st_ino
+        except OSError:
+            return False
+
+    def _prune(self) -> None:
+        """
+        Remove lock and result files that have been idle for a while.
+        A lock file is only unlinked while this process holds its lock; anyone who opened it
+        before the unlink notices the swap in run() and retries on the new file.
+        """
+        cutoff = time.time() - self.idle_ttl
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            try:
+                if os.path.getmtime(path) >= cutoff:
+                    continue
+                if not name.endswith(".lock"):
+                    os.remove(path)
+                    continue
+                with open(path, "a+") as lock_file:
+                    try:
+                        fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    except BlockingIOError:
+                        continue
+                    try:
+                        if self._is_current(lock_file, path):
+                            os.remove(path)
+                    finally:
+                        fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+            except OSError:
+                pass
+
+    def _acquire(self, path: str, deadline: float):
+        """Open and lock the key's lock file; returns (file, waited) or (None, True) past the deadline"""
+        waited = False
+        while True:
+            lock_file = open(path, "a+")
+            try:
+                while True:
+                    try:
+                        fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                        break
+                    except BlockingIOError:
+                        waited = True
+                        if time.monotonic() >= deadline:
+                            lock_file.close()
+                            return None, True
+                        time.sleep(0.05)
+            except BaseException:
+                lock_file.close()
+                raise
+
+            if self._is_current(lock_file, path):
+                # Touch the file so the pruner sees it as in use
+                os.utime(path)
+                return lock_file, waited
+            # Pruned between our open() and flock(); lock the file that replaced it instead
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+            lock_file.close()
+
+    def run(self, key: str, fn: Callable[[], str]) -> str:
+        """Run fn under the key's lock, or reuse the result of the call this worker was waiting on"""
+        path = self._path(key, ".lock")
+        waiting_since = time.time()
+        lock_file, waited = self._acquire(path, time.monotonic() + self.wait_timeout)
+        if lock_file is None:
+            # The leader is stuck; do not let it take this worker down too
+            return fn()
+
+        try:
+            if waited:
+                result = self._read_result_since(key, waiting_since)
+                if result is not None:
+                    return result
+
+            result = fn()
+            self._write_result(key, result)
+            return result
+        finally:
+            self._release(lock_file)
+
+    def stream(self, key: str, fn: Callable[[], Iterator[str]]) -> Iterator[str]:
+        """Like run, for a call that yields text chunks; a result reused from another worker comes as one chunk"""
+        path = self._path(key, ".lock")
+        waiting_since = time.time()
+        lock_file, waited = self._acquire(path, time.monotonic() + self.wait_timeout)
+        if lock_file is None:
+            yield from fn()
+            return
+
+        try:
+            if waited:
+                result = self._read_result_since(key, waiting_since)
+                if result is not None:
+                    yield result
+                    return
+
+            chunks = []
+            for chunk in fn():
+                chunks.append(chunk)
+                yield chunk
+            self._write_result(key, "".join(chunks))
+        finally:
+            self._release(lock_file)
+
+    def _release(self, lock_file) -> None:
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+        lock_file.close()
+        with self._runs_lock:
+            self._runs += 1
+            prune = self._runs % 100 == 0
+        if prune:
+            self._prune()
+
+
+class SingleFlight:
+    """Deduplicates concurrent calls that share a key"""
+
+    def __init__(self, lock_table: Optional[FileLockTable] = None, wait_timeout: float = 30):
+        self.lock_table = lock_table
+        self.wait_timeout = wait_timeout
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.followers = 0
+
+    def _join(self, key: str):
+        """Register interest in key; returns (call, is_leader)"""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = _Call()
+                self._calls[key] = call
+                self.leaders += 1
+                return call, True
+            self.followers += 1
+            return call, False
+
+    def _leave(self, key: str, call: _Call) -> None:
+        with self._lock:
+            del self._calls[key]
+        call.done.set()
+
+    def do(self, key: str, fn: Callable[[], str]) -> str:
+        """Run fn once for all concurrent callers with the same key and share its result"""
+        call, is_leader = self._join(key)
+
+        if not is_leader:
+            if not call.done.wait(self.wait_timeout):
+                # The leader is stuck; make the call ourselves so callers only see fn's own errors
+                return fn()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            if self.lock_table is not None:
+                call.result = self.lock_table.run(key, fn)
+            else:
+                call.result = fn()
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            self._leave(key, call)
+
+    def stream(self, key: str, fn: Callable[[], Iterator[str]]) -> Iterator[str]:
+        """
+        Like do, for a call that yields text chunks. The leader streams its chunks as they arrive;
+        followers wait for it to finish and get the whole text as a single chunk.
+        """
+        call, is_leader = self._join(key)
+
+        if not is_leader:
+            if call.done.wait(self.wait_timeout):
+                if call.error is not None:
+                    raise call.error
+                if call.result is not None:
+                    yield call.result
+                    return
+            # The leader is stuck, or its client went away before the stream finished
+            yield from fn()
+            return
+
+        chunks = []
+        try:
+            source = self.lock_table.stream(key, fn) if self.lock_table is not None else fn()
+            for chunk in source:
+                chunks.append(chunk)
+                yield chunk
+            call.result = "".join(chunks)
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            self._leave(key, call)
+
+    def stats(self) -> dict:
+        """Snapshot of coalescing counters for monitoring"""
+        with self._lock:
+            return {
+                "in_flight": len(self._calls),
+                "leaders": self.leaders,
+                "followers": self.followers,
+                "cross_worker": self.lock_table is not None,
+            }
+
+
+def create_singleflight(directory: Optional[str] = None, wait_timeout: float = 30) -> SingleFlight:
+    """
+    Create a SingleFlight that also coalesces across workers when file locks are available.
+    wait_timeout should be the longest a leader's call can take; followers make their own call after it.
+    """
+    if fcntl is None:
+        return SingleFlight(wait_timeout=wait_timeout)
+
+    directory = directory or os.path.join(tempfile.gettempdir(), "baac-singleflight")
+    return SingleFlight(FileLockTable(directory, wait_timeout=wait_timeout), wait_timeout=wait_timeout)
@@ -9,13 +9,6 @@ let chatList
 let chats = []
 let isMobile = window.innerWidth <= 768
 
-// Daily copy limits configuration
-const copyLimits = {
-  "barangay clearance": 1,
-  "barangay indigency": 5,
-  "barangay residency": 2,
-}
-
 const currentLimits = null
 const selectedDocuments = new Set()
 const bookmarksContainer = document.getElementById("bookmarks-container")
@@ -103,6 +96,34 @@ const adjustColorBrightness = (color, percent) => {
   return (usePound ? "#" : "") + R + G + B
 }
 
+// Random UUID identifying one logical request across retries
+function generateRequestKey() {
+  if (window.crypto && typeof window.crypto.randomUUID === "function") {
+    return window.crypto.randomUUID()
+  }
+  // randomUUID needs a secure context; build a version 4 UUID by hand otherwise
+  const bytes = window.crypto.getRandomValues(new Uint8Array(16))
+  bytes[6] = (bytes[6] & 0x0f) | 0x40
+  bytes[8] = (bytes[8] & 0x3f) | 0x80
+  const hex = Array.from(bytes, (b) => b.toString(16).padStart(2, "0")).join("")
+  return `${hex.slice(0, 8)}-${hex.slice(8, 12)}-${hex.slice(12, 16)}-${hex.slice(16, 20)}-${hex.slice(20)}`
+}
+
+// Retry network failures and gateway errors with backoff; only safe for idempotent requests
+async function fetchWithRetry(url, options, attempts = 3) {
+  for (let attempt = 1; ; attempt++) {
+    try {
+      const response = await fetch(url, options)
+      if (attempt >= attempts || ![502, 503, 504].includes(response.status)) {
+        return response
+      }
+    } catch (error) {
+      if (attempt >= attempts) throw error
+    }
+    await new Promise((resolve) => setTimeout(resolve, 500 * 2 ** (attempt - 1)))
+  }
+}
+
 async function loadLimitsOnInit() {
   try {
     const response = await fetch("/user/copy-limits")
@@ -378,61 +399,24 @@ document.addEventListener("DOMContentLoaded", async () => {
       }
     }
 
-    fetch("/get_response", {
-      method: "POST",
-      headers: {
-        "Content-Type": "application/json",
-      },
-      body: JSON.stringify({
-        prompt: prompt,
-        chat_id: currentChatId,
-        isDirectDocumentRequest: isDirectDocumentRequest,
-        containsDocumentType: containsDocumentType,
-        containsDocumentWord: containsDocumentWord,
-        containsInterrogative: containsInterrogative,
-        startsWithInterrogative: startsWithInterrogative,
-        requestedDocType: requestedDocType,
-      }),
+    const requestBody = JSON.stringify({
+      prompt: prompt,
+      chat_id: currentChatId,
+      isDirectDocumentRequest: isDirectDocumentRequest,
+      containsDocumentType: containsDocumentType,
+      containsDocumentWord: containsDocumentWord,
+      containsInterrogative: containsInterrogative,
+      startsWithInterrogative: startsWithInterrogative,
+      requestedDocType: requestedDocType,
     })
-      .then((response) => response.json())
-      .then((data) => {
-        if (data.response === "ADMIN_AUTHENTICATED") {
-          window.location.href = "/admin"
-        } else {
-          const result = data.response ? data.response : data.error || "No response content found."
-          addMessage(result)
-
-          if (currentChatId && chats.length > 0) {
-            const currentChat = chats.find((chat) => chat.id === currentChatId)
-            if (currentChat && currentChat.title === "New Chat") {
-              const newTitle = prompt.length > 30 ? prompt.substring(0, 30) + "..." : prompt
-              updateChatTitle(currentChatId, newTitle)
-            }
-          }
-
-          scrollToBottom()
-
-          // Moved this block to be after addMessage
-          if (data.showFormButton && data.formType) {
-            // AI provided a button to show the form
-          }
 
-          if (data.suggestForm && data.formType) {
-            addFormSuggestionButton(data.formType)
-            scrollToBottom()
-          }
+    // Stream every answer; history is kept server-side for saved chats and guest sessions alike
+    const responsePromise = streamResponse(requestBody)
 
-          if (data.suggestAllDocuments) {
-            addAllDocumentsSuggestion()
-            scrollToBottom()
-          }
-
-          // Changed this to requiresAuth to match updated response from backend
-          if (data.requiresAuth && data.documentType) {
-            addAuthRequiredMessage(data.documentType)
-            scrollToBottom()
-          }
-        }
+    responsePromise
+      .then((data) => {
+        // Streamed answers are rendered as they arrive and resolve to null
+        if (data) handleResponseData(data)
       })
       .catch((error) => {
         addMessage("Error: Unable to fetch response.")
@@ -447,6 +431,111 @@ document.addEventListener("DOMContentLoaded", async () => {
           loadChats()
         }
       })
+
+    // Function to apply a finished /get_response payload to the chat
+    function handleResponseData(data, streamedMessage = null) {
+      if (data.response === "ADMIN_AUTHENTICATED") {
+        window.location.href = "/admin"
+      } else {
+        const result = data.response ? data.response : data.error || "No response content found."
+        if (streamedMessage) {
+          streamedMessage.innerHTML = result
+        } else {
+          addMessage(result)
+        }
+
+        if (currentChatId && chats.length > 0) {
+          const currentChat = chats.find((chat) => chat.id === currentChatId)
+          if (currentChat && currentChat.title === "New Chat") {
+            const newTitle = prompt.length > 30 ? prompt.substring(0, 30) + "..." : prompt
+            updateChatTitle(currentChatId, newTitle)
+          }
+        }
+
+        scrollToBottom()
+
+        // Moved this block to be after addMessage
+        if (data.showFormButton && data.formType) {
+          // AI provided a button to show the form
+        }
+
+        if (data.suggestForm && data.formType) {
+          addFormSuggestionButton(data.formType)
+          scrollToBottom()
+        }
+
+        if (data.suggestAllDocuments) {
+          addAllDocumentsSuggestion()
+          scrollToBottom()
+        }
+
+        // Changed this to requiresAuth to match updated response from backend
+        if (data.requiresAuth && data.documentType) {
+          addAuthRequiredMessage(data.documentType)
+          scrollToBottom()
+        }
+      }
+    }
+
+    // Function to read Server-Sent Events from /get_response/stream and render chunks as they arrive
+    async function streamResponse(body) {
+      const response = await fetch("/get_response/stream", {
+        method: "POST",
+        headers: {
+          "Content-Type": "application/json",
+        },
+        body: body,
+      })
+
+      if (!response.ok || !response.body) {
+        return response.json()
+      }
+
+      const reader = response.body.getReader()
+      const decoder = new TextDecoder()
+      let buffer = ""
+      let streamedText = ""
+      let streamedMessage = null
+
+      while (true) {
+        const { value, done } = await reader.read()
+        if (done) break
+
+        buffer += decoder.decode(value, { stream: true })
+        const frames = buffer.split("\n\n")
+        buffer = frames.pop()
+
+        for (const frame of frames) {
+          let event = "message"
+          let payload = ""
+          for (const line of frame.split("\n")) {
+            if (line.startsWith("event: ")) event = line.slice(7)
+            else if (line.startsWith("data: ")) payload += line.slice(6)
+          }
+          if (!payload) continue
+          const data = JSON.parse(payload)
+
+          if (event === "chunk") {
+            streamedText += data.text
+            if (!streamedMessage) {
+              streamedMessage = document.createElement("div")
+              streamedMessage.classList.add("message", "ai-message")
+              chatMessages.appendChild(streamedMessage)
+            }
+            streamedMessage.innerHTML = streamedText
+            scrollToBottom()
+          } else if (event === "done") {
+            handleResponseData(data, streamedMessage)
+            return null
+          } else if (event === "error") {
+            if (streamedMessage) streamedMessage.remove()
+            return data
+          }
+        }
+      }
+
+      throw new Error("Response stream ended unexpectedly")
+    }
   }
 
   // Function to add authentication required message
@@ -474,7 +563,7 @@ document.addEventListener("DOMContentLoaded", async () => {
     }
 
     // Check if this document has reached its limit
-    const limitInfo = copyLimits[documentType]
+    const limitInfo = globalCopyLimits[documentType]
     const isLimitReached = limitInfo && limitInfo.remaining === 0
 
     const suggestionDiv = document.createElement("div")
@@ -529,7 +618,7 @@ document.addEventListener("DOMContentLoaded", async () => {
           ${documentTypes
             .map((docType) => {
               // Check limit for each document
-              const limitInfo = copyLimits[docType.name]
+              const limitInfo = globalCopyLimits[docType.name]
               const isLimitReached = limitInfo && limitInfo.remaining === 0
               const buttonOpacity = isLimitReached ? "0.5" : "1"
               const cursorStyle = isLimitReached ? "not-allowed" : "pointer"
@@ -1019,6 +1108,10 @@ function showDocumentForm(preselectedTypes = []) {
       backdrop-filter: blur(8px);
     `
 
+    // Idempotency key for this form; kept while the same request is retried
+    let submissionKey = null
+    let submissionBody = null
+
     // Handle form submission - Fixed to correctly map document types to copy counts
     submitBtn.addEventListener("click", async (e) => {
       e.preventDefault()
@@ -1085,10 +1178,17 @@ function showDocumentForm(preselectedTypes = []) {
 
         console.log("[v0] Submitting document request:", formData)
 
-        const response = await fetch("/submit_document", {
+        // A new key only when the request changed, so a retry after a lost response returns the original REF
+        const body = JSON.stringify(formData)
+        if (body !== submissionBody) {
+          submissionKey = generateRequestKey()
+          submissionBody = body
+        }
+
+        const response = await fetchWithRetry("/submit_document", {
           method: "POST",
-          headers: { "Content-Type": "application/json" },
-          body: JSON.stringify(formData),
+          headers: { "Content-Type": "application/json", "Idempotency-Key": submissionKey },
+          body: body,
         })
 
         if (!response.ok) {
@@ -1121,9 +1221,9 @@ function showDocumentForm(preselectedTypes = []) {
           formOverlay.style.display = "none"
           addMessage(result.response)
 
-          // Reload limits after successful submission
-          await loadLimitsOnInit()
-          displayCopyLimitUI()
+          // The response already carries the updated quota for the requested documents
+          Object.assign(globalCopyLimits, result.limits)
+          updateCopyLimitDisplay(globalCopyLimits)
 
           scrollToBottom()
         } else {
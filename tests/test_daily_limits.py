@@ -0,0 +1,94 @@
+import os
+import threading
+import uuid
+from datetime import date
+
+import pytest
+
+from daily_limits import claim_daily_limits, copy_limit_status, daily_limit_usage
+
+# The claim is a single SQL statement, so its concurrency behaviour is only testable against PostgreSQL.
+# Point TEST_DATABASE_URL at a scratch database (never production): the migrations are applied to it.
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+needs_database = pytest.mark.skipif(not TEST_DATABASE_URL, reason="TEST_DATABASE_URL is not set")
+
+LIMITS = {"barangay clearance": 2, "barangay residency": 5}
+TODAY = date(2024, 5, 15)
+
+
+def test_copy_limit_status():
+    status = copy_limit_status(2, 3, TODAY)
+    assert (status["limit"], status["used"], status["remaining"]) == (2, 3, 0)
+    assert status["reset_time"] == "2024-05-16"
+
+
+@pytest.fixture
+def user_id():
+    import psycopg2
+    from schema_migrations import migrate
+
+    connection = psycopg2.connect(TEST_DATABASE_URL)
+    migrate(connection)
+    cursor = connection.cursor()
+    cursor.execute(
+        "INSERT INTO app_users (name, email, purok) VALUES ('Limit Test', %s, 'Purok 1') RETURNING id",
+        (f"limits-{uuid.uuid4().hex}@example.com",)
+    )
+    user_id = cursor.fetchone()[0]
+    connection.commit()
+    yield user_id
+    cursor.execute("DELETE FROM app_users WHERE id = %s", (user_id,))
+    connection.commit()
+    connection.close()
+
+
+def claim_concurrently(user_id, document_types, attempts):
+    """Run `attempts` claims at once, each on its own connection; returns how many were allowed"""
+    import psycopg2
+
+    connections = [psycopg2.connect(TEST_DATABASE_URL) for _ in range(attempts)]
+    barrier = threading.Barrier(attempts)
+    allowed = []
+
+    def claim(connection):
+        cursor = connection.cursor()
+        barrier.wait()
+        status = claim_daily_limits(cursor, LIMITS, user_id, document_types, TODAY)
+        if all(s["allowed"] for s in status.values()):
+            connection.commit()
+            allowed.append(status)
+        else:
+            connection.rollback()
+
+    threads = [threading.Thread(target=claim, args=(connection,)) for connection in connections]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    for connection in connections:
+        connection.close()
+    return allowed
+
+
+@needs_database
+def test_concurrent_claims_never_exceed_the_limit(user_id):
+    allowed = claim_concurrently(user_id, ["barangay clearance"], 8)
+    assert len(allowed) == LIMITS["barangay clearance"]
+    assert sorted(s["barangay clearance"]["used"] for s in allowed) == [1, 2]
+
+
+@needs_database
+def test_refused_type_gives_back_the_other_types(user_id):
+    import psycopg2
+
+    allowed = claim_concurrently(user_id, ["barangay clearance", "barangay residency"], 4)
+    assert len(allowed) == LIMITS["barangay clearance"]
+
+    connection = psycopg2.connect(TEST_DATABASE_URL)
+    try:
+        usage = daily_limit_usage(connection.cursor(), LIMITS, user_id, TODAY)
+    finally:
+        connection.close()
+    # Residency was only kept for the submissions whose clearance claim succeeded
+    assert usage["barangay clearance"]["used"] == 2
+    assert usage["barangay residency"]["used"] == 2
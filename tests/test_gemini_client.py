@@ -0,0 +1,125 @@
+import threading
+import time
+
+import pytest
+
+from gemini_client import CircuitBreaker, CircuitOpenError, GeminiClient, LLMTimeoutError, LLMUnavailableError
+
+
+class Chunk:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeModel:
+    """Stands in for genai.GenerativeModel; `delays` are the pauses before each streamed chunk"""
+
+    def __init__(self, delays=(), text="answer", release=None):
+        self.delays = delays
+        self.text = text
+        self.release = release
+
+    def generate_content(self, prompt, stream=False):
+        if not stream:
+            if self.release is not None:
+                self.release.wait(5)
+            return Chunk(self.text)
+        return self._stream()
+
+    def _stream(self):
+        for i, delay in enumerate(self.delays):
+            time.sleep(delay)
+            yield Chunk(f"part{i} ")
+
+
+def test_breaker_opens_after_threshold_and_half_opens_after_reset():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.05)
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.record_failure(timed_out=True)
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow_request()
+
+    time.sleep(0.06)
+    assert breaker.allow_request()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    # Only one trial call at a time
+    assert not breaker.allow_request()
+
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    stats = breaker.stats()
+    assert stats["trip_count"] == 1
+    assert stats["total_timeouts"] == 1
+
+
+def test_failed_trial_reopens_breaker():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.01)
+    breaker.record_failure()
+    time.sleep(0.02)
+    assert breaker.allow_request()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.stats()["trip_count"] == 2
+
+
+def test_abandoned_trial_lets_the_next_call_through():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+    breaker.record_failure()
+    assert breaker.allow_request()
+    breaker.abandon()
+    assert breaker.allow_request()
+
+
+def test_open_breaker_rejects_without_calling_the_api():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=60)
+    breaker.record_failure()
+    client = GeminiClient(FakeModel(), breaker=breaker)
+    with pytest.raises(CircuitOpenError):
+        client.generate_text("hi")
+
+
+def test_stream_deadline_is_per_chunk_not_per_stream():
+    # 6 chunks 0.05s apart take 0.3s in total, well over the 0.15s timeout, but no gap exceeds it
+    client = GeminiClient(FakeModel(delays=[0.05] * 6), timeout=0.15)
+    text = "".join(client.stream_text("hi"))
+    assert text == "".join(f"part{i} " for i in range(6))
+    assert client.breaker.stats()["total_successes"] == 1
+
+
+def test_stream_times_out_waiting_for_first_chunk():
+    client = GeminiClient(FakeModel(delays=[0.3]), timeout=0.05)
+    with pytest.raises(LLMTimeoutError):
+        list(client.stream_text("hi"))
+    assert client.breaker.stats()["total_timeouts"] == 1
+
+
+def test_stream_times_out_on_a_stalled_gap():
+    client = GeminiClient(FakeModel(delays=[0, 0.3]), timeout=0.05)
+    received = []
+    with pytest.raises(LLMTimeoutError):
+        for text in client.stream_text("hi"):
+            received.append(text)
+    assert received == ["part0 "]
+
+
+def test_timed_out_calls_are_counted_and_bound_the_pool():
+    release = threading.Event()
+    client = GeminiClient(FakeModel(release=release), timeout=0.01, max_workers=1)
+    with pytest.raises(LLMTimeoutError):
+        client.generate_text("hi")
+    assert client.stats()["abandoned_calls"] == 1
+    assert client.stats()["running_abandoned"] == 1
+
+    # The only thread is still stuck in the abandoned call, so the next one is refused, not queued
+    with pytest.raises(LLMUnavailableError):
+        client.generate_text("hi")
+    assert client.stats()["rejected_busy"] == 1
+
+    release.set()
+    deadline = time.monotonic() + 2
+    while client.stats()["running_abandoned"] and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert client.stats()["running_abandoned"] == 0
+    client.timeout = 2
+    assert client.generate_text("hi") == "answer"
@@ -0,0 +1,88 @@
+import pytest
+
+from local_answers import answer_locally, answer_officials_query, answer_population_query
+from barangay_records import OFFICIALS
+from population_stats import SUMMARY
+
+
+@pytest.mark.parametrize("query", [
+    "how many people in purok 3",
+    "ilan ang tao sa purok 7",
+    "population of iba zambales",
+    "how many people live in zambales",
+    "who was the first captain",
+    "who was the kapitan before",
+    "who will be the next captain",
+    "what was the population in 2010",
+    "how many 18 year olds",
+    "how many residents aged 18",
+    "who is the kagawad for health",
+    "who is the kagawad in charge of peace and order",
+    "what page shows the total fee",
+    "why is the population growing",
+    "how old is the kapitan",
+    "is redondo married",
+    "what is the contact number of the secretary",
+    "who is the secretary of the interior",
+    "who is the dilg secretary",
+    "how many kagawads are women",
+])
+def test_defers_to_llm(query):
+    assert answer_locally(query) is None
+
+
+def test_population_total():
+    answer = answer_locally("how many people live in barangay amungan")
+    assert f"{SUMMARY['total_population']:,}" in answer
+
+
+def test_population_by_sex():
+    assert f"{SUMMARY['male']:,}" in answer_locally("how many males are there")
+
+
+def test_population_bracket_range():
+    answer = answer_population_query("how many residents aged 15 to 19")
+    assert "1,144" in answer
+
+
+def test_single_age_is_not_answered_with_its_bracket():
+    assert answer_population_query("how many residents are 17 years old") is None
+
+
+def test_age_substring_is_not_a_population_term():
+    assert answer_population_query("what is the total on this page") is None
+
+
+def test_captain():
+    assert OFFICIALS["punong_barangay"] in answer_locally("who is the captain")
+
+
+def test_short_query_is_a_lookup():
+    assert OFFICIALS["punong_barangay"] in answer_locally("kapitan?")
+
+
+def test_purok_president():
+    assert OFFICIALS["purok_presidents"][8] in answer_officials_query("who is the president of purok 8")
+
+
+def test_kagawad_list():
+    answer = answer_locally("who are the kagawads")
+    assert all(name in answer for name in OFFICIALS["kagawads"])
+
+
+def test_officials_for_this_barangay_are_still_answered():
+    assert OFFICIALS["punong_barangay"] in answer_locally("who is the captain for barangay amungan")
+
+
+def test_surname_lookup():
+    assert "Flauta" in answer_locally("who is flauta")
+
+
+def test_kagawad_count_is_a_number_not_the_list():
+    answer = answer_locally("how many kagawads are there")
+    assert f"<strong>{len(OFFICIALS['kagawads'])}</strong>" in answer
+    assert not any(name in answer for name in OFFICIALS["kagawads"])
+
+
+def test_purok_count():
+    assert f"<strong>{len(OFFICIALS['purok_presidents'])}</strong>" in answer_locally("how many puroks are there")
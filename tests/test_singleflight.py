@@ -0,0 +1,289 @@
+import os
+import threading
+import time
+
+import pytest
+
+from gemini_client import GeminiClient
+from singleflight import FileLockTable, SingleFlight, fcntl
+
+needs_flock = pytest.mark.skipif(fcntl is None, reason="file locks are not available on this platform")
+
+
+def start_threads(count, target):
+    threads = [threading.Thread(target=target) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    return threads
+
+
+def test_concurrent_callers_share_one_call():
+    flight = SingleFlight()
+    release = threading.Event()
+    calls = []
+    results = []
+
+    def slow():
+        calls.append(1)
+        release.wait(2)
+        return "answer"
+
+    threads = start_threads(5, lambda: results.append(flight.do("key", slow)))
+    time.sleep(0.1)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert calls == [1]
+    assert results == ["answer"] * 5
+    stats = flight.stats()
+    assert (stats["leaders"], stats["followers"], stats["in_flight"]) == (1, 4, 0)
+
+
+def test_followers_get_the_leaders_error():
+    flight = SingleFlight()
+    release = threading.Event()
+    errors = []
+
+    def failing():
+        release.wait(2)
+        raise ValueError("boom")
+
+    def call():
+        try:
+            flight.do("key", failing)
+        except ValueError as e:
+            errors.append(str(e))
+
+    threads = start_threads(3, call)
+    time.sleep(0.1)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert errors == ["boom"] * 3
+
+
+def test_follower_makes_its_own_call_when_the_leader_is_stuck():
+    flight = SingleFlight(wait_timeout=0.1)
+    release = threading.Event()
+    leader = threading.Thread(target=lambda: flight.do("key", lambda: release.wait(2) and "late"))
+    leader.start()
+    time.sleep(0.05)
+    started = time.monotonic()
+    assert flight.do("key", lambda: "own") == "own"
+    assert time.monotonic() - started < 1
+    release.set()
+    leader.join()
+
+
+class Chunk:
+    def __init__(self, text):
+        self.text = text
+
+
+class CountingStreamModel:
+    """Stands in for genai.GenerativeModel; counts stream calls and streams once `release` is set"""
+
+    def __init__(self, release):
+        self.release = release
+        self.calls = 0
+
+    def generate_content(self, prompt, stream=False):
+        self.calls += 1
+        return self._stream()
+
+    def _stream(self):
+        self.release.wait(2)
+        for part in ["Hello ", "there"]:
+            yield Chunk(part)
+
+
+def test_concurrent_identical_streams_make_one_gemini_call():
+    flight = SingleFlight()
+    release = threading.Event()
+    model = CountingStreamModel(release)
+    client = GeminiClient(model, timeout=5)
+    responses = []
+
+    def stream_request():
+        responses.append(list(flight.stream("key", lambda: client.stream_text("prompt"))))
+
+    threads = start_threads(2, stream_request)
+    time.sleep(0.1)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert model.calls == 1
+    # The leader streams chunk by chunk; the follower gets the whole text at once
+    assert sorted(responses) == [["Hello ", "there"], ["Hello there"]]
+
+
+def test_stream_follower_gets_the_leaders_error():
+    flight = SingleFlight()
+    release = threading.Event()
+    errors = []
+
+    def failing():
+        release.wait(2)
+        raise ValueError("boom")
+        yield
+
+    def call():
+        try:
+            list(flight.stream("key", failing))
+        except ValueError as e:
+            errors.append(str(e))
+
+    threads = start_threads(2, call)
+    time.sleep(0.1)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert errors == ["boom"] * 2
+
+
+def test_stream_follower_makes_its_own_call_when_the_leader_goes_away():
+    flight = SingleFlight()
+    leader = flight.stream("key", lambda: iter(["partial ", "answer"]))
+    assert next(leader) == "partial "
+    results = []
+    follower = threading.Thread(target=lambda: results.append(list(flight.stream("key", lambda: iter(["own"])))))
+    follower.start()
+    time.sleep(0.05)
+    # The leader's client disconnected mid-stream
+    leader.close()
+    follower.join()
+    assert results == [["own"]]
+
+
+def test_finished_calls_are_not_reused():
+    flight = SingleFlight()
+    calls = []
+    flight.do("key", lambda: calls.append(1) or "a")
+    flight.do("key", lambda: calls.append(1) or "b")
+    assert len(calls) == 2
+
+
+@needs_flock
+def test_worker_waiting_on_the_lock_reuses_the_leaders_result(tmp_path):
+    # Two tables on one directory stand in for two gunicorn workers
+    leader_table = FileLockTable(str(tmp_path))
+    follower_table = FileLockTable(str(tmp_path))
+    release = threading.Event()
+    calls = []
+    results = {}
+
+    def slow():
+        calls.append("leader")
+        release.wait(2)
+        return "answer"
+
+    leader = threading.Thread(target=lambda: results.update(leader=leader_table.run("key", slow)))
+    leader.start()
+    time.sleep(0.1)
+    follower = threading.Thread(target=lambda: results.update(
+        follower=follower_table.run("key", lambda: calls.append("follower") or "other")))
+    follower.start()
+    time.sleep(0.1)
+    release.set()
+    leader.join()
+    follower.join()
+
+    assert calls == ["leader"]
+    assert results == {"leader": "answer", "follower": "answer"}
+
+
+@needs_flock
+def test_result_published_before_waiting_is_not_served(tmp_path):
+    first = FileLockTable(str(tmp_path))
+    second = FileLockTable(str(tmp_path))
+    assert first.run("key", lambda: "old") == "old"
+    assert second.run("key", lambda: "new") == "new"
+
+
+@needs_flock
+def test_stuck_leader_does_not_block_followers_past_the_wait(tmp_path):
+    leader_table = FileLockTable(str(tmp_path))
+    follower_table = FileLockTable(str(tmp_path), wait_timeout=0.1)
+    release = threading.Event()
+    leader = threading.Thread(target=lambda: leader_table.run("key", lambda: release.wait(2) and "late"))
+    leader.start()
+    time.sleep(0.05)
+    started = time.monotonic()
+    assert follower_table.run("key", lambda: "own") == "own"
+    assert time.monotonic() - started < 1
+    release.set()
+    leader.join()
+
+
+@needs_flock
+def test_worker_waiting_on_a_stream_reuses_the_leaders_text(tmp_path):
+    first = FileLockTable(str(tmp_path))
+    second = FileLockTable(str(tmp_path))
+    release = threading.Event()
+    calls = []
+    results = []
+
+    def slow():
+        calls.append(1)
+        release.wait(2)
+        yield "Hello "
+        yield "there"
+
+    leader = threading.Thread(target=lambda: results.append(list(first.stream("key", slow))))
+    leader.start()
+    time.sleep(0.05)
+    follower = threading.Thread(target=lambda: results.append(list(second.stream("key", slow))))
+    follower.start()
+    time.sleep(0.05)
+    release.set()
+    leader.join()
+    follower.join()
+
+    assert calls == [1]
+    assert sorted(results) == [["Hello ", "there"], ["Hello there"]]
+
+
+def age(path, seconds):
+    old = time.time() - seconds
+    os.utime(path, (old, old))
+
+
+@needs_flock
+def test_prune_keeps_lock_files_that_are_held(tmp_path):
+    table = FileLockTable(str(tmp_path), idle_ttl=60)
+    pruner = FileLockTable(str(tmp_path), idle_ttl=60)
+    lock_path = os.path.join(str(tmp_path), "key.lock")
+    held = threading.Event()
+    release = threading.Event()
+
+    def slow():
+        age(lock_path, 3600)
+        held.set()
+        release.wait(2)
+        return "answer"
+
+    leader = threading.Thread(target=lambda: table.run("key", slow))
+    leader.start()
+    held.wait(2)
+    pruner._prune()
+    assert os.path.exists(lock_path)
+
+    release.set()
+    leader.join()
+    age(lock_path, 3600)
+    age(os.path.join(str(tmp_path), "key.json"), 3600)
+    pruner._prune()
+    assert os.listdir(str(tmp_path)) == []
+
+
+@needs_flock
+def test_lock_on_a_pruned_file_is_not_current(tmp_path):
+    path = os.path.join(str(tmp_path), "key.lock")
+    with open(path, "a+") as stale:
+        os.remove(path)
+        open(path, "a+").close()
+        assert not FileLockTable._is_current(stale, path)
+        with open(path, "a+") as current:
+            assert FileLockTable._is_current(current, path)
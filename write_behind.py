@@ -0,0 +1,222 @@
+"""
+Write-Behind Module
+Buffers conversation logs and website visit counts in memory and writes them in batches from a
+background thread, so chat turns and page views do not each pay for their own INSERT and COMMIT
+"""
+
+import atexit
+import logging
+import os
+import threading
+import time
+from collections import Counter, deque
+from datetime import date, datetime
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+INSERT_CONVERSATIONS = "INSERT INTO conversation_logs (user_input, ai_response, timestamp, user_id) VALUES %s"
+
+# Visits are pre-aggregated per day, so one row per day is touched per flush
+UPSERT_VISITS = """
+INSERT INTO website_visits (visit_date, visit_count) VALUES %s
+ON CONFLICT (visit_date)
+DO UPDATE SET visit_count = website_visits.visit_count + EXCLUDED.visit_count
+"""
+
+
+class WriteBehindBuffer:
+    """
+    In-process buffer flushed when `batch_size` conversations are pending or every `flush_interval` seconds.
+    Memory is bounded by `max_pending` conversations; beyond that the oldest rows are dropped and counted.
+    Rows the database refuses on their own (bad data) are rejected, logged and counted rather than retried.
+    Pending data is flushed on interpreter shutdown; a hard kill loses at most one interval of logs.
+    """
+
+    def __init__(self, connections, batch_size: int = 100, flush_interval: float = 2.0, max_pending: int = 5000):
+        self.connections = connections
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+
+        self._conversations = deque()
+        self._visits = Counter()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = False
+        self._thread: Optional[threading.Thread] = None
+        self._pid = None
+
+        self.flushes = 0
+        self.failures = 0
+        self.conversations_written = 0
+        self.visits_written = 0
+        self.dropped = 0
+        self.rejected = 0
+        self.last_flush_ms = 0.0
+
+        atexit.register(self.close)
+
+    def _ensure_thread(self) -> None:
+        # Started lazily, and again after a fork, since threads do not survive into gunicorn workers
+        if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                self._conversations.clear()
+                self._visits.clear()
+                self._pid = os.getpid()
+                self._thread = None
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+                self._thread.start()
+
+    def log_conversation(self, user_input, ai_response, user_id=None) -> None:
+        """Queue one conversation log row"""
+        self._ensure_thread()
+        with self._lock:
+            if len(self._conversations) >= self.max_pending:
+                self._conversations.popleft()
+                self.dropped += 1
+            self._conversations.append((user_input, ai_response, datetime.now(), user_id))
+            pending = len(self._conversations)
+        if pending >= self.batch_size:
+            self._wakeup.set()
+
+    def record_visit(self, count: int = 1) -> None:
+        """Add to today's visit counter"""
+        self._ensure_thread()
+        with self._lock:
+            self._visits[date.today()] += count
+
+    def _run(self) -> None:
+        while not self._stopped:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Write-behind flush thread error: {e}")
+
+    def flush(self) -> bool:
+        """
+        Write everything pending in one transaction.
+        If the batch fails on its data, its rows are retried one at a time so a single bad row
+        is dropped (and logged) instead of failing every later flush; if the database is unreachable
+        the data is put back for the next try.
+        """
+        with self._flush_lock:
+            with self._lock:
+                conversations = list(self._conversations)
+                self._conversations.clear()
+                visits = sorted(self._visits.items())
+                self._visits.clear()
+            if not conversations and not visits:
+                return True
+
+            started = time.perf_counter()
+            connection = None
+            written_conversations, written_visits = conversations, visits
+            try:
+                from psycopg2 import InterfaceError, OperationalError
+                from psycopg2.extras import execute_values
+
+                connection = self.connections.get_connection()
+                try:
+                    with connection.cursor() as cursor:
+                        if conversations:
+                            execute_values(cursor, INSERT_CONVERSATIONS, conversations, page_size=self.batch_size)
+                        if visits:
+                            execute_values(cursor, UPSERT_VISITS, visits)
+                    connection.commit()
+                except (OperationalError, InterfaceError):
+                    raise
+                except Exception as e:
+                    logger.warning(f"Write-behind batch failed, retrying its rows one at a time: {e}")
+                    connection.rollback()
+                    written_conversations, written_visits = self._write_rows(connection, conversations, visits)
+            except Exception as e:
+                logger.error(f"Write-behind flush of {len(conversations)} conversations and "
+                             f"{len(visits)} visit days failed: {e}")
+                if connection is not None:
+                    try:
+                        connection.rollback()
+                    except Exception:
+                        pass
+                self._requeue(conversations, visits)
+                with self._lock:
+                    self.failures += 1
+                return False
+            finally:
+                if connection is not None:
+                    self.connections.return_connection(connection)
+
+            with self._lock:
+                self.flushes += 1
+                self.conversations_written += len(written_conversations)
+                self.visits_written += sum(count for _, count in written_visits)
+                self.rejected += (len(conversations) - len(written_conversations)) + (len(visits) - len(written_visits))
+                self.last_flush_ms = (time.perf_counter() - started) * 1000
+            return True
+
+    def _write_rows(self, connection, conversations, visits):
+        """
+        Write each row under its own savepoint in one transaction; rows that fail on their own are
+        dropped and logged. Connection errors propagate so the caller puts everything back.
+        Returns the conversations and visit rows that were written.
+        """
+        from psycopg2 import InterfaceError, OperationalError
+        from psycopg2.extras import execute_values
+
+        written = ([], [])
+        with connection.cursor() as cursor:
+            for sql, rows, kept in ((INSERT_CONVERSATIONS, conversations, written[0]), (UPSERT_VISITS, visits, written[1])):
+                for row in rows:
+                    cursor.execute("SAVEPOINT write_behind_row")
+                    try:
+                        execute_values(cursor, sql, [row])
+                    except (OperationalError, InterfaceError):
+                        raise
+                    except Exception as e:
+                        cursor.execute("ROLLBACK TO SAVEPOINT write_behind_row")
+                        logger.error(f"Write-behind dropped a row that cannot be written: {e}; row: {row!r:.200}")
+                        continue
+                    cursor.execute("RELEASE SAVEPOINT write_behind_row")
+                    kept.append(row)
+        connection.commit()
+        return written
+
+    def _requeue(self, conversations, visits) -> None:
+        with self._lock:
+            # Older rows go back in front of anything queued during the failed flush
+            room = max(0, self.max_pending - len(self._conversations))
+            kept = conversations[-room:] if room else []
+            self.dropped += len(conversations) - len(kept)
+            self._conversations.extendleft(reversed(kept))
+            for visit_date, count in visits:
+                self._visits[visit_date] += count
+
+    def close(self) -> None:
+        """Stop the background thread and flush what is left"""
+        if self._pid not in (None, os.getpid()):
+            return
+        self._stopped = True
+        self._wakeup.set()
+        if self._thread is not None and self._thread.is_alive():
+            self._thread.join(timeout=self.flush_interval + 5)
+        self.flush()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "pending_conversations": len(self._conversations),
+                "pending_visits": sum(self._visits.values()),
+                "flushes": self.flushes,
+                "failures": self.failures,
+                "conversations_written": self.conversations_written,
+                "visits_written": self.visits_written,
+                "dropped": self.dropped,
+                "rejected": self.rejected,
+                "last_flush_ms": round(self.last_flush_ms, 3),
+            }